@@ -0,0 +1,314 @@
+import argparse
+import datetime
+import importlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic_data import write_bilheteria_csv
+from src.instrumentation import step
+from src.preprocessing import (
+    CATEGORICAL_COLUMNS, CSV_DTYPES, EVENT_COLUMN, calculate_days_in_theaters, extract_day_of_month,
+    extract_day_of_week, extract_temporal_features, get_hour_of_session, load_raw_sessions, one_hot_encoding,
+    preprocessing
+)
+
+# Benchmarks de cada etapa do pipeline em arquivos sintéticos no formato do bilheteria.csv
+# Execute a partir da raiz do repositório: python -m benchmarks.run_benchmarks --rows 10000 100000 1000000
+
+DEFAULT_ROWS = [10_000, 100_000]
+# Acima desse tamanho os benchmarks de modelos (validação cruzada, fit e predict) são pulados
+DEFAULT_MAX_MODEL_ROWS = 100_000
+# Um benchmark é considerado regressão quando fica mais lento que a referência por esse fator
+DEFAULT_REGRESSION_THRESHOLD = 1.2
+# Tamanhos de lote comparados entre o predict do scikit-learn e o modelo compilado
+COMPILED_BATCH_SIZES = [1, 64, 256, 1_024, 20_000]
+# Módulos que o pipeline carrega sob demanda, importados antes dos benchmarks
+PRELOADED_MODULES = ['scipy.sparse', 'sklearn.preprocessing']
+# Sessões do arquivo sintético usadas para conferir a grade de preços com o predict_sessions
+PRICE_CHECK_SESSIONS = 500
+
+
+def measure(name, rows, func, *args, **kwargs):
+    """
+    Executa func uma vez e mede tempo real, tempo de CPU e pico de memória
+    A medida é um passo da instrumentação, assim o pico inclui o dos passos internos de func
+
+    Returns:
+        Tupla com o retorno de func e o dicionário com as medidas
+    """
+    with step(name, rows_in=rows) as record:
+        result = func(*args, **kwargs)
+
+    measurement = {
+        'benchmark': name,
+        'rows': rows,
+        'wall_s': record.wall_s,
+        'cpu_s': record.cpu_s,
+        'peak_rss_mb': record.peak_rss_mb,
+        'rows_per_s': rows / record.wall_s if record.wall_s > 0 else None,
+    }
+    print(
+        f"{name:<40} | {rows:>10} linhas | {record.wall_s:8.3f}s | CPU {record.cpu_s:8.3f}s"
+        f" | pico {measurement['peak_rss_mb'] or 0:8.1f} MB"
+    )
+
+    return result, measurement
+
+
+def preprocessing_benchmarks(csv_path, work_dir, rows, chunksize):
+    results = []
+    output_path = os.path.join(work_dir, 'bilheteria_processado.csv')
+
+    # As funções de features antigas (extract_day_of_week, ...) recebem as datas como texto
+    data, measurement = measure('read_csv', rows, pd.read_csv, csv_path, sep=';', skiprows=1, dtype=CSV_DTYPES)
+    results.append(measurement)
+
+    _, measurement = measure('load_raw_sessions', rows, load_raw_sessions, csv_path)
+    results.append(measurement)
+
+    _, measurement = measure(
+        'preprocessing', rows, preprocessing, csv_path, output_path, charts=False, export_csv=False
+    )
+    results.append(measurement)
+
+    _, measurement = measure(
+        'preprocessing_chunks', rows, preprocessing, csv_path, os.path.join(work_dir, 'blocos.csv'),
+        chunksize=chunksize, charts=False, export_csv=False
+    )
+    results.append(measurement)
+
+    for extractor in [extract_day_of_week, get_hour_of_session, extract_day_of_month, calculate_days_in_theaters,
+                      extract_temporal_features]:
+        _, measurement = measure(extractor.__name__, rows, extractor, data.copy())
+        results.append(measurement)
+
+    labeled = extract_temporal_features(data.dropna(subset=['Quantidade de ingressos vendidos']))
+    numerical = ['Valor do Ingresso', 'Hora', 'Dia da Semana', 'Dia do Mês', 'Dias em Cartaz']
+    _, measurement = measure('one_hot_encoding', len(labeled), one_hot_encoding, labeled, CATEGORICAL_COLUMNS, numerical)
+    results.append(measurement)
+
+    # Com 'Evento' (uma categoria a cada ~3,5 linhas) o One-Hot denso não cabe na memória: usa a matriz esparsa
+    _, measurement = measure(
+        'preprocessing_sparse_with_event', rows, preprocessing, csv_path, os.path.join(work_dir, 'esparso.csv'),
+        categorical_columns=CATEGORICAL_COLUMNS + [EVENT_COLUMN], sparse=True, charts=False
+    )
+    results.append(measurement)
+
+    return results, os.path.splitext(output_path)[0]
+
+
+def model_benchmarks(processed_path, sessions):
+    from src.modeling import build_models, evaluate_cross_validation, load_processed_data, model_datasets
+    from src.tree_engine import compile_ensemble
+
+    results = []
+    X, y, feature_names, pipeline = load_processed_data(processed_path)
+    models = build_models()
+    datasets = model_datasets(models, X, feature_names, pipeline)
+    rows = len(y)
+
+    for name, (X_model, _) in datasets.items():
+        key = name.lower().replace(' ', '_')
+        _, measurement = measure(f'cross_validation_{key}', rows, evaluate_cross_validation, models[name], X_model, y, name)
+        results.append(measurement)
+
+        model, measurement = measure(f'fit_{key}', rows, models[name].fit, X_model, y)
+        results.append(measurement)
+
+        _, measurement = measure(f'predict_{key}', rows, model.predict, X_model)
+        results.append(measurement)
+        check_price_grid_layout(model, pipeline, sessions, key)
+
+        if hasattr(model, 'estimators_'):
+            compiled = compile_ensemble(model)
+            _, measurement = measure(f'predict_compiled_{key}', rows, compiled.predict, X_model)
+            results.append(measurement)
+            results.extend(batch_size_benchmarks(model, compiled, X_model, key))
+            check_price_grid_layout(compiled, pipeline, sessions, f'compiled_{key}')
+
+    return results
+
+
+def sparse_price_grid_check(sparse_path, sessions, max_rows=20_000):
+    """
+    Confere a grade de preços no formato CSR com um modelo pequeno treinado na matriz esparsa
+    (o que se confere é a montagem da grade, não a qualidade do modelo)
+    """
+    from sklearn.ensemble import GradientBoostingRegressor
+    from src.modeling import load_processed_data
+
+    X, y, _, pipeline = load_processed_data(sparse_path)
+    model = GradientBoostingRegressor(n_estimators=20, random_state=42).fit(X[:max_rows], y[:max_rows])
+    check_price_grid_layout(model, pipeline, sessions, 'sparse')
+
+
+def check_price_grid_layout(model, pipeline, sessions, key):
+    """
+    A grade de preços tem que repetir o predict_sessions no preço atual de cada sessão (ver check_price_grid)
+    """
+    from src.price_simulation import check_price_grid
+
+    difference = check_price_grid(model, pipeline, sessions)
+    print(f"{'':<40} | grade de preços ({key}) = predict_sessions, diferença máxima {difference:.3g}")
+
+
+def batch_size_benchmarks(model, compiled, X, key, sizes=COMPILED_BATCH_SIZES, min_rows=1_000):
+    """
+    Vazão do predict do scikit-learn e do modelo compilado em lotes de cada tamanho
+    Cada tamanho é repetido até somar min_rows linhas; a razão mostra a partir de que tamanho o compilado deixa de ganhar
+    """
+    results = []
+    for size in sizes:
+        batch = X.iloc[:size] if isinstance(X, pd.DataFrame) else X[:size]
+        size = batch.shape[0]
+        repeats = max(1, min_rows // size)
+        timings = {}
+        for name, predict in [(f'predict_{key}', model.predict), (f'predict_compiled_{key}', compiled.predict)]:
+            _, measurement = measure(
+                f'{name}_batch_{size}', size * repeats, lambda: [predict(batch) for _ in range(repeats)]
+            )
+            results.append(measurement)
+            timings[name] = measurement['wall_s']
+        print(f"{'':<40} | compilado / scikit-learn: {timings[f'predict_compiled_{key}'] / timings[f'predict_{key}']:.2f}x")
+
+    return results
+
+
+def run_benchmarks(sizes, work_dir, seed=42, max_model_rows=DEFAULT_MAX_MODEL_ROWS, chunksize=100_000):
+    """
+    Gera um arquivo sintético para cada tamanho e mede cada etapa do pipeline
+
+    Args:
+        sizes: Quantidades de linhas (ex.: [10_000, 100_000, 1_000_000, 10_000_000])
+        work_dir: Diretório dos arquivos gerados
+        seed: Semente do gerador sintético
+        max_model_rows: Acima desse tamanho os benchmarks de modelos são pulados
+        chunksize: Tamanho dos blocos no preprocessing em blocos
+
+    Returns:
+        Lista com as medidas de todos os benchmarks
+    """
+    # Importa antes os módulos carregados sob demanda, para não medir o tempo de importação
+    # (só o efeito de carregar o módulo interessa, por isso import_module em vez de um nome sem uso)
+    for module in PRELOADED_MODULES:
+        importlib.import_module(module)
+
+    results = []
+    for rows in sizes:
+        print(f"\n{rows} linhas")
+        csv_path = os.path.join(work_dir, f'bilheteria_{rows}.csv')
+        _, measurement = measure('generate_synthetic_csv', rows, write_bilheteria_csv, csv_path, rows, seed)
+        results.append(measurement)
+
+        size_dir = os.path.join(work_dir, str(rows))
+        os.makedirs(size_dir, exist_ok=True)
+        preprocessing_results, processed_path = preprocessing_benchmarks(csv_path, size_dir, rows, chunksize)
+        results.extend(preprocessing_results)
+
+        if rows <= max_model_rows:
+            sessions = load_raw_sessions(csv_path, nrows=PRICE_CHECK_SESSIONS)
+            results.extend(model_benchmarks(processed_path, sessions))
+            sparse_price_grid_check(os.path.join(size_dir, 'esparso.npz'), sessions)
+        else:
+            print(f"Benchmarks de modelos pulados (mais de {max_model_rows} linhas)")
+
+    return results
+
+
+def environment_info():
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    import sklearn
+
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'scikit-learn': sklearn.__version__,
+        'git_commit': commit,
+    }
+
+
+def compare_results(results, baseline, threshold=DEFAULT_REGRESSION_THRESHOLD):
+    """
+    Compara o tempo de cada benchmark com uma execução de referência
+
+    Args:
+        results: Medidas da execução atual
+        baseline: Medidas da execução de referência
+        threshold: Fator a partir do qual o benchmark é considerado regressão
+
+    Returns:
+        Lista com as regressões (benchmark, linhas e razão entre os tempos)
+    """
+    reference = {(item['benchmark'], item['rows']): item for item in baseline}
+    regressions = []
+
+    print("\nComparação com a referência")
+    for item in results:
+        previous = reference.get((item['benchmark'], item['rows']))
+        if previous is None or not previous['wall_s']:
+            continue
+        ratio = item['wall_s'] / previous['wall_s']
+        flag = 'REGRESSÃO' if ratio > threshold else ''
+        print(f"{item['benchmark']:<40} | {item['rows']:>10} linhas | {ratio:5.2f}x {flag}")
+        if ratio > threshold:
+            regressions.append({'benchmark': item['benchmark'], 'rows': item['rows'], 'ratio': ratio})
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks do pipeline com dados sintéticos')
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--max-model-rows', type=int, default=DEFAULT_MAX_MODEL_ROWS)
+    parser.add_argument('--chunksize', type=int, default=100_000)
+    parser.add_argument('--work-dir', help='Diretório dos arquivos gerados (padrão: diretório temporário)')
+    parser.add_argument('--output', default='benchmarks/results.json')
+    parser.add_argument('--compare', help='JSON de uma execução anterior para comparar')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_REGRESSION_THRESHOLD)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        work_dir = args.work_dir or temp_dir
+        os.makedirs(work_dir, exist_ok=True)
+        results = run_benchmarks(args.rows, work_dir, args.seed, args.max_model_rows, args.chunksize)
+
+    report = {
+        'created_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        'environment': environment_info(),
+        'seed': args.seed,
+        # O pico de memória é o do processo principal (não inclui os processos da validação cruzada)
+        'results': results,
+    }
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=4)
+    print(f"\nResultados salvos em: {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as file:
+            baseline = json.load(file)['results']
+        if compare_results(results, baseline, args.threshold):
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+# Gera arquivos sintéticos no mesmo formato do data/bilheteria.csv (UTF-8 com BOM, linha de metadados,
+# separador ';', datas 'dd/mm/YYYY - HH:MM', linhas CRLF e a última coluna vazia), com as
+# cardinalidades e proporções do arquivo real
+
+METADATA_ROW = 'Lista de sessões por espaço'
+
+COLUMNS = [
+    'Espaço', 'Evento', 'Tipo de Evento', 'Classificação Etária', 'Período do Cartaz - Data Início',
+    'Período do Cartaz - Data Fim', 'Tipo da Sessão', 'Data da Sessão', 'Valor do Ingresso',
+    'Quantidade de ingressos vendidos', 'Total de Vendas',
+]
+
+# Valores e frequências observados no data/bilheteria.csv
+VENUES = {
+    'Complexo Cultural Funarte SP': 141, 'Glauce Rocha': 124, 'Cacilda Becker': 109,
+    'Complexo Cultural MG': 71, 'Teatro Dulcina': 60, 'Teatro de Arena Eugênio Kusnet': 33,
+}
+EVENT_TYPES = {'Teatro': 341, 'Dança': 117, 'Outras': 56, 'Artes Integradas': 16, 'Circo': 5, 'Música': 3}
+AGE_RATINGS = {'Adulto': 292, 'Livre': 222, 'Infantil': 24}
+SESSION_TYPES = {'Fechada': 476, 'Aberta': 62}
+PRICES = {40: 80, 30: 49, 60: 48, 50: 40, 20: 16, 80: 3, 10: 3, 25: 3, 70: 2, 5: 1, 100: 1}
+SESSION_TIMES = {
+    '19:00': 110, '13:30': 77, '19:30': 68, '20:00': 64, '18:00': 50, '14:00': 46,
+    '16:00': 26, '10:00': 21, '15:00': 18, '20:30': 16,
+}
+
+ROWS_PER_EVENT = 3.56            # 538 sessões para 151 eventos
+NULL_PRICE_RATE = 292 / 538      # Valor do Ingresso vazio (sessão gratuita)
+NULL_QUANTITY_RATE = 95 / 538    # Quantidade de ingressos vendidos vazia
+FIRST_DAY = np.datetime64('2023-01-01')
+N_DAYS = 3 * 365
+
+
+def _choice(rng, frequencies, size):
+    values = np.array(list(frequencies))
+    weights = np.array(list(frequencies.values()), dtype=float)
+
+    return values[rng.choice(len(values), size=size, p=weights / weights.sum())]
+
+
+def _format_minutes(minutes):
+    """
+    Formata minutos desde a época como 'dd/mm/YYYY - HH:MM'
+    Formata apenas os valores distintos (poucos dias x horários) e replica com take
+    """
+    codes, uniques = pd.factorize(minutes)
+    formatted = pd.to_datetime(uniques.astype('datetime64[m]')).strftime('%d/%m/%Y - %H:%M').to_numpy()
+
+    return formatted[codes]
+
+
+def generate_events(n_events, seed=42):
+    """
+    Gera a tabela de eventos: espaço, tipo, classificação, período em cartaz e preço de cada evento
+
+    Returns:
+        Dicionário de arrays, um item por evento
+    """
+    rng = np.random.default_rng(seed)
+    start_day = FIRST_DAY + rng.integers(0, N_DAYS, n_events).astype('timedelta64[D]')
+    # Duração em cartaz: mediana de ~3 semanas, até ~3,5 meses (como no arquivo real)
+    duration = np.minimum(rng.exponential(25, n_events).astype(np.int64), 107)
+    start_hour = _choice(rng, {'19:00': 3, '18:00': 1, '14:00': 1}, n_events)
+    end_hour = _choice(rng, {'22:00': 3, '20:00': 1, '18:00': 1}, n_events)
+
+    start = start_day.astype('datetime64[m]') + _hours_to_minutes(start_hour)
+    end = (start_day + duration.astype('timedelta64[D]')).astype('datetime64[m]') + _hours_to_minutes(end_hour)
+
+    price = _choice(rng, PRICES, n_events).astype(float)
+    price[rng.random(n_events) < NULL_PRICE_RATE] = np.nan
+
+    return {
+        'Espaço': _choice(rng, VENUES, n_events),
+        'Evento': np.char.add('Evento ', np.arange(n_events).astype(str)),
+        'Tipo de Evento': _choice(rng, EVENT_TYPES, n_events),
+        'Classificação Etária': _choice(rng, AGE_RATINGS, n_events),
+        'Tipo da Sessão': _choice(rng, SESSION_TYPES, n_events),
+        'start': start.astype(np.int64),
+        'end': end.astype(np.int64),
+        'duration': duration,
+        'price': price,
+        # Popularidade do evento: multiplica a quantidade vendida de todas as sessões
+        'popularity': rng.lognormal(0, 0.8, n_events),
+    }
+
+
+def _hours_to_minutes(hours):
+    parts = np.char.partition(hours.astype(str), ':')
+    minutes = parts[:, 0].astype(np.int64) * 60 + parts[:, 2].astype(np.int64)
+
+    return minutes.astype('timedelta64[m]')
+
+
+def generate_sessions(events, n_rows, seed=42):
+    """
+    Gera n_rows sessões de eventos sorteados da tabela de eventos, no formato do bilheteria.csv
+
+    Returns:
+        DataFrame com as colunas de COLUMNS (valores como texto ou inteiros, nulos como NA)
+    """
+    rng = np.random.default_rng(seed)
+    event = rng.integers(0, len(events['Evento']), n_rows)
+
+    # Dia da sessão dentro do período em cartaz (às vezes até 2 dias antes, como no arquivo real)
+    start_day = events['start'][event] // (24 * 60)
+    day = start_day + np.floor(rng.random(n_rows) * (events['duration'][event] + 3)).astype(np.int64) - 2
+    session = day * 24 * 60 + _hours_to_minutes(_choice(rng, SESSION_TIMES, n_rows)).astype(np.int64)
+
+    price = events['price'][event]
+    free = np.isnan(price)
+    # Sessões gratuitas vendem mais; mediana de ~20 ingressos por sessão
+    quantity = np.ceil(rng.lognormal(3.0, 1.0, n_rows) * events['popularity'][event] * np.where(free, 1.5, 1.0))
+    quantity[rng.random(n_rows) < NULL_QUANTITY_RATE] = np.nan
+    total = price * quantity
+
+    data = {col: events[col][event] for col in ['Espaço', 'Evento', 'Tipo de Evento', 'Classificação Etária']}
+    data['Período do Cartaz - Data Início'] = _format_minutes(events['start'][event])
+    data['Período do Cartaz - Data Fim'] = _format_minutes(events['end'][event])
+    data['Tipo da Sessão'] = events['Tipo da Sessão'][event]
+    data['Data da Sessão'] = _format_minutes(session)
+    data['Valor do Ingresso'] = pd.array(price, dtype='Int64')
+    data['Quantidade de ingressos vendidos'] = pd.array(quantity, dtype='Int64')
+    data['Total de Vendas'] = pd.array(total, dtype='Int64')
+
+    return pd.DataFrame(data, columns=COLUMNS)
+
+
+def write_bilheteria_csv(path, n_rows, seed=42, chunk_rows=1_000_000):
+    """
+    Gera um arquivo sintético com n_rows sessões no formato exato do bilheteria.csv
+    As sessões são geradas e gravadas em blocos, então a memória não cresce com n_rows
+
+    Args:
+        path: Caminho do arquivo gerado
+        n_rows: Quantidade de sessões
+        seed: Semente dos sorteios (mesma semente, mesmo arquivo)
+        chunk_rows: Quantidade de sessões geradas por bloco
+
+    Returns:
+        Caminho do arquivo gerado
+    """
+    n_events = max(1, round(n_rows / ROWS_PER_EVENT))
+    events = generate_events(n_events, seed)
+
+    with open(path, 'w', encoding='utf-8-sig', newline='') as file:
+        file.write(METADATA_ROW + ';' * len(COLUMNS) + '\r\n')
+        file.write(';'.join(COLUMNS) + ';\r\n')
+
+        for i, start in enumerate(range(0, n_rows, chunk_rows)):
+            chunk = generate_sessions(events, min(chunk_rows, n_rows - start), seed + 1 + i)
+            # Coluna vazia no final, como no arquivo exportado
+            chunk[''] = None
+            chunk.to_csv(file, sep=';', header=False, index=False, lineterminator='\r\n')
+
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Gera um bilheteria.csv sintético')
+    parser.add_argument('rows', type=int)
+    parser.add_argument('--output', default='data/bilheteria_sintetico.csv')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    write_bilheteria_csv(args.output, args.rows, args.seed)
+    print(f"Arquivo gerado: {args.output} ({args.rows} sessões)")
+
+
+if __name__ == "__main__":
+    main()
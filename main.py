@@ -1,11 +1,110 @@
-from src.data_exploration import data_exploration
-from src.preprocessing import preprocessing
-from src.modeling import modeling, load_model
-import pandas as pd
+import argparse
+import sys
+
+from src.cli import COMMANDS, main as cli_main
+from src.instrumentation import configure_from_env, step
+from src.pipeline_runner import Stage, code_dependencies, run_stages
 
 data_path = "data/bilheteria.csv"
-processed_data_path = "data/bilheteria_processado.csv"
+processed_data_path = "data/bilheteria_processado"
+processed_csv_path = "data/bilheteria_processado.csv"
+profile_path = "data/bilheteria_profile.json"
+# Arquivos do modelo salvos pelo save_model (o Gradient Boosting é o vencedor com os dados atuais;
+# se outro modelo vencer, os arquivos abaixo não existem e a etapa modeling é executada de novo)
+model_path = "models/gradient_boosting_model.pkl"
+model_pipeline_path = "models/gradient_boosting_pipeline.json"
+compiled_model_path = "models/gradient_boosting_compiled"
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description='Executa o pipeline completo; etapas sem mudanças são puladas (ver src/pipeline_runner.py)'
+    )
+    parser.add_argument('--force', action='store_true', help='Executa todas as etapas, mesmo sem mudanças')
+    parser.add_argument('--preview', action='store_true', help='Gera os gráficos em baixa resolução')
+    return parser.parse_args(argv)
+
+
+# Com um subcomando (explore, preprocess, train, retrain, predict, startup, models), executa só ele (ver src/cli.py)
+# Sem subcomando, executa o pipeline completo
+if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+    sys.exit(cli_main(sys.argv[1:]))
+
+args = parse_args(sys.argv[1:])
+preview = args.preview
+
+
+# As funções importam os módulos apenas quando a etapa é executada,
+# assim uma execução sem mudanças não paga o custo de importar pandas, sklearn e matplotlib
+def run_data_exploration():
+    from src.data_exploration import data_exploration
+    data_exploration(data_path, charts=False, profile_path=profile_path)
+
+
+def run_preprocessing():
+    from src.preprocessing import preprocessing
+    # Sem o pipeline ajustado a modelagem não tem o que ler: a etapa falha em vez de seguir
+    if preprocessing(data_path, processed_csv_path, charts=False) is None:
+        raise RuntimeError(f"O pré-processamento de {data_path} não gerou o pipeline")
+
+
+def run_modeling():
+    from src.modeling import modeling
+    modeling(processed_data_path)
+
+
+# Os gráficos ficam em uma etapa própria, depois da modelagem, e são gerados em paralelo
+def run_charts():
+    from src.chart_rendering import EXPLORATION_CHARTS, PREPROCESSING_CHARTS, render_charts
+    from src.data_profile import load_profile
+    from src.storage import load_columnar_dataset
+
+    # Os gráficos da exploração usam o perfil gravado pela etapa data_exploration, sem ler o dataset bruto
+    with step('charts'):
+        profile = load_profile(profile_path)
+        processed_data = load_columnar_dataset(processed_data_path)
+        render_charts(
+            [(EXPLORATION_CHARTS, profile, 'data_exploration'), (PREPROCESSING_CHARTS, processed_data, 'preprocessing')],
+            preview=preview,
+        )
+
+
+# O código de cada etapa inclui os módulos do projeto que ela importa (ver code_dependencies)
+stages = [
+    Stage(
+        'data_exploration',
+        run_data_exploration,
+        inputs=[data_path],
+        outputs=[profile_path],
+        code=code_dependencies('src/data_exploration.py', 'src/data_profile.py'),
+        params={'data_path': data_path},
+    ),
+    Stage(
+        'preprocessing',
+        run_preprocessing,
+        inputs=[data_path],
+        outputs=[processed_data_path, processed_csv_path],
+        code=code_dependencies('src/preprocessing.py', 'src/storage.py'),
+        params={'data_path': data_path, 'output_path': processed_csv_path},
+    ),
+    Stage(
+        'modeling',
+        run_modeling,
+        inputs=[processed_data_path, 'data/bilheteria_processado_pipeline.json'],
+        outputs=[model_path, model_pipeline_path, compiled_model_path],
+        code=code_dependencies('src/modeling.py'),
+        params={'data_path': processed_data_path},
+    ),
+    Stage(
+        'charts',
+        run_charts,
+        inputs=[profile_path, processed_data_path],
+        outputs=['outputs/data_exploration', 'outputs/preprocessing'],
+        code=code_dependencies('src/chart_rendering.py', 'src/data_profile.py', 'src/storage.py'),
+        params={'preview': preview},
+    ),
+]
 
-data_exploration(data_path)
-preprocessing(data_path)
-modeling(processed_data_path)
+# Métricas e perfis de cada etapa: PIPELINE_METRICS, PIPELINE_METRICS_FORMAT e PIPELINE_PROFILE (ver src/instrumentation.py)
+configure_from_env()
+run_stages(stages, force=args.force)
@@ -0,0 +1,199 @@
+import io
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .inference import load_compiled_model, load_model, load_model_pipeline, predict_sessions
+    from .instrumentation import instrumented, step
+    from .preprocessing import load_raw_sessions
+    from .storage import load_columnar_dataset, save_columnar_dataset
+except ImportError:
+    from inference import load_compiled_model, load_model, load_model_pipeline, predict_sessions
+    from instrumentation import instrumented, step
+    from preprocessing import load_raw_sessions
+    from storage import load_columnar_dataset, save_columnar_dataset
+
+# Previsão em lote de um arquivo de sessões no formato do bilheteria.csv (ex.: a programação da temporada)
+# O arquivo é dividido em faixas de bytes terminadas em quebra de linha. Cada processo do pool carrega o
+# modelo e o pipeline uma única vez, lê a própria faixa e prevê; o processo principal não lê o CSV, só
+# grava as previsões em ordem. Poucas faixas ficam em andamento ao mesmo tempo: a memória não depende
+# do tamanho do arquivo
+# As faixas são cortadas em quebras de linha, então campos entre aspas não podem conter quebras de linha
+
+KEY_COLUMNS = ['Espaço', 'Evento', 'Data da Sessão']
+
+PREDICTION_COLUMN = 'Previsão de ingressos vendidos'
+
+# Bytes do CSV lidos por faixa (cerca de 130 mil sessões, perto de 400 MB por processo)
+BLOCK_BYTES = 16 * 1024 * 1024
+
+# Valores distintos das colunas de texto das chaves, gravadas no formato colunar como códigos
+CATEGORIES_FILE = 'categories.json'
+
+# Modelo, pipeline e cabeçalho do CSV de cada processo do pool, carregados em _init_worker
+_WORKER = {}
+
+
+def header_bytes(data_path):
+    """
+    Primeiras duas linhas do arquivo (linha de título e cabeçalho), acrescentadas antes de cada faixa
+    """
+    with open(data_path, 'rb') as file:
+        return file.readline() + file.readline()
+
+
+def byte_ranges(data_path, block_bytes=BLOCK_BYTES):
+    """
+    Divide o arquivo (sem o cabeçalho) em faixas de cerca de block_bytes terminadas em quebra de linha
+    Só lê uma linha por faixa para achar o corte, sem percorrer o arquivo
+
+    Returns:
+        Lista de tuplas (início, fim) em bytes
+    """
+    size = os.path.getsize(data_path)
+    ranges = []
+    with open(data_path, 'rb') as file:
+        file.readline()
+        file.readline()
+        start = file.tell()
+        while start < size:
+            file.seek(min(start + block_bytes, size))
+            file.readline()
+            end = min(file.tell(), size)
+            ranges.append((start, end))
+            start = end
+
+    return ranges
+
+
+def _init_worker(model_path, compiled, data_path):
+    # As mensagens de carregamento de cada processo não se repetem na saída
+    with redirect_stdout(io.StringIO()):
+        model = load_compiled_model(model_path) if compiled else load_model(model_path)
+        pipeline = load_model_pipeline(model_path)
+    # Cada processo prevê com uma thread: o paralelismo vem do pool
+    if hasattr(model, 'n_jobs'):
+        model.n_jobs = 1
+    _WORKER.update(model=model, pipeline=pipeline, header=header_bytes(data_path), data_path=data_path)
+
+
+def score_range(start, end):
+    """
+    Lê uma faixa de bytes do arquivo e prevê as sessões dela (no processo do pool)
+
+    Returns:
+        Dicionário com as colunas das chaves e as previsões
+    """
+    with open(_WORKER['data_path'], 'rb') as file:
+        file.seek(start)
+        block = file.read(end - start)
+
+    sessions = load_raw_sessions(io.BytesIO(_WORKER['header'] + block))
+    predictions = predict_sessions(_WORKER['model'], _WORKER['pipeline'], sessions)
+
+    result = {col: sessions[col].array for col in KEY_COLUMNS}
+    result[PREDICTION_COLUMN] = np.asarray(predictions, dtype=np.float32)
+
+    return result
+
+
+def _encode_keys(result, categories):
+    """
+    Troca os textos das chaves por códigos no vocabulário global de cada coluna (que cresce a cada faixa)
+    """
+    columns = {}
+    for col in KEY_COLUMNS:
+        values = result[col]
+        if isinstance(values, pd.Categorical):
+            positions = categories.setdefault(col, {})
+            lookup = np.array(
+                [positions.setdefault(value, len(positions)) for value in values.categories] + [-1], dtype=np.int32
+            )
+            columns[col] = lookup[values.codes]
+        else:
+            columns[col] = np.asarray(values)
+    columns[PREDICTION_COLUMN] = result[PREDICTION_COLUMN]
+
+    return pd.DataFrame(columns, copy=False)
+
+
+@instrumented('batch_scoring')
+def score_sessions_file(data_path, model_path, output_path, compiled=False, n_jobs=-1, block_bytes=BLOCK_BYTES):
+    """
+    Prevê todas as sessões de um arquivo no formato do bilheteria.csv e grava as previsões com as chaves
+    (Espaço, Evento, Data da Sessão) no formato binário colunar, na ordem do arquivo
+    Usa as mesmas transformações do predict (pipeline salvo junto do modelo)
+
+    Args:
+        data_path: Arquivo de sessões
+        model_path: Arquivo .pkl ou modelo do registro
+        output_path: Diretório do dataset colunar com as previsões
+        compiled: Se True, usa o modelo compilado (tree_engine)
+        n_jobs: Processos do pool (ver cross_validation.cpu_budget)
+        block_bytes: Bytes do CSV lidos por faixa
+
+    Returns:
+        Quantidade de sessões previstas
+    """
+    try:
+        from .cross_validation import cpu_budget
+    except ImportError:
+        from cross_validation import cpu_budget
+
+    ranges = byte_ranges(data_path, block_bytes)
+    workers = max(1, min(cpu_budget(n_jobs), len(ranges)))
+    categories = {}
+    rows = 0
+
+    def write(result):
+        nonlocal rows
+        frame = _encode_keys(result, categories)
+        dtypes = {col: frame[col].dtype for col in frame.columns}
+        save_columnar_dataset(output_path, frame, dtypes, append=rows > 0)
+        rows += len(frame)
+
+    with step('score_ranges', rows_in=0) as record:
+        if workers == 1:
+            _init_worker(model_path, compiled, data_path)
+            for start, end in ranges:
+                write(score_range(start, end))
+        else:
+            with ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_worker, initargs=(model_path, compiled, data_path)
+            ) as executor:
+                # No máximo duas faixas por processo em andamento; as previsões são gravadas na ordem do arquivo
+                pending = deque()
+                for start, end in ranges:
+                    pending.append(executor.submit(score_range, start, end))
+                    if len(pending) >= 2 * workers:
+                        write(pending.popleft().result())
+                while pending:
+                    write(pending.popleft().result())
+        record.rows_in = record.rows_out = rows
+
+    os.makedirs(output_path, exist_ok=True)
+    with open(os.path.join(output_path, CATEGORIES_FILE), 'w', encoding='utf-8') as file:
+        json.dump({col: list(positions) for col, positions in categories.items()}, file, ensure_ascii=False)
+
+    print(f"{rows} sessões previstas em {output_path} ({len(ranges)} faixas, {workers} processos)")
+
+    return rows
+
+
+def load_scored_sessions(path, mmap=True):
+    """
+    Carrega as previsões gravadas com score_sessions_file, com as chaves de texto como category
+    """
+    frame = load_columnar_dataset(path, mmap=mmap)
+    with open(os.path.join(path, CATEGORIES_FILE), encoding='utf-8') as file:
+        categories = json.load(file)
+    for col, values in categories.items():
+        frame[col] = pd.Categorical.from_codes(frame[col].to_numpy(), categories=values)
+
+    return frame
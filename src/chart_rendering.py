@@ -0,0 +1,208 @@
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+try:
+    from . import visualization
+    from .data_profile import select_columns
+    from .pipeline_runner import code_dependencies
+except ImportError:
+    import visualization
+    from data_profile import select_columns
+    from pipeline_runner import code_dependencies
+
+CACHE_FILE = '.charts.json'
+PREVIEW_DPI = 72
+
+
+class Chart:
+    """
+    Gráfico gerado por uma função de visualization.py
+
+    Args:
+        name: Nome da função em visualization.py (recebe data e folder_name)
+        file_name: Arquivo gerado pela função em outputs/<pasta>
+        columns: Colunas usadas pelo gráfico. Apenas elas (do DataFrame ou do perfil) são enviadas
+            ao processo que desenha o gráfico e entram no hash dos dados (None usa todas)
+    """
+
+    def __init__(self, name, file_name, columns=None):
+        self.name = name
+        self.file_name = file_name
+        self.columns = columns
+
+
+EXPLORATION_CHARTS = [
+    Chart('histogram', '01_histogramas.png'),
+    Chart('distribution_by_type_of_event', '02_tipo_evento.png', ['Tipo de Evento']),
+    Chart('distribution_by_type_of_age_rating', '03_classificacao_etaria.png', ['Classificação Etária']),
+    Chart('distribution_by_type_of_session', '04_tipo_sessao.png', ['Tipo da Sessão']),
+    Chart('distribution_by_null_values', '05_valores_nulos.png'),
+    Chart(
+        'relationship_between_ticket_price_and_quantity_sold', '06_valor_vs_quantidade.png',
+        ['Valor do Ingresso', 'Quantidade de ingressos vendidos']
+    ),
+]
+
+PREPROCESSING_CHARTS = [
+    Chart('correlation_heatmap', '07_heatmap_correlacao.png'),
+]
+
+
+def data_hash(data):
+    """
+    Hash do conteúdo de um DataFrame (nomes, tipos e valores das colunas) ou de um perfil do dataset
+    """
+    digest = hashlib.sha256()
+    if isinstance(data, dict):
+        digest.update(json.dumps(data, sort_keys=True).encode('utf-8'))
+        return digest.hexdigest()
+    digest.update(json.dumps([[str(col), str(dtype)] for col, dtype in data.dtypes.items()]).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(data, index=False).to_numpy().tobytes())
+
+    return digest.hexdigest()
+
+
+def chart_input(data, columns):
+    """
+    Dados enviados a um gráfico: as colunas informadas do DataFrame ou do perfil (None usa todas)
+    """
+    if columns is None:
+        return data
+    if isinstance(data, dict):
+        return select_columns(data, columns)
+
+    return data[columns]
+
+
+def visualization_code_hash():
+    """
+    Hash do código dos gráficos: visualization.py e os módulos do projeto que ele importa (ver code_dependencies)
+    """
+    digest = hashlib.sha256()
+    for path in code_dependencies(visualization.__file__):
+        digest.update(os.path.basename(path).encode('utf-8'))
+        with open(path, 'rb') as file:
+            digest.update(file.read())
+
+    return digest.hexdigest()
+
+
+def chart_fingerprint(chart, data, options, code_hash):
+    """
+    Impressão digital de um gráfico: dados usados, opções de saída e código de visualization.py
+    (com os módulos que ele importa)
+    """
+    content = {
+        'chart': chart.name,
+        'data': data_hash(data),
+        'options': options,
+        'code': code_hash,
+    }
+
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def load_chart_cache(folder_name):
+    path = os.path.join('outputs', folder_name, CACHE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def save_chart_cache(folder_name, cache):
+    path = os.path.join('outputs', folder_name, CACHE_FILE)
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(cache, file, indent=4)
+
+
+def _render_chart(name, data, folder_name, options):
+    """
+    Desenha um gráfico (executado nos processos do pool)
+    """
+    visualization.set_output_options(**options)
+    start = time.perf_counter()
+    getattr(visualization, name)(data, folder_name)
+
+    return time.perf_counter() - start
+
+
+def render_charts(jobs, preview=False, file_format='png', max_workers=None, force=False):
+    """
+    Gera os gráficos em paralelo, em um pool de processos com o backend Agg (sem interface gráfica)
+    Cada gráfico recebe apenas as colunas que usa, e é pulado quando os dados, as opções de saída e o
+    código de visualization.py e dos módulos que ele importa não mudaram desde a última geração (hash salvo em outputs/<pasta>/.charts.json)
+
+    Args:
+        jobs: Lista de tuplas (lista de Chart, DataFrame ou perfil do dataset, pasta em outputs/)
+        preview: Se True, gera uma prévia rápida com resolução de 72 dpi
+        file_format: 'png' ou 'svg'
+        max_workers: Quantidade de processos (padrão: um por gráfico, limitado aos núcleos)
+        force: Se True, gera todos os gráficos mesmo sem mudanças
+
+    Returns:
+        Lista de dicionários com o gráfico, status ('gerado', 'pulado' ou 'erro') e duração
+    """
+    options = {'dpi': PREVIEW_DPI if preview else None, 'file_format': file_format}
+    visualization.set_output_options(**options)
+    code_hash = visualization_code_hash()
+
+    pending = []
+    report = []
+    caches = {}
+    for charts, data, folder_name in jobs:
+        os.makedirs(os.path.join('outputs', folder_name), exist_ok=True)
+        cache = caches.setdefault(folder_name, load_chart_cache(folder_name))
+
+        for chart in charts:
+            chart_data = chart_input(data, chart.columns)
+            file_name = visualization.output_file_name(chart.file_name)
+            fingerprint = chart_fingerprint(chart, chart_data, options, code_hash)
+            path = os.path.join('outputs', folder_name, file_name)
+            previous_mtime = os.stat(path).st_mtime_ns if os.path.exists(path) else None
+
+            if not force and cache.get(file_name) == fingerprint and previous_mtime is not None:
+                report.append({'chart': f'{folder_name}/{file_name}', 'status': 'pulado', 'seconds': 0.0})
+            else:
+                pending.append((chart, chart_data, folder_name, file_name, fingerprint, previous_mtime))
+                cache.pop(file_name, None)
+
+    if pending:
+        max_workers = max_workers or min(len(pending), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(_render_chart, chart.name, chart_data, folder_name, options)
+                for chart, chart_data, folder_name, _, _, _ in pending
+            ]
+            for future, (chart, _, folder_name, file_name, fingerprint, previous_mtime) in zip(futures, pending):
+                seconds = future.result()
+                # As funções de visualization.py tratam os próprios erros: o hash só é guardado
+                # se o arquivo foi gravado nesta execução
+                path = os.path.join('outputs', folder_name, file_name)
+                if os.path.exists(path) and os.stat(path).st_mtime_ns != previous_mtime:
+                    caches[folder_name][file_name] = fingerprint
+                    status = 'gerado'
+                else:
+                    status = 'erro'
+                report.append({'chart': f'{folder_name}/{file_name}', 'status': status, 'seconds': seconds})
+
+    for folder_name, cache in caches.items():
+        save_chart_cache(folder_name, cache)
+
+    print_chart_report(report)
+
+    return report
+
+
+def print_chart_report(report):
+    """
+    Mostra quais gráficos foram gerados ou pulados e quanto tempo cada um levou
+    """
+    print("\nGráficos")
+    for item in report:
+        print(f"{item['chart']:<45} | {item['status']:<7} | {item['seconds']:.2f}s")
@@ -0,0 +1,402 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from contextlib import redirect_stdout
+
+# Cada subcomando importa apenas os módulos de que precisa, dentro da própria função:
+# prever com o modelo compilado não importa o scikit-learn nem as bibliotecas de gráficos
+
+# Tempo máximo (ms) para o subcomando predict com o modelo compilado: do início do processo até a previsão
+PREDICT_STARTUP_BUDGET_MS = 1000
+
+# Módulos que não devem ser importados ao prever com o modelo compilado
+HEAVY_MODULES = ['sklearn', 'scipy', 'matplotlib', 'seaborn', 'joblib']
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def explore(args):
+    try:
+        from .data_exploration import data_exploration
+    except ImportError:
+        from data_exploration import data_exploration
+    data_exploration(
+        args.data, charts=not args.no_charts, preview=args.preview, profile_path=args.report, chunksize=args.chunksize
+    )
+
+
+def preprocess(args):
+    try:
+        from .preprocessing import HighCardinalityEncoder, preprocessing
+    except ImportError:
+        from preprocessing import HighCardinalityEncoder, preprocessing
+    encoder = None
+    if args.target_encode or args.hash:
+        encoder = HighCardinalityEncoder(
+            hashed_columns=args.hash, n_buckets=args.hash_buckets, target_columns=args.target_encode
+        )
+    pipeline = preprocessing(
+        args.data, args.output, chunksize=args.chunksize, sparse=args.sparse, export_csv=not args.no_csv,
+        charts=not args.no_charts, preview=args.preview, encoder=encoder
+    )
+    return 0 if pipeline is not None else 1
+
+
+def train(args):
+    try:
+        from .modeling import modeling
+    except ImportError:
+        from modeling import modeling
+    modeling(
+        args.data, args.output_dir, search_budget=args.search_budget, search_clock=args.search_clock,
+        final_model=args.final_model, n_jobs=args.n_jobs, register=not args.no_register
+    )
+
+
+def shards(args):
+    try:
+        from .sharded_training import sharded_training
+    except ImportError:
+        from sharded_training import sharded_training
+    sharded_training(
+        args.data, args.output_dir, by=args.by, model_name=args.model_name, n_jobs=args.n_jobs,
+        min_rows=args.min_rows, global_model=args.global_model, force=args.force
+    )
+
+
+def retrain(args):
+    try:
+        from .incremental_training import incremental_training
+    except ImportError:
+        from incremental_training import incremental_training
+    report = incremental_training(
+        args.data, args.processed, args.model, args.output_dir, n_new_estimators=args.trees,
+        error_threshold=args.error_threshold, drift_threshold=args.drift_threshold, tolerance=args.tolerance
+    )
+    print(f"Decisão: {report['decision']}")
+
+
+def read_sessions(input_path):
+    """
+    Lê as sessões a prever: JSON (uma sessão ou lista), CSV no formato do bilheteria.csv ou JSON da entrada padrão
+    """
+    if input_path in (None, '-'):
+        return json.load(sys.stdin)
+    if input_path.endswith('.csv'):
+        try:
+            from .preprocessing import load_raw_sessions
+        except ImportError:
+            from preprocessing import load_raw_sessions
+        return load_raw_sessions(input_path)
+    with open(input_path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def predict(args):
+    try:
+        from .inference import load_compiled_model, load_model, load_model_pipeline, predict_sessions
+        from .instrumentation import step
+    except ImportError:
+        from inference import load_compiled_model, load_model, load_model_pipeline, predict_sessions
+        from instrumentation import step
+
+    if args.shards:
+        try:
+            from .sharded_training import load_sharded_model
+        except ImportError:
+            from sharded_training import load_sharded_model
+
+    # As mensagens de carregamento vão para stderr, para que stdout tenha apenas o JSON das previsões
+    with redirect_stdout(sys.stderr), step('predict'):
+        with step('load_model'):
+            if args.shards:
+                model = load_sharded_model(args.shards)
+            else:
+                model = load_compiled_model(args.model) if args.compiled else load_model(args.model)
+                pipeline = load_model_pipeline(args.model)
+
+        sessions = read_sessions(args.input)
+        with step('predict_sessions') as record:
+            if args.shards:
+                predictions = model.predict(sessions).tolist()
+            else:
+                predictions = predict_sessions(model, pipeline, sessions).tolist()
+            # Uma previsão por sessão (a entrada pode ser uma única sessão em um dicionário)
+            record.rows_in = record.rows_out = len(predictions)
+    content = json.dumps({'predictions': predictions})
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(content)
+    else:
+        print(content)
+
+
+def score(args):
+    try:
+        from .batch_scoring import score_sessions_file
+    except ImportError:
+        from batch_scoring import score_sessions_file
+    score_sessions_file(
+        args.data, args.model, args.output, compiled=args.compiled, n_jobs=args.n_jobs,
+        block_bytes=int(args.block_mb * 1024 * 1024)
+    )
+
+
+def simulate(args):
+    try:
+        from .inference import load_compiled_model, load_model, load_model_pipeline
+        from .price_simulation import check_price_grid, price_grid, simulate_prices
+    except ImportError:
+        from inference import load_compiled_model, load_model, load_model_pipeline
+        from price_simulation import check_price_grid, price_grid, simulate_prices
+
+    model = load_compiled_model(args.model) if args.compiled else load_model(args.model)
+    pipeline = load_model_pipeline(args.model)
+    sessions = read_sessions(args.data)
+    prices = price_grid(*args.prices)
+    if args.check:
+        difference = check_price_grid(model, pipeline, sessions)
+        print(f"Grade de preços confere com o predict de cada sessão (diferença máxima: {difference:.3g})")
+    result, _ = simulate_prices(model, pipeline, sessions, prices)
+
+    if args.output:
+        result.to_csv(args.output, index=False)
+        print(f"{len(result)} sessões x {len(prices)} preços simulados, salvos em {args.output}")
+    else:
+        print(result.to_string(index=False))
+
+
+def models(args):
+    try:
+        from .model_registry import print_registry, verify_version
+    except ImportError:
+        from model_registry import print_registry, verify_version
+
+    if args.verify:
+        changed = verify_version(args.verify)
+        print(f"Arquivos alterados: {', '.join(changed)}" if changed else "OK")
+        return 1 if changed else 0
+    print_registry(args.registry)
+
+
+def measure_predict_startup(model_path, session, compiled=True, repeats=5):
+    """
+    Mede o tempo do subcomando predict em processos novos (inicialização do Python, importações,
+    carregamento do modelo e previsão de uma sessão) e quais módulos pesados foram importados
+
+    Returns:
+        Dicionário com o menor tempo total (ms), o tempo de cada execução e os módulos pesados importados
+    """
+    argv = ['predict', '--model', model_path] + (['--compiled'] if compiled else [])
+    child = (
+        "import json, sys\n"
+        "from src.cli import main\n"
+        f"main({argv!r})\n"
+        f"print(json.dumps(sorted(m for m in {HEAVY_MODULES!r} if m in sys.modules)), file=sys.stderr)\n"
+    )
+    body = json.dumps(session)
+
+    timings = []
+    heavy_modules = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, '-c', child], input=body, capture_output=True, text=True, cwd=ROOT_DIR, check=True
+        )
+        timings.append((time.perf_counter() - start) * 1000)
+        heavy_modules = json.loads(result.stderr.strip().splitlines()[-1])
+
+    return {'startup_ms': min(timings), 'runs_ms': timings, 'heavy_modules': heavy_modules}
+
+
+def startup(args):
+    """
+    Verifica se o predict com o modelo compilado continua dentro do orçamento de inicialização
+    e sem importar módulos pesados (retorna 1 se não estiver)
+    """
+    try:
+        from .load_generator import load_sample_sessions
+    except ImportError:
+        from load_generator import load_sample_sessions
+
+    session = load_sample_sessions(args.data, limit=1)
+    result = measure_predict_startup(os.path.abspath(args.model), session, repeats=args.repeats)
+    budget_ms = args.budget_ms
+
+    print(f"Inicialização do predict (modelo compilado): {result['startup_ms']:.0f} ms (orçamento: {budget_ms} ms)")
+    print(f"Execuções: {', '.join(f'{ms:.0f}' for ms in result['runs_ms'])} ms")
+
+    ok = True
+    if result['startup_ms'] > budget_ms:
+        print("Acima do orçamento de inicialização")
+        ok = False
+    if result['heavy_modules']:
+        print(f"Módulos pesados importados: {', '.join(result['heavy_modules'])}")
+        ok = False
+    if ok:
+        print("OK")
+
+    return 0 if ok else 1
+
+
+COMMANDS = ['explore', 'preprocess', 'train', 'shards', 'retrain', 'predict', 'score', 'simulate', 'startup', 'models']
+
+
+def build_parser():
+    # Instrumentação (ver instrumentation.py), aceita por todos os subcomandos
+    # Sem as opções, valem as variáveis de ambiente PIPELINE_*
+    instrumentation = argparse.ArgumentParser(add_help=False)
+    instrumentation.add_argument('--metrics', help='Arquivo das métricas de cada passo (tempo, CPU, memória e linhas)')
+    instrumentation.add_argument('--metrics-format', choices=['json', 'prometheus'], help='Logs JSON ou texto do Prometheus')
+    instrumentation.add_argument('--profile', choices=['cprofile', 'sampling'], help='Perfila cada etapa')
+    instrumentation.add_argument('--profile-dir', help='Diretório dos perfis')
+
+    parser = argparse.ArgumentParser(description='Previsão de vendas de ingressos')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    parser_explore = subparsers.add_parser('explore', help='Resumo do dataset e gráficos da exploração', parents=[instrumentation])
+    parser_explore.add_argument('--data', default='data/bilheteria.csv')
+    parser_explore.add_argument('--no-charts', action='store_true', help='Não gera os gráficos')
+    parser_explore.add_argument('--preview', action='store_true', help='Gráficos em baixa resolução')
+    parser_explore.add_argument('--report', default=None, help='Arquivo JSON do perfil (padrão: <dataset>_profile.json)')
+    parser_explore.add_argument('--chunksize', type=int, default=100_000, help='Linhas lidas por bloco')
+    parser_explore.set_defaults(func=explore)
+
+    parser_preprocess = subparsers.add_parser('preprocess', help='Processa o dataset e ajusta o pipeline', parents=[instrumentation])
+    parser_preprocess.add_argument('--data', default='data/bilheteria.csv')
+    parser_preprocess.add_argument('--output', default='data/bilheteria_processado.csv')
+    parser_preprocess.add_argument('--chunksize', type=int, help='Processa o dataset em blocos')
+    parser_preprocess.add_argument('--sparse', action='store_true', help='Salva as features como matriz esparsa')
+    parser_preprocess.add_argument('--no-csv', action='store_true', help='Não gera o CSV processado')
+    parser_preprocess.add_argument('--no-charts', action='store_true', help='Não gera o heatmap de correlação')
+    parser_preprocess.add_argument('--preview', action='store_true', help='Heatmap em baixa resolução')
+    parser_preprocess.add_argument(
+        '--target-encode', nargs='+', metavar='COLUNA', help='Colunas codificadas pela média do alvo (fora da dobra)'
+    )
+    parser_preprocess.add_argument('--hash', nargs='+', metavar='COLUNA', help='Colunas codificadas com hashing')
+    parser_preprocess.add_argument('--hash-buckets', type=int, default=32, help='Baldes do hashing por coluna')
+    parser_preprocess.set_defaults(func=preprocess)
+
+    parser_train = subparsers.add_parser('train', help='Compara os modelos e salva o melhor', parents=[instrumentation])
+    parser_train.add_argument('--data', default='data/bilheteria_processado')
+    parser_train.add_argument('--output-dir', default='models')
+    parser_train.add_argument('--search-budget', type=float, help='Busca de hiperparâmetros com esse orçamento (s)')
+    parser_train.add_argument('--search-clock', choices=['wall', 'cpu'], default='wall')
+    parser_train.add_argument(
+        '--final-model', choices=['split', 'refit', 'folds'], default='split',
+        help='Modelo salvo: treino com 80%%, todos os dados ou ensemble das dobras'
+    )
+    parser_train.add_argument('--n-jobs', type=int, default=-1, help='Núcleos da validação cruzada (dobras x árvores)')
+    parser_train.add_argument('--no-register', action='store_true', help='Não registra o modelo em <output-dir>/registry')
+    parser_train.set_defaults(func=train)
+
+    parser_shards = subparsers.add_parser(
+        'shards', help='Treina um modelo por espaço ou região, só para as partes que mudaram', parents=[instrumentation]
+    )
+    parser_shards.add_argument('--data', default='data/bilheteria_processado')
+    parser_shards.add_argument('--output-dir', default='models/shards')
+    parser_shards.add_argument('--by', choices=['venue', 'region'], default='venue', help='Um modelo por espaço ou por região')
+    parser_shards.add_argument(
+        '--model-name', default='Gradient Boosting', choices=['Random Forest', 'Gradient Boosting'], help='Modelo de cada parte'
+    )
+    parser_shards.add_argument('--n-jobs', type=int, default=-1, help='Núcleos do treino (partes x árvores)')
+    parser_shards.add_argument('--min-rows', type=int, default=30, help='Partes menores usam o modelo global')
+    parser_shards.add_argument('--global-model', default='models/gradient_boosting_model.pkl', help='Modelo dos espaços sem modelo próprio')
+    parser_shards.add_argument('--force', action='store_true', help='Treina todas as partes')
+    parser_shards.set_defaults(func=shards)
+
+    parser_retrain = subparsers.add_parser(
+        'retrain', help='Acrescenta um novo arquivo de sessões e atualiza o modelo com warm_start', parents=[instrumentation]
+    )
+    parser_retrain.add_argument('--data', required=True, help='Novo arquivo no formato do bilheteria.csv')
+    parser_retrain.add_argument('--processed', default='data/bilheteria_processado')
+    parser_retrain.add_argument('--model', help='Modelo do registro (padrão: o registrado mais recentemente)')
+    parser_retrain.add_argument('--output-dir', default='models')
+    parser_retrain.add_argument('--trees', type=int, help='Árvores acrescentadas (padrão: proporcional às linhas novas)')
+    parser_retrain.add_argument('--error-threshold', type=float, default=1.25, help='MAE nas novas sessões / MAE da validação')
+    parser_retrain.add_argument('--drift-threshold', type=float, default=0.2, help='PSI máximo de cada feature')
+    parser_retrain.add_argument('--tolerance', type=float, help='Compara com um retreino completo (diferença máxima de R²)')
+    parser_retrain.set_defaults(func=retrain)
+
+    parser_predict = subparsers.add_parser(
+        'predict', help='Prevê sessões brutas (JSON ou CSV) com um modelo salvo', parents=[instrumentation]
+    )
+    parser_predict.add_argument(
+        '--model', default='models/gradient_boosting_model.pkl',
+        help='Arquivo .pkl ou modelo do registro (ex.: models/registry/gradient_boosting)'
+    )
+    parser_predict.add_argument('--compiled', action='store_true', help='Usa o modelo compilado (tree_engine)')
+    parser_predict.add_argument('--shards', help='Diretório dos modelos por espaço (ex.: models/shards), no lugar de --model')
+    parser_predict.add_argument('--input', help='Arquivo .json ou .csv (padrão: JSON da entrada padrão)')
+    parser_predict.add_argument('--output', help='Arquivo JSON para salvar as previsões (padrão: stdout)')
+    parser_predict.set_defaults(func=predict)
+
+    parser_score = subparsers.add_parser(
+        'score', help='Prevê um arquivo inteiro de sessões em paralelo e grava no formato colunar', parents=[instrumentation]
+    )
+    parser_score.add_argument('--data', required=True, help='Arquivo no formato do bilheteria.csv')
+    parser_score.add_argument('--model', default='models/gradient_boosting_model.pkl')
+    parser_score.add_argument('--compiled', action='store_true', help='Usa o modelo compilado (tree_engine)')
+    parser_score.add_argument('--output', default='data/bilheteria_previsoes', help='Diretório das previsões')
+    parser_score.add_argument('--n-jobs', type=int, default=-1, help='Processos do pool')
+    parser_score.add_argument('--block-mb', type=float, default=16, help='MB do CSV lidos por faixa')
+    parser_score.set_defaults(func=score)
+
+    parser_simulate = subparsers.add_parser(
+        'simulate', help='Simula uma grade de preços e sugere o preço de maior receita por sessão', parents=[instrumentation]
+    )
+    parser_simulate.add_argument('--data', required=True, help='Sessões (.csv no formato do bilheteria.csv ou .json)')
+    parser_simulate.add_argument('--model', default='models/gradient_boosting_model.pkl')
+    parser_simulate.add_argument('--compiled', action='store_true', help='Usa o modelo compilado (tree_engine)')
+    parser_simulate.add_argument(
+        '--prices', nargs=3, type=float, default=[5, 100, 5], metavar=('MIN', 'MAX', 'PASSO'), help='Grade de preços'
+    )
+    parser_simulate.add_argument('--output', help='Arquivo CSV com o preço sugerido de cada sessão (padrão: stdout)')
+    parser_simulate.add_argument(
+        '--check', action='store_true', help='Confere a grade com o predict de cada sessão no preço atual'
+    )
+    parser_simulate.set_defaults(func=simulate)
+
+    parser_startup = subparsers.add_parser('startup', help='Verifica o tempo de inicialização do predict', parents=[instrumentation])
+    parser_startup.add_argument('--model', default='models/gradient_boosting_model.pkl')
+    parser_startup.add_argument('--data', default='data/bilheteria.csv')
+    parser_startup.add_argument('--budget-ms', type=float, default=PREDICT_STARTUP_BUDGET_MS)
+    parser_startup.add_argument('--repeats', type=int, default=5)
+    parser_startup.set_defaults(func=startup)
+
+    parser_models = subparsers.add_parser('models', help='Lista os modelos registrados', parents=[instrumentation])
+    parser_models.add_argument('--registry', default='models/registry')
+    parser_models.add_argument('--verify', help='Confere os arquivos de uma versão com o manifesto')
+    parser_models.set_defaults(func=models)
+
+    return parser
+
+
+def configure_instrumentation(args):
+    try:
+        from .instrumentation import SETTINGS, configure, configure_from_env
+    except ImportError:
+        from instrumentation import SETTINGS, configure, configure_from_env
+
+    configure_from_env()
+    configure(
+        output=args.metrics or SETTINGS['output'],
+        output_format=args.metrics_format or SETTINGS['format'],
+        profile=args.profile or SETTINGS['profile'],
+        profile_dir=args.profile_dir or SETTINGS['profile_dir'],
+    )
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    configure_instrumentation(args)
+
+    return args.func(args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,239 @@
+import numpy as np
+import pandas as pd
+
+# Correlação de Spearman com cada coluna ranqueada uma única vez
+# A correlação de Spearman é a correlação de Pearson dos postos: com os postos centrados e divididos
+# pela norma, a matriz é Z.T @ Z, calculada em blocos de colunas (multiplicação de matrizes do NumPy)
+# Colunas binárias (One-Hot Encoding) não são ranqueadas nem densificadas: o posto de uma coluna 0/1
+# é uma função afim da própria coluna, então os produtos usam a matriz esparsa e só corrigem a média
+# Com valores nulos, cada coluna é ranqueada nos valores preenchidos e os nulos não contribuem para os
+# produtos (aproxima a correlação par a par do pandas, que descarta as linhas com nulo em cada par)
+
+# Colunas por bloco da matriz: cada bloco tem BLOCK_SIZE x BLOCK_SIZE correlações
+BLOCK_SIZE = 512
+
+
+class RankedColumns:
+    """
+    Colunas numéricas de um dataset ranqueadas e padronizadas uma única vez, reaproveitadas
+    pela matriz completa, pelos pares mais correlacionados e pela correlação com o alvo
+
+    Args:
+        data: DataFrame (usa as colunas numéricas) ou matriz esparsa
+        names: Nomes das colunas da matriz esparsa
+    """
+
+    def __init__(self, data, names=None):
+        from scipy import sparse as sp
+
+        dense_columns = {}
+        binary_rows = []
+        if hasattr(data, 'tocsc'):
+            matrix = data.tocsc()
+            self.names = list(names)
+            self.n_rows = matrix.shape[0]
+            for position in range(matrix.shape[1]):
+                start, end = matrix.indptr[position], matrix.indptr[position + 1]
+                if np.all(matrix.data[start:end] == 1):
+                    binary_rows.append((position, matrix.indices[start:end]))
+                else:
+                    dense_columns[position] = matrix[:, position].toarray().ravel()
+        else:
+            frame = data.select_dtypes(include=['number', 'bool'])
+            self.names = [str(col) for col in frame.columns]
+            self.n_rows = len(frame)
+            for position in range(frame.shape[1]):
+                values = frame.iloc[:, position].to_numpy(dtype=float)
+                if np.all((values == 0) | (values == 1)):
+                    binary_rows.append((position, np.flatnonzero(values)))
+                else:
+                    dense_columns[position] = values
+
+        n_columns = len(self.names)
+        # Tipo (denso ou binário) e posição de cada coluna no próprio bloco
+        self.is_binary = np.zeros(n_columns, dtype=bool)
+        self.local = np.zeros(n_columns, dtype=np.int64)
+
+        dense_positions = list(dense_columns)
+        self.local[dense_positions] = np.arange(len(dense_positions))
+        if dense_positions:
+            ranks = pd.DataFrame(dense_columns).rank(method='average').to_numpy()
+            centered = ranks - np.nanmean(ranks, axis=0)
+            norms = np.sqrt(np.nansum(centered ** 2, axis=0))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                self.dense = np.nan_to_num(centered / norms)
+            self.dense_valid = norms > 0
+        else:
+            self.dense = np.zeros((self.n_rows, 0))
+            self.dense_valid = np.zeros(0, dtype=bool)
+
+        binary_positions = [position for position, _ in binary_rows]
+        self.is_binary[binary_positions] = True
+        self.local[binary_positions] = np.arange(len(binary_positions))
+        indices = [rows for _, rows in binary_rows]
+        indptr = np.concatenate([[0], np.cumsum([len(rows) for rows in indices])]).astype(np.int64)
+        self.binary = sp.csc_matrix(
+            (np.ones(indptr[-1]), np.concatenate(indices) if indices else np.array([], dtype=np.int64), indptr),
+            shape=(self.n_rows, len(binary_positions))
+        )
+        # Quantidade de uns, média e norma de cada coluna binária centrada
+        self.ones = np.diff(indptr).astype(float)
+        self.binary_norms = np.sqrt(self.ones - self.ones ** 2 / max(self.n_rows, 1))
+
+    def positions(self, columns):
+        index = {name: position for position, name in enumerate(self.names)}
+        return np.array([index[str(col)] for col in columns], dtype=np.int64)
+
+    def block(self, rows, cols):
+        """
+        Correlações entre as colunas rows e cols (posições), sem montar a matriz completa
+        """
+        result = np.empty((len(rows), len(cols)))
+        row_binary, col_binary = self.is_binary[rows], self.is_binary[cols]
+        row_local, col_local = self.local[rows], self.local[cols]
+
+        for row_mask in (~row_binary, row_binary):
+            for col_mask in (~col_binary, col_binary):
+                if row_mask.any() and col_mask.any():
+                    result[np.ix_(row_mask, col_mask)] = self._products(
+                        row_local[row_mask], row_binary[row_mask].any(),
+                        col_local[col_mask], col_binary[col_mask].any()
+                    )
+
+        return result
+
+    def _products(self, rows, rows_binary, cols, cols_binary):
+        if not rows_binary and not cols_binary:
+            products = self.dense[:, rows].T @ self.dense[:, cols]
+            valid = np.outer(self.dense_valid[rows], self.dense_valid[cols])
+        elif rows_binary and cols_binary:
+            # (B.T @ B - k_i k_j / n) / (norma_i norma_j)
+            products = (self.binary[:, rows].T @ self.binary[:, cols]).toarray()
+            products = products - np.outer(self.ones[rows], self.ones[cols]) / self.n_rows
+            norms = np.outer(self.binary_norms[rows], self.binary_norms[cols])
+            valid = norms > 0
+            with np.errstate(divide='ignore', invalid='ignore'):
+                products = products / norms
+        else:
+            # As colunas densas padronizadas somam zero: a média da coluna binária não entra no produto
+            if rows_binary:
+                return self._products(cols, cols_binary, rows, rows_binary).T
+            products = np.asarray(self.binary[:, cols].T @ self.dense[:, rows]).T
+            norms = self.binary_norms[cols]
+            valid = np.outer(self.dense_valid[rows], norms > 0)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                products = products / norms
+
+        return np.where(valid, np.clip(products, -1, 1), np.nan)
+
+
+def _ranked(data, names=None):
+    return data if isinstance(data, RankedColumns) else RankedColumns(data, names)
+
+
+def spearman_matrix(data, columns=None, names=None, block_size=BLOCK_SIZE):
+    """
+    Matriz de correlação de Spearman (igual a data.corr(method='spearman') sem valores nulos)
+
+    Args:
+        data: DataFrame, matriz esparsa ou RankedColumns
+        columns: Colunas da matriz (padrão: todas as numéricas)
+        names: Nomes das colunas da matriz esparsa
+        block_size: Colunas por bloco
+
+    Returns:
+        DataFrame com a matriz de correlação
+    """
+    ranked = _ranked(data, names)
+    positions = ranked.positions(columns) if columns is not None else np.arange(len(ranked.names))
+    matrix = np.empty((len(positions), len(positions)))
+
+    for start in range(0, len(positions), block_size):
+        rows = slice(start, start + block_size)
+        for col_start in range(start, len(positions), block_size):
+            cols = slice(col_start, col_start + block_size)
+            values = ranked.block(positions[rows], positions[cols])
+            matrix[rows, cols] = values
+            matrix[cols, rows] = values.T
+
+    labels = [ranked.names[position] for position in positions]
+
+    return pd.DataFrame(matrix, index=labels, columns=labels)
+
+
+def target_correlations(data, target, names=None):
+    """
+    Correlação de cada coluna com o alvo (um produto por coluna, sem a matriz), da maior para a menor em módulo
+    """
+    ranked = _ranked(data, names)
+    target_position = ranked.positions([target])
+    others = np.array([position for position in range(len(ranked.names)) if position != target_position[0]])
+    values = ranked.block(target_position, others)[0] if len(others) else np.array([])
+
+    correlations = pd.Series(values, index=[ranked.names[position] for position in others], name=target)
+
+    return correlations.reindex(correlations.abs().sort_values(ascending=False).index)
+
+
+def top_correlated_pairs(data, k=20, names=None, block_size=BLOCK_SIZE):
+    """
+    Os k pares de colunas com maior correlação em módulo
+    Percorre a matriz em blocos guardando apenas os k melhores pares: a memória fica em O(bloco² + k)
+
+    Returns:
+        DataFrame com column_a, column_b e correlation
+    """
+    ranked = _ranked(data, names)
+    n_columns = len(ranked.names)
+    best_rows = np.array([], dtype=np.int64)
+    best_cols = np.array([], dtype=np.int64)
+    best_values = np.array([])
+
+    for start in range(0, n_columns, block_size):
+        rows = np.arange(start, min(start + block_size, n_columns))
+        for col_start in range(start, n_columns, block_size):
+            cols = np.arange(col_start, min(col_start + block_size, n_columns))
+            values = ranked.block(rows, cols)
+            # Só os pares acima da diagonal (cada par uma vez)
+            upper = rows[:, None] < cols[None, :]
+            row_index, col_index = np.nonzero(upper & ~np.isnan(values))
+            candidates = values[row_index, col_index]
+
+            best_rows = np.concatenate([best_rows, rows[row_index]])
+            best_cols = np.concatenate([best_cols, cols[col_index]])
+            best_values = np.concatenate([best_values, candidates])
+            if len(best_values) > k:
+                keep = np.argpartition(-np.abs(best_values), k)[:k]
+                best_rows, best_cols, best_values = best_rows[keep], best_cols[keep], best_values[keep]
+
+    order = np.argsort(-np.abs(best_values), kind='stable')
+
+    return pd.DataFrame({
+        'column_a': [ranked.names[position] for position in best_rows[order]],
+        'column_b': [ranked.names[position] for position in best_cols[order]],
+        'correlation': best_values[order],
+    })
+
+
+def heatmap_columns(data, max_columns, target=None, names=None):
+    """
+    Colunas mais relevantes para o heatmap: todas se couberem; senão o alvo, as colunas mais
+    correlacionadas com ele (metade das vagas) e as colunas dos pares mais correlacionados entre si
+    """
+    ranked = _ranked(data, names)
+    if len(ranked.names) <= max_columns:
+        return list(ranked.names)
+
+    selected = []
+    if target is not None and target in ranked.names:
+        selected.append(target)
+        selected.extend(target_correlations(ranked, target).index[:max_columns // 2 - 1])
+
+    pairs = top_correlated_pairs(ranked, k=max_columns)
+    for col_a, col_b in zip(pairs['column_a'], pairs['column_b']):
+        for col in (col_a, col_b):
+            if col not in selected and len(selected) < max_columns:
+                selected.append(col)
+
+    # Mantém a ordem original das colunas
+    return [name for name in ranked.names if name in set(selected)]
@@ -0,0 +1,221 @@
+import json
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.metrics import r2_score, mean_absolute_error, mean_squared_error
+
+try:
+    from .storage import load_columnar_dataset, save_columnar_dataset
+except ImportError:
+    from storage import load_columnar_dataset, save_columnar_dataset
+
+# Validação cruzada com as dobras em paralelo dentro de um único orçamento de CPU
+# Cada dobra roda em um processo e as árvores de cada modelo usam threads = orçamento / processos,
+# sem o pool de processos do cross_validate aninhado no n_jobs=-1 do Random Forest
+# X e y são gravados uma única vez em arquivos mapeados em memória (em /dev/shm quando existe):
+# os processos abrem os mesmos arquivos, sem receber uma cópia serializada do dataset por dobra
+
+# Memória compartilhada do Linux (tmpfs); em outros sistemas usa o diretório temporário padrão
+SHARED_MEMORY_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+SHARED_FILE = 'shared.json'
+
+
+def cpu_budget(n_jobs=-1):
+    """
+    Quantidade de núcleos disponíveis para o processo: n_jobs positivo é usado como está,
+    -1 (ou None) usa todos os núcleos a que o processo tem acesso e -2 todos menos um
+    """
+    if hasattr(os, 'sched_getaffinity'):
+        available = len(os.sched_getaffinity(0))
+    else:
+        available = os.cpu_count() or 1
+    if n_jobs is None:
+        n_jobs = -1
+    if n_jobs < 0:
+        return max(1, available + 1 + n_jobs)
+
+    return max(1, min(n_jobs, available))
+
+
+def plan_workers(n_tasks, n_jobs=-1):
+    """
+    Divide o orçamento de CPU entre processos (um por ajuste) e threads por processo
+
+    Returns:
+        Tupla (processos, threads por processo), com processos x threads <= orçamento
+    """
+    budget = cpu_budget(n_jobs)
+    workers = max(1, min(n_tasks, budget))
+
+    return workers, max(1, budget // workers)
+
+
+def share_features(X, y, directory):
+    """
+    Grava X e y em directory para os processos abrirem com open_shared_features
+    DataFrames usam o formato binário colunar (colunas categóricas como códigos),
+    matrizes CSR e arrays NumPy viram arquivos .npy
+    """
+    if isinstance(X, pd.DataFrame):
+        categories = {}
+        columns = {}
+        for col in X.columns:
+            if isinstance(X[col].dtype, pd.CategoricalDtype):
+                categories[col] = X[col].cat.categories.tolist()
+                columns[col] = X[col].cat.codes.to_numpy()
+            else:
+                columns[col] = X[col].to_numpy()
+        frame = pd.DataFrame(columns, copy=False)
+        save_columnar_dataset(
+            os.path.join(directory, 'X'), frame, {col: values.dtype for col, values in columns.items()}
+        )
+        info = {'kind': 'frame', 'categories': categories}
+    elif hasattr(X, 'tocsr'):
+        X = X.tocsr()
+        for name in ['data', 'indices', 'indptr']:
+            np.save(os.path.join(directory, f'X_{name}.npy'), getattr(X, name))
+        info = {'kind': 'csr', 'shape': list(X.shape)}
+    else:
+        np.save(os.path.join(directory, 'X.npy'), np.asarray(X))
+        info = {'kind': 'array'}
+
+    np.save(os.path.join(directory, 'y.npy'), np.asarray(y))
+    with open(os.path.join(directory, SHARED_FILE), 'w', encoding='utf-8') as file:
+        json.dump(info, file, ensure_ascii=False)
+
+
+def open_shared_features(directory):
+    """
+    Abre X e y gravados com share_features, mapeados em memória (sem ler os arquivos inteiros)
+    """
+    with open(os.path.join(directory, SHARED_FILE), encoding='utf-8') as file:
+        info = json.load(file)
+
+    if info['kind'] == 'frame':
+        X = load_columnar_dataset(os.path.join(directory, 'X'))
+        for col, categories in info['categories'].items():
+            X[col] = pd.Categorical.from_codes(X[col].to_numpy(), categories=categories)
+    elif info['kind'] == 'csr':
+        from scipy import sparse as sp
+
+        arrays = [np.load(os.path.join(directory, f'X_{name}.npy'), mmap_mode='r') for name in ['data', 'indices', 'indptr']]
+        X = sp.csr_matrix(tuple(arrays), shape=tuple(info['shape']), copy=False)
+    else:
+        X = np.load(os.path.join(directory, 'X.npy'), mmap_mode='r')
+
+    return X, np.load(os.path.join(directory, 'y.npy'), mmap_mode='r')
+
+
+def _rows(X, indices):
+    return X.iloc[indices] if isinstance(X, pd.DataFrame) else X[indices]
+
+
+def _fit_split(model, X, y, train, test, threads, keep_model):
+    """
+    Ajusta um clone do modelo em train e avalia em test (test None apenas ajusta)
+    X pode ser o diretório gravado com share_features (nos processos do pool)
+    """
+    from threadpoolctl import threadpool_limits
+
+    if isinstance(X, str):
+        X, y = open_shared_features(X)
+    y = np.asarray(y)
+
+    model = clone(model)
+    # Modelos com n_jobs (Random Forest) usam as threads do orçamento e voltam ao valor original depois
+    original_n_jobs = model.get_params().get('n_jobs', None)
+    if 'n_jobs' in model.get_params():
+        model.set_params(n_jobs=threads)
+
+    # OpenMP (Hist Gradient Boosting) e BLAS também ficam limitados às threads do orçamento
+    with threadpool_limits(limits=threads):
+        model.fit(_rows(X, train), y[train])
+        result = {'r2': None, 'mae': None, 'rmse': None}
+        if test is not None:
+            y_test = y[test]
+            y_pred = model.predict(_rows(X, test))
+            result = {
+                'r2': r2_score(y_test, y_pred),
+                'mae': mean_absolute_error(y_test, y_pred),
+                'rmse': np.sqrt(mean_squared_error(y_test, y_pred)),
+            }
+
+    if 'n_jobs' in model.get_params():
+        model.set_params(n_jobs=original_n_jobs)
+    result['model'] = model if keep_model else None
+
+    return result
+
+
+def fit_splits(model, X, y, splits, n_jobs=-1, keep_models=()):
+    """
+    Ajusta e avalia um clone do modelo em cada divisão (train, test), em paralelo
+    O orçamento n_jobs é dividido entre processos (um por divisão) e threads de cada modelo
+    Uma divisão com test None é um ajuste sem avaliação (ex.: o modelo final com todos os dados),
+    agendado junto com as dobras
+
+    Args:
+        model: Modelo base (não é alterado)
+        X: Features (DataFrame, array ou matriz CSR)
+        y: Alvo
+        splits: Lista de tuplas (índices de treino, índices de teste ou None)
+        n_jobs: Orçamento de CPU (ver cpu_budget)
+        keep_models: Posições das divisões cujos modelos treinados são devolvidos
+
+    Returns:
+        Lista com um dicionário por divisão: r2, mae, rmse (None sem teste) e model (None se não guardado)
+    """
+    workers, threads = plan_workers(len(splits), n_jobs)
+    keep_models = set(keep_models)
+
+    if workers == 1:
+        return [
+            _fit_split(model, X, y, train, test, threads, position in keep_models)
+            for position, (train, test) in enumerate(splits)
+        ]
+
+    directory = tempfile.mkdtemp(prefix='cross_validation_', dir=SHARED_MEMORY_DIR)
+    try:
+        share_features(X, y, directory)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(_fit_split, model, directory, None, train, test, threads, position in keep_models)
+                for position, (train, test) in enumerate(splits)
+            ]
+            return [future.result() for future in futures]
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def summarize(results):
+    """
+    Médias de R², MAE e RMSE das divisões avaliadas
+    """
+    evaluated = [result for result in results if result['r2'] is not None]
+
+    return tuple(float(np.mean([result[metric] for result in evaluated])) for metric in ['r2', 'mae', 'rmse'])
+
+
+class FoldEnsemble:
+    """
+    Ensemble dos modelos treinados nas dobras da validação cruzada: a previsão é a média das previsões
+    Reaproveita os ajustes da validação cruzada como modelo final, sem um novo ajuste
+    """
+
+    def __init__(self, models):
+        self.models = list(models)
+        # Mesmos atributos do modelo base, usados por predict_sessions para escolher as features
+        for attribute in ['feature_names_in_', 'n_features_in_', 'is_categorical_']:
+            if hasattr(self.models[0], attribute):
+                setattr(self, attribute, getattr(self.models[0], attribute))
+        if all(hasattr(model, 'feature_importances_') for model in self.models):
+            self.feature_importances_ = np.mean([model.feature_importances_ for model in self.models], axis=0)
+
+    def predict(self, X):
+        return np.mean([model.predict(X) for model in self.models], axis=0)
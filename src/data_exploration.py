@@ -1,56 +1,54 @@
 import pandas as pd
 
 try:
-    from .visualization import distribution_by_null_values, distribution_by_type_of_age_rating, distribution_by_type_of_event, distribution_by_type_of_session, histogram, relationship_between_ticket_price_and_quantity_sold
+    from .data_profile import DEFAULT_CHUNKSIZE, default_profile_path, print_profile, profile_dataset, save_profile
+    from .instrumentation import instrumented, step
 except ImportError:
-    from visualization import distribution_by_null_values, distribution_by_type_of_age_rating, distribution_by_type_of_event, distribution_by_type_of_session, histogram, relationship_between_ticket_price_and_quantity_sold
-
-def data_exploration(data_path):
+    from data_profile import DEFAULT_CHUNKSIZE, default_profile_path, print_profile, profile_dataset, save_profile
+    from instrumentation import instrumented, step
+
+@instrumented('data_exploration')
+def data_exploration(data_path, charts=True, preview=False, profile_path=None, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Mostra um resumo do dataset e gera os gráficos da exploração em outputs/data_exploration
+    O dataset é lido uma única vez, em blocos, para calcular o perfil (data_profile.py);
+    o resumo e os gráficos usam só o perfil, sem carregar o dataset inteiro
+
+    Args:
+        data_path: Caminho do dataset
+        charts: Se False, só mostra o resumo (os gráficos podem ser gerados depois com render_charts)
+        preview: Se True, gera os gráficos em baixa resolução (prévia rápida)
+        profile_path: Arquivo JSON do perfil (padrão: <dataset>_profile.json)
+        chunksize: Linhas lidas por bloco
+
+    Returns:
+        Perfil do dataset
+    """
     # Configurar pandas para melhor visualização
     pd.set_option('display.max_columns', None)
     pd.set_option('display.width', None)
     pd.set_option('display.max_colwidth', 50)
 
-    data = pd.read_csv(data_path, sep=';', skiprows=1)
-
-    print("PRIMEIRAS LINHAS DO DATASET")
-    print(data.head())
-    print("\n")
-
-    print("INFORMAÇÕES DO DATASET")
-    print(data.info())
-    print("\n")
-
-    print("DIMENSÕES DO DATASET")
-    print(f"Linhas: {data.shape[0]} x Colunas: {data.shape[1]}")
-    print("\n")
-
-    print("COLUNAS DO DATASET")
-    for col in data.columns:
-        print(f"{col}")
-    print("\n")
-
-    print("VALORES NULOS POR COLUNA")
-    for col, count in data.isnull().sum().items():
-        print(f"{col}: {count}")
-    print("\n")
-
-    print("DESCRIÇÃO DO DATASET")
-    print(data.describe())
-    print("\n")
-
-    colums_to_see = ["Espaço", "Tipo de Evento", "Classificação Etária", "Tipo da Sessão"]
-    print("VALORES ÚNICOS POR COLUNA")
-    for col in colums_to_see:
-        print(f"{col}: {set(data[col])}")
-    print("\n")
-
-    histogram(data, "data_exploration")
-    distribution_by_type_of_event(data, "data_exploration")
-    distribution_by_type_of_age_rating(data, "data_exploration")
-    distribution_by_type_of_session(data, "data_exploration")
-    distribution_by_null_values(data, "data_exploration")
-    relationship_between_ticket_price_and_quantity_sold(data, "data_exploration")
+    with step('profile') as record:
+        profile = profile_dataset(data_path, chunksize=chunksize)
+        record.rows_out = profile['rows']
+
+    save_profile(profile, profile_path or default_profile_path(data_path))
+
+    with step('summary', rows_in=profile['rows']):
+        colums_to_see = ["Espaço", "Tipo de Evento", "Classificação Etária", "Tipo da Sessão"]
+        print_profile(profile, colums_to_see)
+
+    if charts:
+        # Importado só aqui: sem gráficos, a exploração não importa o matplotlib
+        try:
+            from .chart_rendering import EXPLORATION_CHARTS, render_charts
+        except ImportError:
+            from chart_rendering import EXPLORATION_CHARTS, render_charts
+        with step('charts', rows_in=profile['rows']):
+            render_charts([(EXPLORATION_CHARTS, profile, "data_exploration")], preview=preview)
+
+    return profile
 
 if __name__ == "__main__":
     data_path = "data/bilheteria.csv"
@@ -0,0 +1,341 @@
+import collections
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .preprocessing import DATE_FORMAT, load_raw_sessions
+except ImportError:
+    from preprocessing import DATE_FORMAT, load_raw_sessions
+
+# Perfil do dataset bruto calculado em uma única leitura, em blocos (load_raw_sessions com chunksize):
+# a memória depende do tamanho do bloco e da amostra, não do tamanho do arquivo
+#   numéricas:   contagem, nulos, mínimo, máximo, média e variância (Welford, combinando os blocos)
+#   quantis:     aproximados por uma amostra de linhas de tamanho fixo (reservoir sampling);
+#                exatos enquanto o arquivo tiver menos linhas que a amostra
+#   categóricas: frequência de cada valor
+#   datas:       primeira e última data
+# O perfil é gravado em JSON e os gráficos da exploração (visualization.py) são desenhados a partir dele
+
+DEFAULT_CHUNKSIZE = 100_000
+SAMPLE_SIZE = 10_000
+HISTOGRAM_BINS = 50
+TOP_CATEGORIES = 50
+PREVIEW_ROWS = 5
+QUANTILES = [0.25, 0.5, 0.75]
+
+
+class StreamingProfile:
+    """
+    Acumula as estatísticas do dataset bloco a bloco (ver update)
+
+    Args:
+        sample_size: Linhas guardadas na amostra usada nos quantis, histogramas e dispersão
+        seed: Semente da amostragem
+    """
+
+    def __init__(self, sample_size=SAMPLE_SIZE, seed=42):
+        self.sample_size = sample_size
+        self.rng = np.random.default_rng(seed)
+        self.rows = 0
+        self.columns = None
+        self.dtypes = {}
+        self.nulls = {}
+        self.head = None
+        self.numeric = {}
+        self.categories = {}
+        self.dates = {}
+        self.sample = None
+        self.sample_rows = 0
+
+    def update(self, chunk):
+        """
+        Acrescenta um bloco do dataset às estatísticas
+        Os tipos das colunas são definidos pelo primeiro bloco; nos seguintes, valores não numéricos
+        de uma coluna numérica contam como nulos
+        """
+        if self.columns is None:
+            self.columns = [str(col) for col in chunk.columns]
+            self.dtypes = {str(col): str(dtype) for col, dtype in chunk.dtypes.items()}
+            self.nulls = {col: 0 for col in self.columns}
+            # Primeiras linhas em tipos do JSON: datas como texto e números como float
+            head = chunk.head(PREVIEW_ROWS).astype(object)
+            for col in chunk.columns:
+                if pd.api.types.is_datetime64_any_dtype(chunk[col].dtype):
+                    self.dates[str(col)] = {'min': None, 'max': None}
+                    head[col] = chunk[col].head(PREVIEW_ROWS).dt.strftime(DATE_FORMAT)
+                elif pd.api.types.is_numeric_dtype(chunk[col].dtype):
+                    self.numeric[str(col)] = {'count': 0, 'mean': 0.0, 'm2': 0.0, 'min': None, 'max': None}
+                    head[col] = chunk[col].head(PREVIEW_ROWS).to_numpy(dtype=np.float64, na_value=np.nan)
+                else:
+                    self.categories[str(col)] = collections.Counter()
+            self.head = head.astype(object).where(head.notnull(), None).values.tolist()
+            self.sample = np.empty((self.sample_size, len(self.numeric)), dtype=np.float64)
+
+        chunk = chunk.rename(columns=str)
+        values = np.column_stack([
+            pd.to_numeric(chunk[col], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan) for col in self.numeric
+        ]) if self.numeric else np.empty((len(chunk), 0))
+
+        for position, col in enumerate(self.numeric):
+            self._update_numeric(self.numeric[col], values[:, position])
+            self.nulls[col] += int(np.isnan(values[:, position]).sum())
+        for col, counter in self.categories.items():
+            self.nulls[col] += int(chunk[col].isnull().sum())
+            counter.update(chunk[col].value_counts(sort=False).to_dict())
+        for col, stats in self.dates.items():
+            dates = pd.to_datetime(chunk[col], errors='coerce')
+            self.nulls[col] += int(dates.isnull().sum())
+            if dates.notnull().any():
+                low, high = dates.min(), dates.max()
+                stats['min'] = low if stats['min'] is None else min(stats['min'], low)
+                stats['max'] = high if stats['max'] is None else max(stats['max'], high)
+
+        self._update_sample(values)
+        self.rows += len(chunk)
+
+    @staticmethod
+    def _update_numeric(stats, values):
+        # Média e soma dos quadrados dos desvios (m2) do bloco, combinadas com as acumuladas
+        # (forma em blocos do algoritmo de Welford, estável para arquivos grandes)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+        count = len(values)
+        mean = float(values.mean())
+        m2 = float(((values - mean) ** 2).sum())
+        total = stats['count'] + count
+        delta = mean - stats['mean']
+        stats['mean'] += delta * count / total
+        stats['m2'] += m2 + delta ** 2 * stats['count'] * count / total
+        stats['count'] = total
+        low, high = float(values.min()), float(values.max())
+        stats['min'] = low if stats['min'] is None else min(stats['min'], low)
+        stats['max'] = high if stats['max'] is None else max(stats['max'], high)
+
+    def _update_sample(self, values):
+        # Reservoir sampling (algoritmo R) vetorizado: a linha de posição global j substitui
+        # uma posição sorteada entre 0 e j quando o sorteio cai dentro da amostra
+        filled = min(self.sample_rows, self.sample_size)
+        n_fill = min(self.sample_size - filled, len(values))
+        self.sample[filled:filled + n_fill] = values[:n_fill]
+
+        rest = values[n_fill:]
+        if len(rest):
+            positions = np.arange(self.rows + n_fill, self.rows + len(values))
+            draws = self.rng.integers(0, positions + 1)
+            selected = draws < self.sample_size
+            self.sample[draws[selected]] = rest[selected]
+        self.sample_rows = self.rows + len(values)
+
+    def to_dict(self):
+        """
+        Perfil serializável em JSON (ver profile_dataset)
+        """
+        sample = self.sample[:min(self.sample_rows, self.sample_size)] if self.sample is not None else np.empty((0, 0))
+        numeric = {}
+        for position, (col, stats) in enumerate(self.numeric.items()):
+            column_sample = sample[:, position]
+            column_sample = column_sample[~np.isnan(column_sample)]
+            numeric[col] = _numeric_summary(stats, column_sample)
+
+        categorical = {}
+        for col, counter in self.categories.items():
+            top = counter.most_common(TOP_CATEGORIES)
+            categorical[col] = {
+                'distinct': len(counter),
+                'top': [[str(value), int(count)] for value, count in top],
+                'other': int(sum(counter.values()) - sum(count for _, count in top)),
+            }
+
+        return {
+            'rows': self.rows,
+            'columns': self.columns or [],
+            'dtypes': self.dtypes,
+            'nulls': self.nulls,
+            'head': self.head or [],
+            'numeric': numeric,
+            'categorical': categorical,
+            'dates': {
+                col: {key: value.strftime(DATE_FORMAT) if value is not None else None for key, value in stats.items()}
+                for col, stats in self.dates.items()
+            },
+            'sample': {
+                'rows': len(sample),
+                'columns': {
+                    col: [None if np.isnan(value) else float(value) for value in sample[:, position]]
+                    for position, col in enumerate(self.numeric)
+                },
+            },
+        }
+
+
+def _numeric_summary(stats, sample):
+    count = stats['count']
+    summary = {
+        'count': count,
+        'mean': stats['mean'] if count else None,
+        'std': float(np.sqrt(stats['m2'] / (count - 1))) if count > 1 else None,
+        'min': stats['min'],
+        'max': stats['max'],
+        'quantiles': {str(q): float(np.quantile(sample, q)) if len(sample) else None for q in QUANTILES},
+        'histogram': None,
+    }
+    if len(sample):
+        # Histograma da amostra, com as bordas do mínimo e máximo exatos e as contagens
+        # escaladas para o total de valores (igual ao histograma dos dados quando a amostra é completa)
+        counts, edges = np.histogram(sample, bins=HISTOGRAM_BINS, range=(stats['min'], stats['max']))
+        scale = count / len(sample)
+        summary['histogram'] = {
+            'edges': edges.tolist(),
+            'counts': (counts * scale).tolist() if scale != 1 else counts.tolist(),
+        }
+
+    return summary
+
+
+def profile_dataset(data_path, chunksize=DEFAULT_CHUNKSIZE, sample_size=SAMPLE_SIZE, seed=42):
+    """
+    Calcula o perfil do dataset bruto em uma única leitura, bloco a bloco
+
+    Args:
+        data_path: Caminho do dataset (mesmo formato do bilheteria.csv)
+        chunksize: Linhas lidas por bloco
+        sample_size: Tamanho da amostra usada nos quantis, histogramas e dispersão
+        seed: Semente da amostragem
+
+    Returns:
+        Dicionário com linhas, colunas, tipos, nulos, primeiras linhas, estatísticas das colunas
+        numéricas (com quantis e histograma), frequências das categóricas e a amostra
+    """
+    profile = StreamingProfile(sample_size=sample_size, seed=seed)
+    for chunk in load_raw_sessions(data_path, chunksize=chunksize):
+        profile.update(chunk)
+
+    return profile.to_dict()
+
+
+def profile_frame(data, sample_size=SAMPLE_SIZE, seed=42):
+    """
+    Perfil de um DataFrame já carregado (mesmo formato de profile_dataset)
+    """
+    profile = StreamingProfile(sample_size=sample_size, seed=seed)
+    profile.update(data)
+
+    return profile.to_dict()
+
+
+def as_profile(data):
+    """
+    Perfil de data: o próprio dicionário ou o perfil calculado de um DataFrame
+    """
+    return data if isinstance(data, dict) else profile_frame(data)
+
+
+def select_columns(profile, columns):
+    """
+    Perfil reduzido às colunas informadas (o que cada gráfico recebe e usa no hash)
+    """
+    return {
+        'rows': profile['rows'],
+        'columns': [col for col in profile['columns'] if col in columns],
+        'dtypes': {col: profile['dtypes'][col] for col in columns},
+        'nulls': {col: profile['nulls'][col] for col in columns},
+        'numeric': {col: stats for col, stats in profile['numeric'].items() if col in columns},
+        'categorical': {col: stats for col, stats in profile['categorical'].items() if col in columns},
+        'dates': {col: stats for col, stats in profile['dates'].items() if col in columns},
+        'sample': {
+            'rows': profile['sample']['rows'],
+            'columns': {col: values for col, values in profile['sample']['columns'].items() if col in columns},
+        },
+    }
+
+
+def default_profile_path(data_path):
+    """
+    Arquivo do perfil de um dataset, ex.: data/bilheteria.csv -> data/bilheteria_profile.json
+    """
+    return f"{os.path.splitext(data_path)[0]}_profile.json"
+
+
+def save_profile(profile, path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(profile, file, ensure_ascii=False)
+
+
+def load_profile(path):
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def describe_profile(profile):
+    """
+    Tabela equivalente ao DataFrame.describe() das colunas numéricas
+    """
+    rows = {}
+    for col, stats in profile['numeric'].items():
+        quantiles = stats['quantiles']
+        rows[col] = [
+            stats['count'], stats['mean'], stats['std'], stats['min'],
+            *[quantiles[str(q)] for q in QUANTILES], stats['max'],
+        ]
+    index = ['count', 'mean', 'std', 'min'] + [f'{q:.0%}' for q in QUANTILES] + ['max']
+
+    return pd.DataFrame(rows, index=index, dtype=float)
+
+
+def print_profile(profile, columns_to_see=()):
+    """
+    Mostra o resumo do dataset a partir do perfil (sem ler o dataset novamente)
+
+    Args:
+        profile: Perfil calculado com profile_dataset
+        columns_to_see: Colunas categóricas com os valores únicos mostrados
+    """
+    print("PRIMEIRAS LINHAS DO DATASET")
+    print(pd.DataFrame(profile['head'], columns=profile['columns']))
+    print("\n")
+
+    print("INFORMAÇÕES DO DATASET")
+    print(f"{'#':>3}  {'Coluna':<35} {'Não nulos':>10}  Tipo")
+    for position, col in enumerate(profile['columns']):
+        print(f"{position:>3}  {col:<35} {profile['rows'] - profile['nulls'][col]:>10}  {profile['dtypes'][col]}")
+    print("\n")
+
+    print("DIMENSÕES DO DATASET")
+    print(f"Linhas: {profile['rows']} x Colunas: {len(profile['columns'])}")
+    print("\n")
+
+    print("COLUNAS DO DATASET")
+    for col in profile['columns']:
+        print(f"{col}")
+    print("\n")
+
+    print("VALORES NULOS POR COLUNA")
+    for col in profile['columns']:
+        print(f"{col}: {profile['nulls'][col]}")
+    print("\n")
+
+    print("DESCRIÇÃO DO DATASET")
+    print(describe_profile(profile))
+    if profile['sample']['rows'] < profile['rows']:
+        print(f"(quantis aproximados por uma amostra de {profile['sample']['rows']} linhas)")
+    print("\n")
+
+    print("PERÍODO DAS DATAS")
+    for col, stats in profile['dates'].items():
+        print(f"{col}: {stats['min']} a {stats['max']}")
+    print("\n")
+
+    print("VALORES ÚNICOS POR COLUNA")
+    for col in columns_to_see:
+        stats = profile['categorical'][col]
+        values = {value for value, _ in stats['top']}
+        if profile['nulls'][col]:
+            values.add(np.nan)
+        remaining = stats['distinct'] - len(stats['top'])
+        print(f"{col}: {values}" + (f" (+{remaining} valores)" if remaining > 0 else ""))
+    print("\n")
@@ -0,0 +1,182 @@
+import itertools
+import json
+import math
+import os
+import time
+
+import numpy as np
+from sklearn.base import clone
+from sklearn.metrics import mean_absolute_error, r2_score
+
+# Espaço de busca de cada modelo (a quantidade de árvores é o recurso do successive halving)
+SEARCH_SPACES = {
+    'Random Forest': {
+        'max_depth': [5, 10, 15, 20, None],
+        'min_samples_leaf': [1, 2, 4],
+    },
+    'Gradient Boosting': {
+        'max_depth': [2, 3, 4, 5, 6],
+        'learning_rate': [0.05, 0.1, 0.15],
+    },
+    'Hist Gradient Boosting': {
+        'max_leaf_nodes': [15, 31, 63],
+        'max_depth': [4, 8, None],
+        'learning_rate': [0.05, 0.1, 0.2],
+    },
+}
+
+# Hiperparâmetro usado como recurso de cada modelo (padrão: n_estimators)
+RESOURCE_PARAMS = {
+    'Hist Gradient Boosting': 'max_iter',
+}
+
+CLOCKS = {
+    'wall': time.perf_counter,
+    'cpu': time.process_time,
+}
+
+
+def parameter_candidates(search_space):
+    """
+    Lista com todas as combinações do espaço de busca
+    """
+    names = list(search_space)
+    return [dict(zip(names, values)) for values in itertools.product(*search_space.values())]
+
+
+def resource_schedule(min_estimators, max_estimators, factor):
+    """
+    Quantidade de árvores de cada rodada: min_estimators * factor^i, limitada a max_estimators
+    Ex.: (20, 300, 3) -> [20, 60, 180, 300]
+    """
+    schedule = []
+    n_estimators = min_estimators
+    while n_estimators < max_estimators:
+        schedule.append(n_estimators)
+        n_estimators *= factor
+    schedule.append(max_estimators)
+
+    return schedule
+
+
+def _rows(X, indices):
+    return X.iloc[indices] if hasattr(X, 'iloc') else X[indices]
+
+
+def successive_halving_search(base_model, search_space, X, y, splits, budget_seconds, model_name,
+                              min_estimators=20, max_estimators=300, factor=3, resource='n_estimators', clock='wall'):
+    """
+    Busca de hiperparâmetros com successive halving usando a quantidade de árvores como recurso
+    Todas as combinações começam com poucas árvores; a cada rodada só o melhor 1/factor
+    (pelo R² médio da validação cruzada) continua, com factor vezes mais árvores
+    Os modelos de cada combinação e fold são mantidos com warm_start, então cada rodada
+    apenas acrescenta árvores em vez de treinar do zero. Os folds são os mesmos para todas as combinações
+
+    Args:
+        base_model: Modelo base (RandomForestRegressor ou GradientBoostingRegressor)
+        search_space: Dicionário com os valores de cada hiperparâmetro
+        X, y: Dados de treino
+        splits: Lista de (índices de treino, índices de validação), reutilizada por todas as combinações
+        budget_seconds: Orçamento de tempo, conferido antes de cada dobra; ao esgotar, a busca para e usa
+            a última rodada completa. A dobra em andamento termina, então o orçamento pode ser excedido
+            em até um ajuste
+        model_name: Nome do modelo (para o ranking)
+        min_estimators: Quantidade de árvores da primeira rodada
+        max_estimators: Quantidade máxima de árvores
+        factor: Fator de eliminação e de crescimento do recurso
+        resource: Hiperparâmetro com a quantidade de árvores ('max_iter' no HistGradientBoostingRegressor)
+        clock: 'wall' (tempo real) ou 'cpu' (tempo de CPU do processo)
+
+    Returns:
+        Dicionário com o ranking de todas as avaliações ('leaderboard') e a melhor ('best');
+        'n_estimators' de cada avaliação é o valor do recurso
+    """
+    now = CLOCKS[clock]
+    start = now()
+
+    y = np.asarray(y)
+    folds = [(_rows(X, train), _rows(X, test), y[train], y[test]) for train, test in splits]
+
+    candidates = parameter_candidates(search_space)
+    fold_models = {
+        i: [clone(base_model).set_params(warm_start=True, **params) for _ in folds]
+        for i, params in enumerate(candidates)
+    }
+    survivors = list(range(len(candidates)))
+    leaderboard = []
+    best = None
+
+    print(f"\n{model_name} - Successive Halving ({len(candidates)} combinações, orçamento {budget_seconds:.0f}s)")
+
+    def out_of_budget():
+        # Sempre avalia ao menos uma combinação, mesmo com orçamento pequeno
+        return now() - start > budget_seconds and (best is not None or bool(rung_results))
+
+    for n_estimators in resource_schedule(min_estimators, max_estimators, factor):
+        rung_results = []
+        for i in survivors:
+            fit_start = now()
+            r2_scores, mae_scores = [], []
+            for model, (X_train, X_test, y_train, y_test) in zip(fold_models[i], folds):
+                # Uma combinação cara é interrompida entre as dobras e não entra no ranking
+                if out_of_budget():
+                    break
+                model.set_params(**{resource: n_estimators})
+                model.fit(X_train, y_train)
+                y_pred = model.predict(X_test)
+                r2_scores.append(r2_score(y_test, y_pred))
+                mae_scores.append(mean_absolute_error(y_test, y_pred))
+            if len(r2_scores) < len(folds):
+                break
+
+            entry = {
+                'model': model_name,
+                'params': candidates[i],
+                'n_estimators': n_estimators,
+                'r2': float(np.mean(r2_scores)),
+                'mae': float(np.mean(mae_scores)),
+                'seconds': now() - fit_start,
+            }
+            leaderboard.append(entry)
+            rung_results.append((entry['r2'], i, entry))
+
+        rung_complete = len(rung_results) == len(survivors)
+        if rung_complete or best is None:
+            best = max(rung_results, key=lambda result: result[0])[2]
+
+        print(f"{n_estimators:>4} árvores | {len(rung_results)} combinações | melhor R²: {best['r2']:.4f} {best['params']}")
+
+        if not rung_complete:
+            print("Orçamento esgotado, usando a última rodada completa")
+            break
+
+        rung_results.sort(key=lambda result: result[0], reverse=True)
+        keep = max(1, math.ceil(len(rung_results) / factor))
+        survivors = [i for _, i, _ in rung_results[:keep]]
+
+        # Libera os modelos das combinações eliminadas
+        for _, i, _ in rung_results[keep:]:
+            del fold_models[i]
+
+    return {'leaderboard': leaderboard, 'best': best}
+
+
+def print_leaderboard(leaderboard, top=10):
+    """
+    Mostra as melhores avaliações da busca
+    """
+    print("\nRanking da busca de hiperparâmetros")
+    for entry in leaderboard[:top]:
+        print(
+            f"{entry['model']:<24} | {entry['n_estimators']:>4} árvores | R²: {entry['r2']:.4f} | "
+            f"MAE: {entry['mae']:.1f} | {entry['params']}"
+        )
+
+
+def save_leaderboard(leaderboard, path):
+    """
+    Salva o ranking completo da busca em JSON
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(leaderboard, file, ensure_ascii=False, indent=4)
@@ -0,0 +1,332 @@
+import copy
+import datetime
+import hashlib
+import json
+import math
+import os
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.metrics import r2_score, mean_absolute_error
+
+try:
+    from .hyperparameter_search import RESOURCE_PARAMS
+    from .instrumentation import instrumented, step
+    from .model_registry import latest_model_dir, load_manifest, load_registered_model, load_registered_pipeline, register_model, resolve_version
+    from .modeling import load_processed_data, model_datasets, modeling, save_model
+    from .pipeline_runner import path_hash
+    from .preprocessing import TARGET_COLUMN, load_raw_sessions, normalize_column_name, transform_sessions
+    from .storage import save_columnar_dataset
+except ImportError:
+    from hyperparameter_search import RESOURCE_PARAMS
+    from instrumentation import instrumented, step
+    from model_registry import latest_model_dir, load_manifest, load_registered_model, load_registered_pipeline, register_model, resolve_version
+    from modeling import load_processed_data, model_datasets, modeling, save_model
+    from pipeline_runner import path_hash
+    from preprocessing import TARGET_COLUMN, load_raw_sessions, normalize_column_name, transform_sessions
+    from storage import save_columnar_dataset
+
+# Retreino incremental: as sessões de um novo arquivo semanal são acrescentadas ao dataset processado
+# e o modelo registrado ganha novas árvores com warm_start, em vez de treinar tudo do zero
+# O retreino completo (modeling) é feito quando as novas sessões mostram deriva nos dados,
+# categorias desconhecidas ou um erro bem maior que o da validação cruzada
+
+# MAE do modelo atual nas novas sessões / MAE da validação cruzada acima do qual o modelo é retreinado
+DEFAULT_ERROR_THRESHOLD = 1.25
+# PSI (population stability index) acima do qual uma feature é considerada com deriva
+DEFAULT_DRIFT_THRESHOLD = 0.2
+
+INGESTIONS_SUFFIX = '_ingestions.json'
+
+
+def population_stability_index(expected, actual, bins=10):
+    """
+    PSI entre duas amostras de uma feature numérica, com faixas pelos quantis de expected
+    Abaixo de 0,1 não há mudança relevante; acima de 0,2 a distribuição mudou
+    """
+    expected = np.asarray(expected, dtype=float)
+    actual = np.asarray(actual, dtype=float)
+    edges = np.unique(np.quantile(expected, np.linspace(0, 1, bins + 1)[1:-1]))
+
+    expected_counts = np.bincount(np.searchsorted(edges, expected, side='right'), minlength=len(edges) + 1)
+    actual_counts = np.bincount(np.searchsorted(edges, actual, side='right'), minlength=len(edges) + 1)
+
+    return _psi(expected_counts, actual_counts)
+
+
+def _psi(expected_counts, actual_counts):
+    # Meia contagem em cada faixa: faixas vazias (comuns em semanas com poucas sessões)
+    # não fazem o logaritmo explodir
+    expected_share = (expected_counts + 0.5) / (np.sum(expected_counts) + 0.5 * len(expected_counts))
+    actual_share = (actual_counts + 0.5) / (np.sum(actual_counts) + 0.5 * len(actual_counts))
+
+    return float(np.sum((actual_share - expected_share) * np.log(actual_share / expected_share)))
+
+
+def drift_report(pipeline, X_old, X_new):
+    """
+    PSI de cada feature numérica e de cada coluna categórica (pelas proporções do One-Hot Encoding)
+    entre o dataset já processado e as novas sessões
+
+    Returns:
+        Dicionário com o PSI de cada feature
+    """
+    feature_names = pipeline.feature_names
+    report = {}
+    for name in feature_names[:len(pipeline.numerical_columns)]:
+        report[name] = population_stability_index(X_old[name], X_new[name])
+
+    offset = len(pipeline.numerical_columns)
+    for col, values in zip(pipeline.categorical_columns, pipeline.categories):
+        names = feature_names[offset:offset + len(values)]
+        report[normalize_column_name(col)] = _psi(
+            X_old[names].to_numpy().sum(axis=0, dtype=np.int64), X_new[names].to_numpy().sum(axis=0, dtype=np.int64)
+        )
+        offset += len(values)
+
+    return report
+
+
+def unknown_categories(pipeline, raw):
+    """
+    Valores das colunas categóricas das novas sessões que não estão no vocabulário do pipeline
+    (viram colunas zeradas no One-Hot Encoding)
+    """
+    labeled = raw.dropna(subset=[TARGET_COLUMN])
+    unknown = {}
+    for col, values in zip(pipeline.categorical_columns, pipeline.categories):
+        new_values = sorted(set(labeled[col].dropna().unique()) - set(values))
+        if new_values:
+            unknown[col] = new_values
+
+    return unknown
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_ingestions(processed_path):
+    path = f'{processed_path}{INGESTIONS_SUFFIX}'
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def append_sessions(raw_path, processed_path, pipeline, export_csv=True):
+    """
+    Processa um novo arquivo de sessões (formato do bilheteria.csv) com o pipeline já ajustado
+    e acrescenta as linhas ao dataset processado (colunar e, se existir, o CSV)
+    Cada arquivo é acrescentado uma única vez (pelo hash do conteúdo, em <processed_path>_ingestions.json)
+
+    Returns:
+        Tupla com as sessões brutas e o DataFrame processado (None se o arquivo já foi acrescentado)
+    """
+    file_hash = _file_sha256(raw_path)
+    ingestions = load_ingestions(processed_path)
+    if any(item['sha256'] == file_hash for item in ingestions):
+        print(f"Arquivo já acrescentado ao dataset processado: {raw_path}")
+        return None, None
+
+    raw = load_raw_sessions(raw_path)
+    # Um arquivo semanal com colunas renomeadas ou faltando falha aqui, antes de tocar no dataset processado
+    pipeline.schema.validate(raw)
+    processed = transform_sessions(
+        raw, pipeline.categories, calendar_features=pipeline.calendar_features,
+        categorical_columns=pipeline.categorical_columns, schema=pipeline.schema, encoder=pipeline.encoder
+    )
+
+    save_columnar_dataset(processed_path, processed, pipeline.storage_dtypes(), append=True)
+    csv_path = f'{processed_path}.csv'
+    if export_csv and os.path.exists(csv_path):
+        processed.to_csv(csv_path, index=False, mode='a', header=False)
+
+    ingestions.append({
+        'file': raw_path,
+        'sha256': file_hash,
+        'rows': len(processed),
+        'ingested_at': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+    })
+    with open(f'{processed_path}{INGESTIONS_SUFFIX}', 'w', encoding='utf-8') as file:
+        json.dump(ingestions, file, ensure_ascii=False, indent=4)
+
+    return raw, processed
+
+
+def grow_model(model, model_name, X, y, n_new_rows, n_new_estimators=None):
+    """
+    Acrescenta árvores a um modelo treinado com warm_start: só as novas árvores (ou estágios do
+    boosting) são ajustadas, com todas as linhas (antigas e novas); as árvores existentes não mudam
+
+    Args:
+        model: Modelo treinado (Random Forest, Gradient Boosting ou Hist Gradient Boosting)
+        model_name: Nome do modelo (define o parâmetro de árvores, ver RESOURCE_PARAMS)
+        X: Features de todas as linhas
+        y: Alvo de todas as linhas
+        n_new_rows: Quantidade de linhas novas
+        n_new_estimators: Árvores acrescentadas (padrão: proporcional às linhas novas, no mínimo 10)
+
+    Returns:
+        O próprio modelo, com as novas árvores
+    """
+    resource = RESOURCE_PARAMS.get(model_name, 'n_estimators')
+    current = model.get_params()[resource]
+    if n_new_estimators is None:
+        n_old_rows = max(1, len(y) - n_new_rows)
+        n_new_estimators = max(10, math.ceil(current * n_new_rows / n_old_rows))
+
+    model.set_params(warm_start=True, **{resource: current + n_new_estimators})
+    model.fit(X, y)
+    model.set_params(warm_start=False)
+    print(f"{model_name}: {n_new_estimators} árvores acrescentadas ({current} -> {current + n_new_estimators})")
+
+    return model
+
+
+def audit_incremental(model, model_name, X, y, new_positions, n_new_estimators=None, seed=42):
+    """
+    Compara o crescimento com warm_start com um retreino completo do mesmo modelo
+    20% das linhas novas ficam de fora dos dois ajustes e são usadas para comparar o R²
+
+    Returns:
+        Dicionário com o R² do modelo incremental e do retreino completo na validação
+    """
+    rng = np.random.default_rng(seed)
+    holdout = rng.choice(new_positions, size=max(1, len(new_positions) // 5), replace=False)
+    train = np.setdiff1d(np.arange(len(y)), holdout)
+    n_new_train = len(new_positions) - len(holdout)
+
+    X_train = X.iloc[train] if isinstance(X, pd.DataFrame) else X[train]
+    X_holdout = X.iloc[holdout] if isinstance(X, pd.DataFrame) else X[holdout]
+    y = np.asarray(y)
+
+    # O modelo incremental parte de uma cópia do modelo atual; o retreino completo, de um clone com as mesmas árvores
+    incremental = grow_model(copy.deepcopy(model), model_name, X_train, y[train], n_new_train, n_new_estimators)
+    resource = RESOURCE_PARAMS.get(model_name, 'n_estimators')
+    full = clone(model).set_params(warm_start=False, **{resource: incremental.get_params()[resource]})
+    full.fit(X_train, y[train])
+
+    return {
+        'holdout_rows': len(holdout),
+        'r2_incremental': float(r2_score(y[holdout], incremental.predict(X_holdout))),
+        'r2_full': float(r2_score(y[holdout], full.predict(X_holdout))),
+    }
+
+
+@instrumented('incremental_training')
+def incremental_training(raw_path, processed_path='data/bilheteria_processado', model_path=None, output_dir='models',
+                         n_new_estimators=None, error_threshold=DEFAULT_ERROR_THRESHOLD,
+                         drift_threshold=DEFAULT_DRIFT_THRESHOLD, tolerance=None):
+    """
+    Acrescenta um novo arquivo de sessões ao dataset processado e atualiza o modelo registrado
+    Cresce o modelo com warm_start (ver grow_model) ou, quando as novas sessões indicam que o modelo
+    ficou desatualizado, faz o retreino completo com modeling
+    Retreino completo quando:
+    - o dataset processado mudou desde o treino do modelo (impressão digital do manifesto)
+    - o MAE do modelo nas novas sessões passa de error_threshold x o MAE da validação cruzada
+    - alguma feature tem PSI acima de drift_threshold ou há categorias desconhecidas
+    - tolerance foi informada e o R² do incremental fica mais de tolerance abaixo do retreino completo
+      (ver audit_incremental)
+
+    Args:
+        raw_path: Novo arquivo no formato do bilheteria.csv
+        processed_path: Dataset processado (formato colunar) usado no treino do modelo
+        model_path: Modelo do registro (padrão: o registrado mais recentemente em <output_dir>/registry)
+        output_dir: Diretório onde salvar o modelo (o registro fica em <output_dir>/registry)
+        n_new_estimators: Árvores acrescentadas (padrão: proporcional às linhas novas)
+        error_threshold: Razão máxima entre o MAE nas novas sessões e o MAE da validação cruzada
+        drift_threshold: PSI máximo de cada feature
+        tolerance: Se informada, compara com um retreino completo (diferença máxima de R²)
+
+    Returns:
+        Dicionário com a decisão ('incremental', 'full' ou 'skipped') e as medidas usadas
+    """
+    model_path = model_path or latest_model_dir(os.path.join(output_dir, 'registry'))
+    manifest = load_manifest(model_path)
+    model_name = manifest['name']
+    pipeline = load_registered_pipeline(model_path)
+    store_fingerprint = path_hash(processed_path, {})
+
+    X_old, _, feature_names, _ = load_processed_data(processed_path)
+    if list(feature_names) != pipeline.feature_names:
+        raise ValueError("O pipeline do modelo não corresponde ao dataset processado")
+    n_old_rows = len(X_old)
+
+    with step('append_sessions') as record:
+        raw, processed = append_sessions(raw_path, processed_path, pipeline)
+        record.rows_out = 0 if processed is None else len(processed)
+    if processed is None or processed.empty:
+        return {'decision': 'skipped', 'new_rows': 0}
+
+    target = normalize_column_name(TARGET_COLUMN)
+    X_new = processed.drop(columns=[target])
+    y_new = processed[target].to_numpy()
+
+    model = load_registered_model(model_path, mmap=False)
+    datasets = model_datasets({model_name: model}, X_new, X_new.columns, pipeline)
+    mae_new = float(mean_absolute_error(y_new, model.predict(datasets[model_name][0])))
+    error_ratio = mae_new / manifest['metrics']['mae']
+
+    with step('drift_report', rows_in=len(processed)):
+        drift = drift_report(pipeline, X_old, X_new)
+    unknown = unknown_categories(pipeline, raw)
+
+    report = {
+        'new_rows': len(processed),
+        'base_version': os.path.basename(resolve_version(model_path)),
+        'mae_new_rows': mae_new,
+        'error_ratio': error_ratio,
+        'max_psi': max(drift.values()),
+        'drift': drift,
+        'unknown_categories': unknown,
+    }
+    print(f"\nNovas sessões: {len(processed)} | MAE do modelo atual: {mae_new:.1f} ({error_ratio:.2f}x o da validação cruzada)")
+    print(f"Maior PSI: {report['max_psi']:.3f} | Categorias desconhecidas: {unknown or 'nenhuma'}")
+
+    reasons = []
+    if manifest['data']['fingerprint'] != store_fingerprint:
+        reasons.append('dataset processado diferente do usado no treino')
+    if error_ratio > error_threshold:
+        reasons.append(f'erro {error_ratio:.2f}x acima do limite {error_threshold}')
+    if report['max_psi'] > drift_threshold:
+        reasons.append(f'PSI {report["max_psi"]:.3f} acima do limite {drift_threshold}')
+    if unknown:
+        reasons.append('categorias desconhecidas')
+    if not hasattr(model, 'warm_start'):
+        reasons.append(f'{type(model).__name__} não cresce com warm_start')
+
+    X_all, y_all, feature_names, _ = load_processed_data(processed_path)
+    X_model = model_datasets({model_name: model}, X_all, feature_names, pipeline)[model_name][0]
+
+    if not reasons and tolerance is not None:
+        with step('audit_incremental', rows_in=len(y_all)):
+            audit = audit_incremental(model, model_name, X_model, y_all, np.arange(n_old_rows, len(y_all)), n_new_estimators)
+        report['audit'] = audit
+        print(f"R² na validação: incremental {audit['r2_incremental']:.4f} | completo {audit['r2_full']:.4f}")
+        if audit['r2_full'] - audit['r2_incremental'] > tolerance:
+            reasons.append(f'R² do incremental mais de {tolerance} abaixo do retreino completo')
+
+    if reasons:
+        print(f"Retreino completo: {'; '.join(reasons)}")
+        report.update(decision='full', reasons=reasons)
+        modeling(processed_path, output_dir)
+        return report
+
+    with step('grow_model', rows_in=len(y_all)):
+        model = grow_model(model, model_name, X_model, y_all, len(processed), n_new_estimators)
+
+    report['decision'] = 'incremental'
+    save_model(model, model_name, output_dir, pipeline)
+    register_model(
+        model, model_name, os.path.join(output_dir, 'registry'), pipeline,
+        metrics={'r2': None, 'mae': manifest['metrics']['mae'], 'incremental': report},
+        data_path=processed_path, n_rows=len(y_all), feature_names=manifest['feature_names']
+    )
+
+    return report
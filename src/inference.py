@@ -0,0 +1,115 @@
+import os
+
+try:
+    from .model_registry import is_registry_path, load_registered_model, load_registered_pipeline, resolve_version
+    from .preprocessing import load_pipeline, pipeline_path_for
+    from .tree_engine import load_compiled_ensemble
+except ImportError:
+    from model_registry import is_registry_path, load_registered_model, load_registered_pipeline, resolve_version
+    from preprocessing import load_pipeline, pipeline_path_for
+    from tree_engine import load_compiled_ensemble
+
+# Funções usadas para prever com um modelo já treinado
+# Este módulo não importa o scikit-learn nem as bibliotecas de gráficos: com o modelo compilado
+# (tree_engine), carregar e prever fica bem mais rápido que importar o modeling
+# model_path pode ser o arquivo .pkl ou um modelo do registro (ex.: models/registry/gradient_boosting,
+# que usa a última versão, ou models/registry/gradient_boosting/v0003)
+
+
+def load_model(model_path):
+    """
+    Carrega um modelo salvo
+    
+    Args:
+        model_path: Caminho para o arquivo do modelo
+    
+    Returns:
+        model: Modelo carregado
+    """
+    if is_registry_path(model_path):
+        model = load_registered_model(model_path)
+        print(f"Modelo carregado de: {resolve_version(model_path)}")
+        return model
+
+    # O joblib (e o scikit-learn, ao desserializar o modelo) só é importado quando necessário
+    import joblib
+
+    model = joblib.load(model_path)
+    print(f"Modelo carregado de: {model_path}")
+    
+    return model
+
+
+def compiled_model_path(model_path):
+    """
+    Diretório do modelo compilado salvo junto de um modelo
+    Ex.: models/gradient_boosting_model.pkl -> models/gradient_boosting_compiled
+    """
+    base = os.path.splitext(model_path)[0]
+    if base.endswith('_model'):
+        base = base[:-len('_model')]
+
+    return f'{base}_compiled'
+
+
+def load_compiled_model(model_path):
+    """
+    Carrega o modelo compilado (CompiledEnsemble) salvo junto de um modelo
+    Tem o mesmo predict do modelo original (previsões idênticas no Gradient Boosting e iguais a menos
+    do arredondamento no Random Forest), com menor latência por chamada
+
+    Args:
+        model_path: Caminho para o arquivo do modelo
+
+    Returns:
+        model: CompiledEnsemble
+    """
+    if is_registry_path(model_path):
+        # Os arrays do registro são mapeados em memória: a carga não lê as árvores
+        model = load_registered_model(model_path, compiled=True)
+        print(f"Modelo compilado carregado de: {resolve_version(model_path)}")
+        return model
+
+    model = load_compiled_ensemble(compiled_model_path(model_path))
+    print(f"Modelo compilado carregado de: {compiled_model_path(model_path)}")
+
+    return model
+
+
+def load_model_pipeline(model_path):
+    """
+    Carrega o pipeline de pré-processamento salvo junto de um modelo
+
+    Args:
+        model_path: Caminho para o arquivo do modelo
+
+    Returns:
+        pipeline: PreprocessingPipeline ajustado
+    """
+    if is_registry_path(model_path):
+        return load_registered_pipeline(model_path)
+
+    return load_pipeline(pipeline_path_for(model_path))
+
+
+def predict_sessions(model, pipeline, sessions):
+    """
+    Prevê a quantidade de ingressos vendidos para sessões brutas (formato do bilheteria.csv)
+    Aplica o pipeline já ajustado, sem reprocessar o dataset nem reajustar o encoder
+    Modelos treinados com a matriz esparsa (sem nomes de features) recebem as features em CSR
+    e modelos com categorias nativas (HistGradientBoostingRegressor) a codificação ordinal
+
+    Args:
+        model: Modelo treinado
+        pipeline: PreprocessingPipeline salvo junto do modelo
+        sessions: DataFrame, dicionário (uma sessão) ou lista de dicionários
+
+    Returns:
+        Array com as previsões
+    """
+    if hasattr(model, 'is_categorical_'):
+        return model.predict(pipeline.transform_ordinal(sessions))
+
+    sparse = not hasattr(model, 'feature_names_in_')
+
+    return model.predict(pipeline.transform(sessions, sparse=sparse))
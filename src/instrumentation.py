@@ -0,0 +1,311 @@
+import collections
+import cProfile
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Instrumentação das etapas do pipeline: cada step(...) registra tempo real, tempo de CPU,
+# pico de memória e linhas de entrada e saída. Os registros podem ser gravados como logs JSON
+# (uma linha por passo) ou em um arquivo de texto no formato do Prometheus, e cada etapa
+# (passo mais externo) pode ser perfilada com cProfile ou com um profiler por amostragem
+#
+# Configuração por código (configure) ou por variáveis de ambiente (configure_from_env):
+#   PIPELINE_METRICS=metrics/pipeline.jsonl  PIPELINE_METRICS_FORMAT=json|prometheus
+#   PIPELINE_PROFILE=cprofile|sampling       PIPELINE_PROFILE_DIR=metrics/profiles
+
+SETTINGS = {
+    'output': None,
+    'format': 'json',
+    'profile': None,
+    'profile_dir': 'metrics/profiles',
+}
+
+# Registros guardados em memória (ver records()): só os últimos MAX_RECORDS, para que processos longos
+# (ex.: prediction_server) não acumulem um registro por passo indefinidamente
+MAX_RECORDS = 10_000
+RECORDS = collections.deque(maxlen=MAX_RECORDS)
+# Último registro de cada passo, usado no arquivo do Prometheus (limitado à quantidade de passos distintos)
+LATEST_RECORDS = {}
+
+_local = threading.local()
+
+
+def configure(output=None, output_format='json', profile=None, profile_dir='metrics/profiles'):
+    """
+    Define onde e como os registros são gravados
+
+    Args:
+        output: Arquivo de saída (None apenas guarda os registros em memória, ver records())
+        output_format: 'json' (uma linha JSON por passo, acrescentada ao arquivo) ou
+            'prometheus' (arquivo de texto reescrito ao fim de cada etapa)
+        profile: None, 'cprofile' ou 'sampling' para perfilar cada etapa
+        profile_dir: Diretório dos perfis (<etapa>.prof ou <etapa>.collapsed)
+    """
+    if output_format not in ('json', 'prometheus'):
+        raise ValueError(f"Formato de métricas desconhecido: {output_format}")
+    if profile not in (None, 'cprofile', 'sampling'):
+        raise ValueError(f"Profiler desconhecido: {profile}")
+
+    SETTINGS.update(output=output, format=output_format, profile=profile, profile_dir=profile_dir)
+
+
+def configure_from_env():
+    """
+    Configura a instrumentação a partir das variáveis de ambiente PIPELINE_METRICS,
+    PIPELINE_METRICS_FORMAT, PIPELINE_PROFILE e PIPELINE_PROFILE_DIR
+    """
+    configure(
+        output=os.environ.get('PIPELINE_METRICS') or None,
+        output_format=os.environ.get('PIPELINE_METRICS_FORMAT', 'json'),
+        profile=os.environ.get('PIPELINE_PROFILE') or None,
+        profile_dir=os.environ.get('PIPELINE_PROFILE_DIR', 'metrics/profiles'),
+    )
+
+
+def records():
+    """
+    Registros dos últimos passos concluídos neste processo (até MAX_RECORDS)
+    """
+    return list(RECORDS)
+
+
+def reset_peak_rss():
+    """
+    Zera o pico de memória (VmHWM) do processo no Linux; em outros sistemas o pico é o do processo todo
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as file:
+            file.write('5')
+    except OSError:
+        pass
+
+
+def peak_rss_mb():
+    """
+    Pico de memória residente (MB) desde o último reset_peak_rss
+    """
+    try:
+        with open('/proc/self/status') as file:
+            for line in file:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    # ru_maxrss é em KB no Linux e em bytes no macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+
+class StepRecord:
+    """
+    Medidas de um passo. rows_in e rows_out podem ser preenchidos dentro do bloco with
+    """
+
+    def __init__(self, name, path, rows_in=None):
+        self.name = name
+        self.path = path
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.peak_rss_mb = None
+
+    def to_dict(self):
+        return {
+            'stage': self.path[0],
+            'step': '/'.join(self.path),
+            'started_at': self.started_at,
+            'wall_s': self.wall_s,
+            'cpu_s': self.cpu_s,
+            'peak_rss_mb': self.peak_rss_mb,
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out,
+            'pid': os.getpid(),
+        }
+
+
+class SamplingProfiler:
+    """
+    Profiler por amostragem: uma thread lê a pilha da thread perfilada a cada interval segundos
+    e conta as pilhas no formato 'collapsed' (arquivo:função;arquivo:função contagem),
+    lido pelo flamegraph.pl e pelo speedscope. O custo não depende da quantidade de chamadas
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.counts = collections.Counter()
+        self._target = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None:
+                stack.append(f'{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}')
+                frame = frame.f_back
+            if stack:
+                self.counts[';'.join(reversed(stack))] += 1
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as file:
+            for stack, count in self.counts.most_common():
+                file.write(f'{stack} {count}\n')
+
+
+def _stack():
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+
+@contextmanager
+def step(name, rows_in=None):
+    """
+    Mede um passo do pipeline. Passos podem ser aninhados: o passo mais externo é a etapa
+    (ex.: 'preprocessing') e os internos aparecem como 'preprocessing/read_csv'
+
+    Ex.:
+        with step('read_csv') as record:
+            data = pd.read_csv(...)
+            record.rows_out = len(data)
+
+    Args:
+        name: Nome do passo
+        rows_in: Quantidade de linhas de entrada (também pode ser preenchida dentro do bloco)
+    """
+    stack = _stack()
+    parent = stack[-1] if stack else None
+    record = StepRecord(name, (parent.path if parent else ()) + (name,), rows_in)
+
+    # O pico de memória é zerado a cada passo: antes, guarda no passo externo o pico que ele já atingiu
+    if parent is not None:
+        parent.peak_rss_mb = max(parent.peak_rss_mb or 0, peak_rss_mb() or 0)
+    reset_peak_rss()
+
+    profiler = _start_profiler() if parent is None else None
+    stack.append(record)
+    record.started_at = time.time()
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        yield record
+    finally:
+        record.wall_s = time.perf_counter() - wall_start
+        record.cpu_s = time.process_time() - cpu_start
+        stack.pop()
+        record.peak_rss_mb = max(record.peak_rss_mb or 0, peak_rss_mb() or 0) or None
+        if parent is not None:
+            parent.peak_rss_mb = max(parent.peak_rss_mb or 0, record.peak_rss_mb or 0)
+        if profiler is not None:
+            _save_profiler(profiler, name)
+
+        entry = record.to_dict()
+        RECORDS.append(entry)
+        LATEST_RECORDS[entry['step']] = entry
+        _emit(entry, stage_finished=parent is None)
+
+
+def _start_profiler():
+    if SETTINGS['profile'] == 'cprofile':
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+    if SETTINGS['profile'] == 'sampling':
+        profiler = SamplingProfiler()
+        profiler.start()
+        return profiler
+    return None
+
+
+def _save_profiler(profiler, stage_name):
+    os.makedirs(SETTINGS['profile_dir'], exist_ok=True)
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+        path = os.path.join(SETTINGS['profile_dir'], f'{stage_name}.prof')
+        profiler.dump_stats(path)
+    else:
+        profiler.stop()
+        path = os.path.join(SETTINGS['profile_dir'], f'{stage_name}.collapsed')
+        profiler.save(path)
+    print(f"Perfil da etapa {stage_name} salvo em: {path}")
+
+
+def _emit(record, stage_finished):
+    output = SETTINGS['output']
+    if output is None:
+        return
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+
+    if SETTINGS['format'] == 'json':
+        with open(output, 'a', encoding='utf-8') as file:
+            file.write(json.dumps(record, ensure_ascii=False) + '\n')
+    elif stage_finished:
+        write_prometheus(LATEST_RECORDS.values(), output)
+
+
+PROMETHEUS_METRICS = [
+    ('wall_s', 'pipeline_step_wall_seconds', 'Tempo real do passo'),
+    ('cpu_s', 'pipeline_step_cpu_seconds', 'Tempo de CPU do processo durante o passo'),
+    ('peak_rss_mb', 'pipeline_step_peak_rss_bytes', 'Pico de memória residente durante o passo'),
+    ('rows_in', 'pipeline_step_rows_in', 'Linhas de entrada do passo'),
+    ('rows_out', 'pipeline_step_rows_out', 'Linhas de saída do passo'),
+]
+
+
+def write_prometheus(step_records, path):
+    """
+    Grava o último registro de cada passo no formato de texto do Prometheus (ex.: para o textfile
+    collector do node_exporter). O arquivo é trocado de uma vez, sem leituras parciais
+    """
+    latest = {}
+    for record in step_records:
+        latest[record['step']] = record
+
+    lines = []
+    for key, metric, description in PROMETHEUS_METRICS:
+        lines.append(f'# HELP {metric} {description}')
+        lines.append(f'# TYPE {metric} gauge')
+        for record in latest.values():
+            value = record[key]
+            if value is None:
+                continue
+            if key == 'peak_rss_mb':
+                value = int(value * 1024 * 1024)
+            lines.append(f'{metric}{{stage="{record["stage"]}",step="{record["step"]}"}} {value}')
+
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        file.write('\n'.join(lines) + '\n')
+    os.replace(temp_path, path)
+
+
+def instrumented(name=None):
+    """
+    Decorador que mede a função inteira como um passo (por padrão com o nome da função)
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with step(name or func.__name__):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
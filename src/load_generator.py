@@ -0,0 +1,121 @@
+import argparse
+import http.client
+import json
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+
+def load_sample_sessions(data_path, limit=100):
+    """
+    Lê sessões do bilheteria.csv para usar como corpo das requisições
+
+    Returns:
+        Lista de dicionários (valores nulos viram null no JSON)
+    """
+    data = pd.read_csv(data_path, sep=';', skiprows=1, nrows=limit)
+    data = data.astype(object).where(data.notnull(), None)
+
+    return data.to_dict(orient='records')
+
+
+def run_load(host, port, sessions, concurrency=16, duration=10.0, sessions_per_request=1):
+    """
+    Dispara requisições concorrentes contra o servidor de previsões pelo tempo informado
+    Cada cliente usa uma conexão keep-alive e mede a latência de cada requisição
+
+    Args:
+        host: Endereço do servidor
+        port: Porta do servidor
+        sessions: Lista de sessões usadas nas requisições
+        concurrency: Quantidade de clientes simultâneos
+        duration: Duração do teste em segundos
+        sessions_per_request: Quantidade de sessões por requisição
+
+    Returns:
+        Dicionário com vazão, latências (p50/p95/p99/máx em ms) e erros
+    """
+    bodies = [
+        json.dumps(sessions[i:i + sessions_per_request]).encode('utf-8')
+        for i in range(0, len(sessions) - sessions_per_request + 1, sessions_per_request)
+    ]
+    latencies = [[] for _ in range(concurrency)]
+    errors = [0] * concurrency
+    stop_at = time.perf_counter() + duration
+
+    def client(worker_id):
+        connection = http.client.HTTPConnection(host, port)
+        i = worker_id
+        while time.perf_counter() < stop_at:
+            body = bodies[i % len(bodies)]
+            i += 1
+            start = time.perf_counter()
+            try:
+                connection.request('POST', '/predict', body, {'Content-Type': 'application/json'})
+                response = connection.getresponse()
+                response.read()
+                if response.status != 200:
+                    errors[worker_id] += 1
+                    continue
+            except (OSError, http.client.HTTPException):
+                errors[worker_id] += 1
+                connection.close()
+                connection = http.client.HTTPConnection(host, port)
+                continue
+            latencies[worker_id].append(time.perf_counter() - start)
+        connection.close()
+
+    threads = [threading.Thread(target=client, args=(worker_id,)) for worker_id in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    all_latencies = np.concatenate([np.array(values) for values in latencies]) * 1000
+    if len(all_latencies) == 0:
+        all_latencies = np.array([np.nan])
+
+    return {
+        'requests': int(sum(len(values) for values in latencies)),
+        'errors': int(sum(errors)),
+        'concurrency': concurrency,
+        'sessions_per_request': sessions_per_request,
+        'duration_s': elapsed,
+        'requests_per_s': sum(len(values) for values in latencies) / elapsed,
+        'p50_ms': float(np.percentile(all_latencies, 50)),
+        'p95_ms': float(np.percentile(all_latencies, 95)),
+        'p99_ms': float(np.percentile(all_latencies, 99)),
+        'max_ms': float(np.max(all_latencies)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Gerador de carga para o servidor de previsões')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--data', default='data/bilheteria.csv')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--sessions-per-request', type=int, default=1)
+    parser.add_argument('--output', help='Arquivo JSON para salvar o resultado')
+    args = parser.parse_args()
+
+    sessions = load_sample_sessions(args.data)
+    result = run_load(args.host, args.port, sessions, args.concurrency, args.duration, args.sessions_per_request)
+
+    print("\nResultado do teste de carga")
+    print(f"Requisições: {result['requests']} | Erros: {result['errors']}")
+    print(f"Vazão: {result['requests_per_s']:.0f} req/s")
+    print(f"Latência p50: {result['p50_ms']:.2f} ms | p95: {result['p95_ms']:.2f} ms | p99: {result['p99_ms']:.2f} ms")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(result, file, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+import datetime
+import hashlib
+import json
+import os
+
+try:
+    from .pipeline_runner import path_hash
+    from .preprocessing import load_pipeline, save_pipeline
+    from .tree_engine import compile_ensemble, load_compiled_ensemble
+except ImportError:
+    from pipeline_runner import path_hash
+    from preprocessing import load_pipeline, save_pipeline
+    from tree_engine import compile_ensemble, load_compiled_ensemble
+
+# Registro de modelos versionados: models/registry/<modelo>/<versão>/
+#   manifest.json   features, métricas da validação cruzada, impressão digital dos dados, data do treino
+#   compiled/       árvores em arrays .npy (tree_engine), mapeados em memória na carga
+#   model.joblib    modelo do scikit-learn (sem compressão por padrão, os arrays podem ser mapeados)
+#   pipeline.json   pipeline de pré-processamento
+# O arquivo LATEST de cada modelo aponta para a última versão registrada
+# Carregar o modelo compilado só mapeia os arquivos: a carga é quase instantânea e vários processos
+# do servidor compartilham a mesma cópia física (page cache) do modelo
+
+MANIFEST_FILE = 'manifest.json'
+LATEST_FILE = 'LATEST'
+MODEL_FILE = 'model.joblib'
+COMPILED_DIR = 'compiled'
+PIPELINE_FILE = 'pipeline.json'
+FORMAT_VERSION = 1
+
+
+def model_key(model_name):
+    return model_name.lower().replace(' ', '_')
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _next_version(model_dir):
+    versions = list_versions(model_dir)
+    number = int(versions[-1][1:]) + 1 if versions else 1
+
+    return f'v{number:04d}'
+
+
+def list_versions(model_dir):
+    """
+    Versões registradas de um modelo (em ordem), ex.: ['v0001', 'v0002']
+    """
+    if not os.path.isdir(model_dir):
+        return []
+
+    return sorted(
+        name for name in os.listdir(model_dir)
+        if name.startswith('v') and os.path.exists(os.path.join(model_dir, name, MANIFEST_FILE))
+    )
+
+
+def register_model(model, model_name, registry_dir='models/registry', pipeline=None, metrics=None,
+                   data_path=None, n_rows=None, feature_names=None, compress=0):
+    """
+    Registra um modelo treinado como uma nova versão
+
+    Args:
+        model: Modelo treinado
+        model_name: Nome do modelo (ex.: 'Gradient Boosting')
+        registry_dir: Diretório do registro
+        pipeline: PreprocessingPipeline usado para gerar as features
+        metrics: Métricas da validação cruzada (ex.: results_cv do modeling)
+        data_path: Dataset processado usado no treino (entra na impressão digital dos dados)
+        n_rows: Quantidade de linhas do treino
+        feature_names: Colunas usadas pelo modelo, na ordem
+        compress: Nível de compressão do joblib (0 mantém os arrays mapeáveis em memória)
+
+    Returns:
+        Diretório da versão registrada
+    """
+    import joblib
+
+    model_dir = os.path.join(registry_dir, model_key(model_name))
+    version = _next_version(model_dir)
+    version_dir = os.path.join(model_dir, version)
+    os.makedirs(version_dir)
+
+    joblib.dump(model, os.path.join(version_dir, MODEL_FILE), compress=compress)
+    if hasattr(model, 'estimators_'):
+        compile_ensemble(model).save(os.path.join(version_dir, COMPILED_DIR))
+    if pipeline is not None:
+        save_pipeline(pipeline, os.path.join(version_dir, PIPELINE_FILE))
+
+    files = {}
+    for root, dirs, names in os.walk(version_dir):
+        dirs.sort()
+        for name in sorted(names):
+            path = os.path.join(root, name)
+            files[os.path.relpath(path, version_dir).replace(os.sep, '/')] = _file_sha256(path)
+
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'name': model_name,
+        'version': version,
+        'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'model_class': f'{type(model).__module__}.{type(model).__name__}',
+        'feature_names': [str(name) for name in feature_names] if feature_names is not None else None,
+        'metrics': metrics,
+        'data': {
+            'path': data_path,
+            'fingerprint': path_hash(data_path, {}) if data_path else None,
+            'rows': n_rows,
+        },
+        'compiled': os.path.isdir(os.path.join(version_dir, COMPILED_DIR)),
+        'compress': compress,
+        'files': files,
+    }
+    with open(os.path.join(version_dir, MANIFEST_FILE), 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, ensure_ascii=False, indent=4)
+
+    # LATEST é trocado de uma vez: leitores nunca veem uma versão pela metade
+    temp_path = os.path.join(model_dir, f'{LATEST_FILE}.tmp')
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        file.write(version)
+    os.replace(temp_path, os.path.join(model_dir, LATEST_FILE))
+
+    print(f"Modelo registrado em: {version_dir}")
+
+    return version_dir
+
+
+def is_registry_path(path):
+    """
+    Se o caminho é uma versão do registro ou o diretório de um modelo registrado
+    """
+    return os.path.isdir(path) and (
+        os.path.exists(os.path.join(path, MANIFEST_FILE)) or os.path.exists(os.path.join(path, LATEST_FILE))
+    )
+
+
+def resolve_version(path, version=None):
+    """
+    Diretório de uma versão: path pode ser a própria versão ou o diretório do modelo
+    (usa a versão informada ou a apontada por LATEST)
+    """
+    if os.path.exists(os.path.join(path, MANIFEST_FILE)):
+        return path
+    if version is None:
+        with open(os.path.join(path, LATEST_FILE), encoding='utf-8') as file:
+            version = file.read().strip()
+
+    return os.path.join(path, version)
+
+
+def latest_model_dir(registry_dir='models/registry'):
+    """
+    Diretório do modelo registrado mais recentemente (pela data da versão LATEST de cada modelo)
+    Depois de um retreino completo o melhor modelo pode ser de outro tipo
+    """
+    latest = None
+    for key in sorted(os.listdir(registry_dir)) if os.path.isdir(registry_dir) else []:
+        model_dir = os.path.join(registry_dir, key)
+        if not os.path.exists(os.path.join(model_dir, LATEST_FILE)):
+            continue
+        created_at = load_manifest(model_dir)['created_at']
+        if latest is None or created_at >= latest[0]:
+            latest = (created_at, model_dir)
+    if latest is None:
+        raise FileNotFoundError(f"Nenhum modelo registrado em {registry_dir}")
+
+    return latest[1]
+
+
+def load_manifest(path, version=None):
+    with open(os.path.join(resolve_version(path, version), MANIFEST_FILE), encoding='utf-8') as file:
+        return json.load(file)
+
+
+def load_registered_model(path, version=None, compiled=False, mmap=True):
+    """
+    Carrega um modelo do registro
+
+    Args:
+        path: Versão ou diretório do modelo no registro
+        version: Versão (padrão: LATEST)
+        compiled: Se True, carrega as árvores compiladas (tree_engine), sem importar o scikit-learn
+        mmap: Se True, mapeia os arrays em memória em vez de lê-los
+
+    Returns:
+        Modelo carregado
+    """
+    version_dir = resolve_version(path, version)
+    if compiled:
+        compiled_dir = os.path.join(version_dir, COMPILED_DIR)
+        if not os.path.isdir(compiled_dir):
+            raise ValueError(f"A versão {version_dir} não tem modelo compilado")
+        return load_compiled_ensemble(compiled_dir, mmap_mode='r' if mmap else None)
+
+    import joblib
+
+    return joblib.load(os.path.join(version_dir, MODEL_FILE), mmap_mode='r' if mmap else None)
+
+
+def load_registered_pipeline(path, version=None):
+    return load_pipeline(os.path.join(resolve_version(path, version), PIPELINE_FILE))
+
+
+def verify_version(path, version=None):
+    """
+    Confere os arquivos de uma versão com os hashes do manifesto
+
+    Returns:
+        Lista com os arquivos alterados ou ausentes (vazia se a versão estiver íntegra)
+    """
+    version_dir = resolve_version(path, version)
+    manifest = load_manifest(version_dir)
+
+    return [
+        name for name, expected in manifest['files'].items()
+        if not os.path.exists(os.path.join(version_dir, name))
+        or _file_sha256(os.path.join(version_dir, name)) != expected
+    ]
+
+
+def print_registry(registry_dir='models/registry'):
+    """
+    Mostra os modelos registrados, com a versão, a data do treino e o R² da validação cruzada
+    """
+    if not os.path.isdir(registry_dir):
+        print(f"Nenhum modelo registrado em {registry_dir}")
+        return
+
+    for key in sorted(os.listdir(registry_dir)):
+        model_dir = os.path.join(registry_dir, key)
+        versions = list_versions(model_dir)
+        if not versions:
+            continue
+        latest = resolve_version(model_dir)
+        print(f"\n{key}")
+        for version in versions:
+            manifest = load_manifest(model_dir, version)
+            r2 = (manifest['metrics'] or {}).get('r2')
+            marker = '*' if os.path.join(model_dir, version) == latest else ' '
+            r2_text = f"{r2:.4f}" if r2 is not None else '-'
+            print(f"{marker} {version} | {manifest['created_at']} | R²: {r2_text} | dados {(manifest['data']['fingerprint'] or '-')[:12]}")
@@ -2,10 +2,30 @@ import pandas as pd
 import numpy as np
 import joblib
 import os
-from sklearn.model_selection import train_test_split, cross_validate, KFold
-from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
+from sklearn.model_selection import train_test_split, KFold
+from sklearn.base import clone
+from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor, HistGradientBoostingRegressor
 from sklearn.metrics import r2_score, mean_absolute_error, mean_squared_error
 
+try:
+    from .preprocessing import load_pipeline, pipeline_path_for, save_pipeline
+    from .storage import load_columnar_dataset, load_sparse_dataset
+    from .tree_engine import compile_ensemble
+    from .inference import compiled_model_path, load_compiled_model, load_model, load_model_pipeline, predict_sessions
+    from .hyperparameter_search import RESOURCE_PARAMS, SEARCH_SPACES, print_leaderboard, save_leaderboard, successive_halving_search
+    from .instrumentation import instrumented, step
+    from .cross_validation import FoldEnsemble, fit_splits, summarize
+    from .model_registry import register_model
+except ImportError:
+    from preprocessing import load_pipeline, pipeline_path_for, save_pipeline
+    from storage import load_columnar_dataset, load_sparse_dataset
+    from tree_engine import compile_ensemble
+    from inference import compiled_model_path, load_compiled_model, load_model, load_model_pipeline, predict_sessions
+    from hyperparameter_search import RESOURCE_PARAMS, SEARCH_SPACES, print_leaderboard, save_leaderboard, successive_halving_search
+    from instrumentation import instrumented, step
+    from cross_validation import FoldEnsemble, fit_splits, summarize
+    from model_registry import register_model
+
 def evaluate_single_split(model, X_train, X_test, y_train, y_test, model_name):
     """
     Avalia modelo usando train_test_split
@@ -18,31 +38,41 @@ def evaluate_single_split(model, X_train, X_test, y_train, y_test, model_name):
     mae = mean_absolute_error(y_test, y_pred)
     rmse = np.sqrt(mean_squared_error(y_test, y_pred))
 
+    print_single_split(r2, mae, rmse, model_name)
+    
+    return model
+
+
+def print_single_split(r2, mae, rmse, model_name):
     print(f"\n{model_name} - Single Split")
     print(f"R²: {r2:.3f}")
     print(f"MAE: {mae:.1f}")
     print(f"RMSE: {rmse:.1f}")
-    
-    return model
 
 
-def evaluate_cross_validation(model, X, y, model_name):
+def cross_validation_splits(n_samples):
     """
-    Avalia usando cross_validate (MUITO mais rápido que 3 cross_val_score)
+    Índices de treino e teste das 5 dobras da validação cruzada
     """
     kfold = KFold(n_splits=5, shuffle=True, random_state=42)
-    
-    scoring = {
-        'r2': 'r2',
-        'neg_mae': 'neg_mean_absolute_error',
-        'neg_rmse': 'neg_root_mean_squared_error'
-    }
-    
-    scores = cross_validate(model, X, y, cv=kfold, scoring=scoring, n_jobs=-1)
-    
-    mean_r2 = np.mean(scores['test_r2'])
-    mean_mae = -np.mean(scores['test_neg_mae'])
-    mean_rmse = -np.mean(scores['test_neg_rmse'])
+
+    return list(kfold.split(np.zeros(n_samples)))
+
+
+def evaluate_cross_validation(model, X, y, model_name, n_jobs=-1):
+    """
+    Avalia com validação cruzada de 5 dobras, com as dobras em paralelo (ver cross_validation.fit_splits)
+    """
+    results = fit_splits(model, X, y, cross_validation_splits(len(y)), n_jobs=n_jobs)
+
+    return print_cross_validation(results, model_name)
+
+
+def print_cross_validation(results, model_name):
+    """
+    Mostra e devolve as médias de R², MAE e RMSE das dobras
+    """
+    mean_r2, mean_mae, mean_rmse = summarize(results)
 
     print(f"\n{model_name} - Cross Validation - 5 Folds")
     print(f"R² Médio:   {mean_r2:.3f}")
@@ -65,7 +95,7 @@ def print_feature_importance(model, feature_names, model_name):
             print(f"{i+1}. {feature_names[indices[i]]}: {importances[indices[i]]:.4f}")
 
 
-def save_model(model, model_name, output_dir='models'):
+def save_model(model, model_name, output_dir='models', pipeline=None):
     """
     Salva o modelo treinado e informações relacionadas
     
@@ -73,6 +103,10 @@ def save_model(model, model_name, output_dir='models'):
         model: Modelo treinado
         model_name: Nome do modelo
         output_dir: Diretório onde salvar o modelo
+        pipeline: PreprocessingPipeline usado para gerar as features do modelo.
+            Se informado, é salvo junto do modelo em <nome>_pipeline.json
+
+    Também exporta o modelo compilado (arrays NumPy, ver tree_engine) em <nome>_compiled/
     """
     # Criar diretório se não existir
     os.makedirs(output_dir, exist_ok=True)
@@ -82,47 +116,24 @@ def save_model(model, model_name, output_dir='models'):
     joblib.dump(model, model_filename)
     print(f"\nModelo salvo em: {model_filename}")
 
+    if pipeline is not None:
+        pipeline_filename = pipeline_path_for(model_filename)
+        save_pipeline(pipeline, pipeline_filename)
+        print(f"Pipeline de pré-processamento salvo em: {pipeline_filename}")
 
+    # O tree_engine compila apenas ensembles com estimators_ (Random Forest e Gradient Boosting)
+    if hasattr(model, 'estimators_'):
+        compiled_dir = compiled_model_path(model_filename)
+        compile_ensemble(model).save(compiled_dir)
+        print(f"Modelo compilado salvo em: {compiled_dir}")
 
-def load_model(model_path):
-    """
-    Carrega um modelo salvo
-    
-    Args:
-        model_path: Caminho para o arquivo do modelo
-    
-    Returns:
-        model: Modelo carregado
-    """
-    model = joblib.load(model_path)
-    print(f"Modelo carregado de: {model_path}")
-    
-    return model
 
 
-def modeling(data_path, output_dir='models'):
+def build_models():
     """
-    Função que modela o dataset
-    
-    Args:
-        data_path: Caminho para os dados processados
-        save_best_model: Se True, salva o melhor modelo
-        output_dir: Diretório onde salvar o modelo
-    
-    Returns:
-        best_model: O melhor modelo treinado
-        feature_names: Lista com os nomes das features
+    Modelos comparados no modeling, com os hiperparâmetros padrão
     """
-
-    processed_data = pd.read_csv(data_path, sep=',')
-    
-    X = processed_data.drop(columns=['quantidade_de_ingressos_vendidos'])
-    y = processed_data['quantidade_de_ingressos_vendidos']
-    feature_names = X.columns
-
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-    
-    models = {
+    return {
         'Random Forest': RandomForestRegressor(
             n_estimators=200,
             max_depth=15,
@@ -141,26 +152,171 @@ def modeling(data_path, output_dir='models'):
             min_samples_leaf=4,         # Mais regularização
             max_features='sqrt',        # Reduzir correlação entre árvores
             random_state=42
+        ),
+        # Árvores sobre histogramas (até 255 faixas por feature), com as colunas categóricas
+        # lidas nativamente (codificação ordinal) e parada antecipada; usa todos os núcleos (OpenMP)
+        'Hist Gradient Boosting': HistGradientBoostingRegressor(
+            max_iter=500,
+            learning_rate=0.05,
+            max_leaf_nodes=31,
+            min_samples_leaf=10,
+            categorical_features='from_dtype',
+            early_stopping=True,
+            validation_fraction=0.1,
+            n_iter_no_change=50,
+            random_state=42
         )
     }
+
+
+def uses_native_categories(model):
+    """
+    Se o modelo lê as colunas categóricas nativamente (codificação ordinal) em vez do One-Hot Encoding
+    """
+    return isinstance(model, HistGradientBoostingRegressor)
+
+
+def load_processed_data(data_path):
+    """
+    Carrega o dataset processado e o pipeline que o gerou
+
+    Args:
+        data_path: Caminho para os dados processados: diretório binário colunar, .csv
+            ou .npz esparso gerado com preprocessing(..., sparse=True)
+
+    Returns:
+        Tupla com X, y, nomes das features e o PreprocessingPipeline (None se não existir)
+    """
+    if data_path.endswith('.npz'):
+        # Matriz esparsa: treino e previsão sem densificar o One-Hot Encoding
+        X, y, feature_names = load_sparse_dataset(data_path)
+    else:
+        if os.path.isdir(data_path):
+            # Formato colunar: sem parse de texto e com os tipos compactos do pré-processamento
+            processed_data = load_columnar_dataset(data_path)
+        else:
+            processed_data = pd.read_csv(data_path, sep=',')
+
+        X = processed_data.drop(columns=['quantidade_de_ingressos_vendidos'])
+        y = processed_data['quantidade_de_ingressos_vendidos']
+        feature_names = X.columns
+
+    # Pipeline que gerou o dataset processado, salvo junto do melhor modelo
+    pipeline = None
+    if os.path.exists(pipeline_path_for(data_path)):
+        pipeline = load_pipeline(pipeline_path_for(data_path))
+        if pipeline.feature_names != list(feature_names):
+            raise ValueError("O pipeline salvo não corresponde às colunas do dataset processado")
+
+    return X, y, feature_names, pipeline
+
+
+def model_datasets(models, X, feature_names, pipeline):
+    """
+    Features usadas por cada modelo: o One-Hot Encoding do dataset processado ou, para modelos
+    com categorias nativas, a codificação ordinal derivada dele (calculada uma única vez)
+    Sem o pipeline salvo não há como derivar a codificação ordinal, e esses modelos ficam de fora
+
+    Returns:
+        Dicionário com o nome do modelo e a tupla (X, nomes das features)
+    """
+    datasets = {}
+    ordinal = None
+    for name, model in models.items():
+        if not uses_native_categories(model):
+            datasets[name] = (X, feature_names)
+        elif pipeline is None:
+            print(f"{name} ignorado: pipeline de pré-processamento não encontrado")
+        else:
+            if ordinal is None:
+                ordinal = (pipeline.ordinal_from_one_hot(X), pipeline.ordinal_feature_names)
+            datasets[name] = ordinal
+
+    return datasets
+
+
+FINAL_MODELS = ['split', 'refit', 'folds']
+
+
+@instrumented('modeling')
+def modeling(data_path, output_dir='models', search_budget=None, search_clock='wall', final_model='split', n_jobs=-1,
+             register=True):
+    """
+    Função que modela o dataset
     
+    Args:
+        data_path: Caminho para os dados processados: diretório binário colunar, .csv
+            ou .npz esparso gerado com preprocessing(..., sparse=True)
+        output_dir: Diretório onde salvar o modelo
+        search_budget: Se informado, faz a busca de hiperparâmetros com successive halving
+            (ver hyperparameter_search) com esse orçamento em segundos, em vez dos hiperparâmetros fixos
+        search_clock: 'wall' (tempo real) ou 'cpu' (tempo de CPU) para medir o orçamento da busca
+        final_model: Modelo salvo de cada tipo, ajustado junto com as dobras da validação cruzada:
+            'split' (treino com 80% e métricas nos outros 20%), 'refit' (todos os dados)
+            ou 'folds' (ensemble dos 5 modelos das dobras, sem nenhum ajuste extra)
+        n_jobs: Orçamento de CPU da validação cruzada, dividido entre dobras e árvores (ver cross_validation)
+        register: Se True, também registra o melhor modelo como uma nova versão em <output_dir>/registry
+            (ver model_registry), com as features, as métricas e a impressão digital dos dados
+    
+    Returns:
+        best_model: O melhor modelo treinado
+        feature_names: Lista com os nomes das features
+    """
+
+    with step('load_processed_data') as record:
+        X, y, feature_names, pipeline = load_processed_data(data_path)
+        record.rows_out = len(y)
+
+    models = build_models()
+    with step('model_datasets', rows_in=len(y)):
+        datasets = model_datasets(models, X, feature_names, pipeline)
+
+    if search_budget:
+        return search_models(
+            models, datasets, y, pipeline, search_budget, output_dir, search_clock, data_path if register else None
+        )
+
+    if final_model not in FINAL_MODELS:
+        raise ValueError(f"final_model deve ser um de {FINAL_MODELS}")
+
+    # O modelo final é ajustado no mesmo pool das dobras, dentro do mesmo orçamento de CPU
+    folds = cross_validation_splits(len(y))
+    final_splits = {
+        'split': [train_test_split(np.arange(len(y)), test_size=0.2, random_state=42)],
+        'refit': [(np.arange(len(y)), None)],
+        'folds': [],
+    }[final_model]
+    keep_models = range(len(folds)) if final_model == 'folds' else [len(folds)]
+
     results_cv = {}
     trained_models = {}
     
     for name, model in models.items():
-        r2_cv, mae_cv, rmse_cv = evaluate_cross_validation(model, X, y, name)
+        if name not in datasets:
+            continue
+        X_model, model_feature_names = datasets[name]
+        key = name.lower().replace(' ', '_')
+
+        with step(f'cross_validation_{key}', rows_in=len(y)):
+            results = fit_splits(model, X_model, y, folds + final_splits, n_jobs=n_jobs, keep_models=keep_models)
+        r2_cv, mae_cv, rmse_cv = print_cross_validation(results[:len(folds)], name)
         results_cv[name] = {'r2': r2_cv, 'mae': mae_cv}
-    
-        trained_model = evaluate_single_split(model, X_train, X_test, y_train, y_test, name)
+
+        if final_model == 'folds':
+            trained_model = FoldEnsemble(result['model'] for result in results)
+        else:
+            trained_model = results[-1]['model']
+            if final_model == 'split':
+                print_single_split(results[-1]['r2'], results[-1]['mae'], results[-1]['rmse'], name)
         trained_models[name] = trained_model
-        print_feature_importance(trained_model, feature_names, name)
+        print_feature_importance(trained_model, model_feature_names, name)
 
     print("\nComparação dos modelos")
 
     results_sorted = sorted(results_cv.items(), key=lambda x: x[1]['r2'], reverse=True)
     
     for name, metrics in results_sorted:
-        print(f"{name:<20} | R²: {metrics['r2']:.4f} | MAE: {metrics['mae']:.1f}")
+        print(f"{name:<24} | R²: {metrics['r2']:.4f} | MAE: {metrics['mae']:.1f}")
        
     best_model_name = results_sorted[0][0]
     print(f"Melhor modelo: {best_model_name}")
@@ -168,10 +324,86 @@ def modeling(data_path, output_dir='models'):
     # Salvar o melhor modelo
     best_model = trained_models[best_model_name]
 
-    save_model(best_model, best_model_name, output_dir)
+    with step('save_model'):
+        save_model(best_model, best_model_name, output_dir, pipeline)
+
+    if register:
+        with step('register_model'):
+            register_model(
+                best_model, best_model_name, os.path.join(output_dir, 'registry'), pipeline,
+                metrics={**results_cv[best_model_name], 'final_model': final_model, 'models': results_cv},
+                data_path=data_path, n_rows=len(y), feature_names=datasets[best_model_name][1]
+            )
+
+    return best_model, datasets[best_model_name][1]
+
+
+def search_models(models, datasets, y, pipeline, search_budget, output_dir='models', clock='wall', data_path=None):
+    """
+    Busca os hiperparâmetros de cada modelo com successive halving dentro do orçamento,
+    compara os vencedores e salva o melhor com save_model
+    O orçamento é dividido igualmente entre os modelos
+
+    Args:
+        models: Dicionário com os modelos base (ver build_models)
+        datasets: Features de cada modelo (ver model_datasets)
+        y: Alvo
+        pipeline: PreprocessingPipeline salvo junto do modelo
+        search_budget: Orçamento total em segundos
+        output_dir: Diretório onde salvar o modelo e o ranking da busca
+        clock: 'wall' (tempo real) ou 'cpu' (tempo de CPU) para medir o orçamento
+        data_path: Se informado, registra o vencedor em <output_dir>/registry com a impressão digital desses dados
+
+    Returns:
+        best_model: O melhor modelo, treinado com todos os dados
+        feature_names: Lista com os nomes das features
+    """
+    splits = list(KFold(n_splits=5, shuffle=True, random_state=42).split(np.zeros(len(y))))
+    budget_per_model = search_budget / len(datasets)
+
+    leaderboard = []
+    winners = {}
+    for name, (X, _) in datasets.items():
+        with step(f"search_{name.lower().replace(' ', '_')}", rows_in=len(y)):
+            result = successive_halving_search(
+                models[name], SEARCH_SPACES[name], X, y, splits, budget_per_model, name,
+                resource=RESOURCE_PARAMS.get(name, 'n_estimators'), clock=clock
+            )
+        leaderboard.extend(result['leaderboard'])
+        winners[name] = result
+
+    # Um único ranking pelo R²: o recurso (árvores ou iterações) não é comparável entre famílias de modelos
+    leaderboard.sort(key=lambda entry: entry['r2'], reverse=True)
+    print_leaderboard(leaderboard)
+    save_leaderboard(leaderboard, os.path.join(output_dir, 'leaderboard.json'))
+
+    best_model_name = max(winners, key=lambda name: winners[name]['best']['r2'])
+    best = winners[best_model_name]['best']
+    print(f"\nMelhor modelo: {best_model_name} {best['params']} com {best['n_estimators']} árvores")
+
+    # Treina o vencedor com todos os dados
+    X, feature_names = datasets[best_model_name]
+    resource = RESOURCE_PARAMS.get(best_model_name, 'n_estimators')
+    best_model = clone(models[best_model_name]).set_params(**{resource: best['n_estimators']}, **best['params'])
+    with step('refit', rows_in=len(y)):
+        best_model.fit(X, y)
+    print_feature_importance(best_model, feature_names, best_model_name)
+
+    with step('save_model'):
+        save_model(best_model, best_model_name, output_dir, pipeline)
+
+    if data_path is not None:
+        with step('register_model'):
+            register_model(
+                best_model, best_model_name, os.path.join(output_dir, 'registry'), pipeline,
+                metrics={'r2': best['r2'], 'mae': best['mae'], 'params': best['params'], 'search_budget': search_budget},
+                data_path=data_path, n_rows=len(y), feature_names=feature_names
+            )
+
+    return best_model, feature_names
 
 
 if __name__ == "__main__":
-    data_path = "data/bilheteria_processado.csv"
+    data_path = "data/bilheteria_processado"
     
     modeling(data_path)
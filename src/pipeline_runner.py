@@ -0,0 +1,191 @@
+import hashlib
+import json
+import os
+import re
+import time
+
+# Imports de módulos do próprio projeto ('from .x import', 'from x import', 'from src.x import'
+# e 'from . import x, y'), inclusive os feitos dentro de funções
+MODULE_IMPORT_PATTERN = re.compile(r'^\s*from\s+\.?(?:src\.)?(\w+)\s+import\b', re.MULTILINE)
+PACKAGE_IMPORT_PATTERN = re.compile(r'^\s*from\s+(?:\.|src)\s+import\s+([\w ,]+)', re.MULTILINE)
+
+
+class Stage:
+    """
+    Etapa do pipeline com tudo o que define o seu resultado
+    A etapa só é executada novamente quando a impressão digital (hash) das entradas,
+    do código ou dos parâmetros muda, ou quando alguma saída não existe mais
+
+    Args:
+        name: Nome da etapa
+        func: Função sem argumentos que executa a etapa
+        inputs: Arquivos ou diretórios lidos pela etapa
+        outputs: Arquivos ou diretórios gerados pela etapa
+        code: Arquivos de código usados pela etapa
+        params: Dicionário com os parâmetros da etapa (serializável em JSON)
+    """
+
+    def __init__(self, name, func, inputs=(), outputs=(), code=(), params=None):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.code = list(code)
+        self.params = params or {}
+
+
+def code_dependencies(*paths):
+    """
+    Arquivos de código de uma etapa: os arquivos informados e, recursivamente, os módulos
+    do mesmo diretório que eles importam
+    Lê apenas o texto dos arquivos (sem importá-los), então módulos de fora do projeto são ignorados
+
+    Args:
+        paths: Arquivos de código chamados diretamente pela etapa
+
+    Returns:
+        Lista ordenada com os caminhos dos arquivos
+    """
+    found = set()
+    pending = list(paths)
+    while pending:
+        path = pending.pop()
+        if path in found or not os.path.isfile(path):
+            continue
+        found.add(path)
+
+        with open(path, encoding='utf-8') as file:
+            source = file.read()
+        names = MODULE_IMPORT_PATTERN.findall(source)
+        for group in PACKAGE_IMPORT_PATTERN.findall(source):
+            names += [name.strip() for name in group.split(',')]
+        pending += [os.path.join(os.path.dirname(path), f'{name}.py') for name in names if name]
+
+    return sorted(found)
+
+
+def file_hash(path, hash_cache):
+    """
+    Calcula o SHA-256 do conteúdo de um arquivo
+    O hash é guardado por (tamanho, data de modificação), então arquivos grandes que não
+    mudaram não são lidos novamente
+
+    Args:
+        path: Caminho do arquivo
+        hash_cache: Dicionário com os hashes já calculados (persistido entre execuções)
+
+    Returns:
+        Hash hexadecimal do arquivo
+    """
+    stat = os.stat(path)
+    key = f'{stat.st_size}:{stat.st_mtime_ns}'
+    cached = hash_cache.get(path)
+    if cached and cached['key'] == key:
+        return cached['hash']
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(block)
+
+    hash_cache[path] = {'key': key, 'hash': digest.hexdigest()}
+    return hash_cache[path]['hash']
+
+
+def path_hash(path, hash_cache):
+    """
+    Hash de um arquivo ou de todos os arquivos de um diretório (em ordem)
+    Retorna None se o caminho não existir
+    """
+    if os.path.isfile(path):
+        return file_hash(path, hash_cache)
+    if not os.path.isdir(path):
+        return None
+
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            file_path = os.path.join(root, name)
+            digest.update(os.path.relpath(file_path, path).encode('utf-8'))
+            digest.update(file_hash(file_path, hash_cache).encode('utf-8'))
+
+    return digest.hexdigest()
+
+
+def stage_fingerprint(stage, hash_cache):
+    """
+    Impressão digital da etapa: hash das entradas, do código e dos parâmetros
+    """
+    content = {
+        'inputs': {path: path_hash(path, hash_cache) for path in stage.inputs},
+        'code': {path: path_hash(path, hash_cache) for path in stage.code},
+        'params': stage.params,
+    }
+    serialized = json.dumps(content, sort_keys=True, default=str)
+
+    return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+
+
+def load_state(state_path):
+    if not os.path.exists(state_path):
+        return {'stages': {}, 'hashes': {}}
+    with open(state_path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def save_state(state, state_path):
+    os.makedirs(os.path.dirname(state_path) or '.', exist_ok=True)
+    temp_path = f'{state_path}.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        json.dump(state, file, indent=4)
+    os.replace(temp_path, state_path)
+
+
+def run_stages(stages, state_path='.pipeline_cache/state.json', force=False):
+    """
+    Executa as etapas em ordem, pulando as que não mudaram desde a última execução
+    Como as entradas de uma etapa incluem as saídas da etapa anterior, apenas as etapas
+    afetadas por uma mudança são executadas novamente
+
+    Args:
+        stages: Lista de Stage, na ordem de execução
+        state_path: Arquivo onde ficam as impressões digitais da última execução
+        force: Se True, executa todas as etapas
+
+    Returns:
+        Lista de dicionários com nome, status ('executada' ou 'pulada') e duração de cada etapa
+    """
+    state = load_state(state_path)
+    report = []
+
+    for stage in stages:
+        start = time.perf_counter()
+        fingerprint = stage_fingerprint(stage, state['hashes'])
+        previous = state['stages'].get(stage.name, {})
+        outputs_exist = all(os.path.exists(path) for path in stage.outputs)
+
+        if not force and previous.get('fingerprint') == fingerprint and outputs_exist:
+            status = 'pulada'
+        else:
+            stage.func()
+            status = 'executada'
+            # Atualiza o estado logo após cada etapa, para não perder o progresso se uma etapa seguinte falhar
+            state['stages'][stage.name] = {'fingerprint': fingerprint, 'finished_at': time.time()}
+            save_state(state, state_path)
+
+        report.append({'stage': stage.name, 'status': status, 'seconds': time.perf_counter() - start})
+
+    save_state(state, state_path)
+    print_report(report)
+
+    return report
+
+
+def print_report(report):
+    """
+    Mostra quais etapas foram executadas ou puladas e quanto tempo cada uma levou
+    """
+    print("\nResumo do pipeline")
+    for item in report:
+        print(f"{item['stage']:<20} | {item['status']:<10} | {item['seconds']:.2f}s")
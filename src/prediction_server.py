@@ -0,0 +1,225 @@
+import argparse
+import json
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    from .inference import load_compiled_model, load_model, load_model_pipeline, predict_sessions
+except ImportError:
+    from inference import load_compiled_model, load_model, load_model_pipeline, predict_sessions
+
+
+class PendingRequest:
+    """
+    Requisição aguardando o resultado do lote em que foi agrupada
+    """
+
+    def __init__(self, records):
+        self.records = records
+        self.done = threading.Event()
+        self.predictions = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    Agrupa requisições concorrentes em micro-lotes e faz um único predict vetorizado por lote
+    Um lote é fechado quando atinge max_batch_size sessões ou quando a primeira requisição
+    do lote já esperou max_wait_ms
+
+    Args:
+        predict_fn: Função que recebe uma lista de sessões e retorna as previsões
+        max_batch_size: Quantidade máxima de sessões por lote
+        max_wait_ms: Tempo máximo (ms) que a primeira requisição espera o lote encher
+    """
+
+    def __init__(self, predict_fn, max_batch_size=256, max_wait_ms=2.0):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.pending = queue.Queue()
+        self.worker = threading.Thread(target=self._run, daemon=True)
+        self.worker.start()
+
+    def predict(self, records):
+        """
+        Envia sessões para o próximo lote e espera as previsões
+
+        Args:
+            records: Lista de sessões no formato do bilheteria.csv
+
+        Returns:
+            Lista com as previsões
+        """
+        request = PendingRequest(records)
+        self.pending.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+
+        return request.predictions
+
+    def _collect_batch(self):
+        batch = [self.pending.get()]
+        size = len(batch[0].records)
+        deadline = time.perf_counter() + self.max_wait
+
+        while size < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                request = self.pending.get(timeout=timeout)
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request.records)
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            records = [record for request in batch for record in request.records]
+            try:
+                predictions = self.predict_fn(records).tolist()
+            except Exception as e:
+                if len(batch) == 1:
+                    batch[0].error = e
+                    batch[0].done.set()
+                else:
+                    # Uma sessão inválida não derruba o lote inteiro: cada requisição é prevista sozinha
+                    # e só a que falhar recebe o erro
+                    self._run_each(batch)
+                continue
+
+            start = 0
+            for request in batch:
+                end = start + len(request.records)
+                request.predictions = predictions[start:end]
+                start = end
+                request.done.set()
+
+
+    def _run_each(self, batch):
+        for request in batch:
+            try:
+                request.predictions = self.predict_fn(request.records).tolist()
+            except Exception as e:
+                request.error = e
+            request.done.set()
+
+
+class PredictionHandler(BaseHTTPRequestHandler):
+    """
+    Endpoints:
+        POST /predict: corpo JSON com uma sessão (objeto) ou uma lista de sessões no formato do bilheteria.csv
+            Resposta: {"predictions": [...]}
+        GET /health: {"status": "ok"}
+    """
+
+    # HTTP/1.1 mantém a conexão aberta entre requisições (keep-alive)
+    protocol_version = 'HTTP/1.1'
+    # Cabeçalho e corpo saem em escritas separadas: sem TCP_NODELAY o Nagle + ACK atrasado somam ~40 ms
+    disable_nagle_algorithm = True
+    batcher = None
+    # FeatureSchema do pipeline: cada requisição é conferida antes de entrar no micro-lote
+    schema = None
+
+    def do_GET(self):
+        if self.path != '/health':
+            self._send_json(404, {'error': 'Endpoint não encontrado'})
+            return
+        self._send_json(200, {'status': 'ok'})
+
+    def do_POST(self):
+        if self.path != '/predict':
+            self._send_json(404, {'error': 'Endpoint não encontrado'})
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            records = json.loads(self.rfile.read(length))
+            if isinstance(records, dict):
+                records = [records]
+            if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+                raise ValueError("O corpo deve ser uma sessão (objeto) ou uma lista de sessões")
+            if self.schema is not None:
+                self.schema.validate(records)
+            predictions = self.batcher.predict(records)
+        except Exception as e:
+            self._send_json(400, {'error': str(e)})
+            return
+
+        self._send_json(200, {'predictions': predictions})
+
+    def _send_json(self, status, content):
+        body = json.dumps(content).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Sem log por requisição, para não pesar na latência
+        pass
+
+
+class PredictionServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Fila de conexões maior que o padrão (5) para aguentar muitos clientes simultâneos
+    request_queue_size = 1024
+
+
+def create_server(model_path, host='127.0.0.1', port=8000, max_batch_size=256, max_wait_ms=2.0, compiled=False):
+    """
+    Cria o servidor de previsões, carregando o modelo e o pipeline uma única vez
+
+    Args:
+        model_path: Caminho do modelo salvo (o pipeline é lido de <modelo>_pipeline.json)
+        host: Endereço do servidor
+        port: Porta do servidor
+        max_batch_size: Quantidade máxima de sessões por micro-lote
+        max_wait_ms: Janela de tempo (ms) para agrupar requisições em um micro-lote
+        compiled: Se True, usa o modelo compilado (tree_engine) em vez do modelo do scikit-learn
+
+    Returns:
+        PredictionServer pronto para serve_forever()
+    """
+    model = load_compiled_model(model_path) if compiled else load_model(model_path)
+    pipeline = load_model_pipeline(model_path)
+
+    def predict_fn(records):
+        return predict_sessions(model, pipeline, records)
+
+    handler = type('BoundPredictionHandler', (PredictionHandler,), {
+        'batcher': MicroBatcher(predict_fn, max_batch_size, max_wait_ms),
+        'schema': pipeline.schema,
+    })
+
+    return PredictionServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Servidor de previsões de vendas de ingressos')
+    parser.add_argument('--model', default='models/gradient_boosting_model.pkl')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--max-batch-size', type=int, default=256)
+    parser.add_argument('--max-wait-ms', type=float, default=2.0)
+    parser.add_argument('--compiled', action='store_true', help='Usa o modelo compilado (tree_engine)')
+    args = parser.parse_args()
+
+    server = create_server(args.model, args.host, args.port, args.max_batch_size, args.max_wait_ms, args.compiled)
+    print(f"Servidor de previsões em http://{args.host}:{args.port}/predict")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,40 +1,214 @@
 import pandas as pd
-from sklearn.preprocessing import OneHotEncoder
+import numpy as np
+import functools
+import importlib.util
 import unicodedata
+import json
+import os
 import re
+import zlib
 
+# scipy, scikit-learn e as bibliotecas de gráficos são importados apenas nas funções que os usam,
+# assim carregar o pipeline para prever novas sessões não paga o custo dessas importações
 try:
-    from .visualization import correlation_heatmap
+    from .instrumentation import instrumented, step
+    from .storage import save_columnar_dataset, save_sparse_dataset
 except ImportError:
-    from visualization import correlation_heatmap
+    from instrumentation import instrumented, step
+    from storage import save_columnar_dataset, save_sparse_dataset
 
-def normalize_column_names(df):
+TARGET_COLUMN = 'Quantidade de ingressos vendidos'
+
+CATEGORICAL_COLUMNS = ['Espaço', 'Tipo de Evento', 'Classificação Etária', 'Tipo da Sessão']
+
+# Coluna de alta cardinalidade, fora do One-Hot Encoding por padrão
+EVENT_COLUMN = 'Evento'
+
+TEMPORAL_FEATURES = ['Hora', 'Dia da Semana', 'Dia do Mês', 'Dias em Cartaz']
+
+DATE_COLUMNS = ['Data da Sessão', 'Período do Cartaz - Data Início', 'Período do Cartaz - Data Fim']
+
+# Codificação de alta cardinalidade (HighCardinalityEncoder): baldes do hashing, dobras e suavização
+# da média do alvo (quantidade de linhas equivalente à média geral somada a cada valor)
+HASH_BUCKETS = 32
+TARGET_FOLDS = 5
+TARGET_SMOOTHING = 10
+
+# Formato das datas no arquivo de bilheteria: DD/MM/YYYY - HH:MM
+DATE_FORMAT = '%d/%m/%Y - %H:%M'
+
+# Features de calendário opcionais geradas por extract_temporal_features
+CALENDAR_FEATURES = ['Semana do Ano', 'Mês', 'Feriado']
+
+# Política de valores nulos: valor do ingresso vazio é considerado gratuito
+FILL_VALUES = {'Valor do Ingresso': 0}
+
+# Esquema do arquivo de bilheteria aplicado por load_raw_sessions, igual em todos os blocos:
+# textos repetidos viram category (valores distintos + códigos inteiros), as datas são convertidas
+# na leitura, a quantidade vendida é um inteiro pequeno com nulos e os valores são float32
+RAW_DTYPES = {
+    'Espaço': 'category',
+    'Evento': 'category',
+    'Tipo de Evento': 'category',
+    'Classificação Etária': 'category',
+    'Período do Cartaz - Data Início': 'datetime64[s]',
+    'Período do Cartaz - Data Fim': 'datetime64[s]',
+    'Tipo da Sessão': 'category',
+    'Data da Sessão': 'datetime64[s]',
+    'Valor do Ingresso': 'float32',
+    'Quantidade de ingressos vendidos': 'UInt16',
+    'Total de Vendas': 'float32',
+}
+
+# Tipos passados ao leitor em C do pandas: category e datas são lidos como texto e inteiros com nulos
+# como float32 (o leitor converte inteiros com nulos bem mais devagar), todos convertidos bloco a bloco
+CSV_DTYPES = {
+    col: object if dtype == 'category' or dtype.startswith('datetime') else 'float32' if dtype[0].isupper() else dtype
+    for col, dtype in RAW_DTYPES.items()
+}
+
+# Leitor de CSV com várias threads quando o pyarrow está instalado (requirements.txt); senão, o leitor em C do pandas
+CSV_ENGINE = 'pyarrow' if importlib.util.find_spec('pyarrow') else 'c'
+
+# Linhas por bloco ao carregar o arquivo inteiro com o leitor em C: os textos de um bloco são
+# codificados antes da leitura do próximo, então nunca ficam todos na memória ao mesmo tempo
+LOAD_BLOCK_ROWS = 500_000
+
+# Padrões da normalização dos nomes de colunas, compilados uma única vez
+NON_WORD_PATTERN = re.compile(r'[^\w\s]')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+@functools.lru_cache(maxsize=None)
+def normalize_column_name(col):
     """
-    Normaliza os nomes das colunas:
+    Normaliza um nome de coluna:
     - Remove acentuação
     - Converte para minúsculas
     - Substitui espaços por underscore
     - Remove caracteres especiais
+    O resultado fica em cache: cada nome distinto é normalizado uma única vez por processo
     """
-    normalized_columns = []
-    for col in df.columns:
-        # Remove acentuação
-        col_normalized = unicodedata.normalize('NFKD', col)
-        col_normalized = col_normalized.encode('ascii', errors='ignore').decode('utf-8')
-        
-        # Converte para minúsculas
-        col_normalized = col_normalized.lower()
-        
-        # Substitui espaços e caracteres especiais por underscore
-        col_normalized = re.sub(r'[^\w\s]', '', col_normalized)
-        col_normalized = re.sub(r'\s+', '_', col_normalized)
-        
-        normalized_columns.append(col_normalized)
+    # Remove acentuação
+    col_normalized = unicodedata.normalize('NFKD', col)
+    col_normalized = col_normalized.encode('ascii', errors='ignore').decode('utf-8')
+    
+    # Converte para minúsculas
+    col_normalized = col_normalized.lower()
     
-    df.columns = normalized_columns
+    # Substitui espaços e caracteres especiais por underscore
+    col_normalized = NON_WORD_PATTERN.sub('', col_normalized)
+    col_normalized = WHITESPACE_PATTERN.sub('_', col_normalized)
+
+    return col_normalized
+
+
+def normalize_column_names(df, schema=None):
+    """
+    Normaliza os nomes das colunas do DataFrame com normalize_column_name
+    Com um FeatureSchema, usa o mapeamento já calculado das features (uma consulta por coluna)
+    """
+    mapping = schema.feature_mapping if schema is not None else {}
+    df.columns = [mapping.get(col) or normalize_column_name(col) for col in df.columns]
     return df
 
 
+class FeatureSchema:
+    """
+    Esquema das colunas do pipeline: colunas brutas esperadas na entrada e o mapeamento
+    nome bruto -> nome normalizado de cada feature, na ordem usada pelo modelo
+    O mapeamento é calculado uma vez no ajuste e salvo junto do pipeline, então prever não
+    normaliza os nomes de novo. validate confere um DataFrame em O(colunas), antes de transformar
+    """
+
+    def __init__(self, input_columns, feature_mapping, raw_columns=None, optional_columns=None, numeric_columns=None):
+        self.input_columns = list(input_columns)
+        self.feature_mapping = dict(feature_mapping)
+        self.raw_columns = list(raw_columns) if raw_columns is not None else None
+        self.optional_columns = list(optional_columns or [])
+        self.numeric_columns = list(numeric_columns or [])
+        self._feature_names = list(self.feature_mapping.values())
+        self._required = set(self.input_columns) - set(self.optional_columns)
+        self._known = set(self.raw_columns) if self.raw_columns is not None else None
+
+    @classmethod
+    def from_features(cls, input_columns, raw_feature_names, raw_columns=None, optional_columns=None,
+                      numeric_columns=None):
+        """
+        Monta o esquema normalizando cada nome de feature uma única vez
+        """
+        mapping = {name: normalize_column_name(name) for name in raw_feature_names}
+        if len(set(mapping.values())) != len(mapping):
+            raise ValueError("Nomes de features diferentes ficam iguais depois da normalização")
+
+        return cls(input_columns, mapping, raw_columns, optional_columns, numeric_columns)
+
+    @property
+    def feature_names(self):
+        return self._feature_names
+
+    def check(self, columns):
+        """
+        Compara as colunas recebidas com o esquema
+
+        Returns:
+            Tupla com as colunas obrigatórias ausentes e as colunas desconhecidas
+            (desconhecidas só quando o esquema guarda as colunas do arquivo bruto)
+        """
+        columns = set(columns)
+        missing = [col for col in self.input_columns if col in self._required and col not in columns]
+        unexpected = sorted(map(str, columns - self._known)) if self._known is not None else []
+
+        return missing, unexpected
+
+    def validate(self, data, strict=False):
+        """
+        Confere se um DataFrame (ou uma lista de sessões) tem as colunas do esquema
+        Colunas obrigatórias ausentes sempre geram erro; colunas desconhecidas são
+        ignoradas pelo pipeline e só geram erro com strict=True
+
+        Raises:
+            ValueError: Se faltar alguma coluna obrigatória ou houver coluna numérica com tipo inválido
+        """
+        if isinstance(data, pd.DataFrame):
+            rows = [data.columns]
+        else:
+            rows = [row.keys() for row in data]
+
+        for columns in rows:
+            missing, unexpected = self.check(columns)
+            if missing:
+                raise ValueError(f"Colunas ausentes: {missing}")
+            if strict and unexpected:
+                raise ValueError(f"Colunas desconhecidas: {unexpected}")
+
+        if isinstance(data, pd.DataFrame):
+            # Colunas numéricas só podem ser números ou object (ex.: nulos vindos de JSON)
+            invalid = [
+                col for col in self.numeric_columns
+                if col in data.columns
+                and not (pd.api.types.is_numeric_dtype(data[col].dtype) or data[col].dtype == object)
+            ]
+            if invalid:
+                raise ValueError(f"Colunas numéricas com tipo inválido: {invalid}")
+
+    def to_dict(self):
+        return {
+            'input_columns': self.input_columns,
+            'optional_columns': self.optional_columns,
+            'numeric_columns': self.numeric_columns,
+            'raw_columns': self.raw_columns,
+            'feature_mapping': self.feature_mapping,
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        return cls(
+            state['input_columns'], state['feature_mapping'], state.get('raw_columns'),
+            state.get('optional_columns'), state.get('numeric_columns')
+        )
+
+
 def extract_day_of_week(data):
     """
     Função que extrai o dia da semana da Data da Sessão
@@ -114,8 +288,327 @@ def calculate_days_in_theaters(data):
 
     return data
 
-    
-def one_hot_encoding(data, categorical_columns, numerical_columns):
+
+def parse_fixed_format_dates(values):
+    """
+    Função que converte datas no formato fixo 'DD/MM/YYYY - HH:MM' sem passar pelo strptime
+    Lê os dígitos diretamente das posições fixas do texto e monta o datetime com NumPy
+
+    Args:
+        values: Array com textos de datas
+
+    Returns:
+        Array datetime64[m] com as datas ou None se algum valor não seguir o formato fixo
+        (nesse caso quem chama deve usar pd.to_datetime)
+    """
+    width = 18
+    text = np.asarray(values, dtype=str)
+    if text.size == 0 or text.dtype.itemsize != width * 4 or (np.char.str_len(text) != width).any():
+        return None
+
+    chars = text.view(np.uint32).reshape(-1, width).astype(np.int64)
+    separators = {2: '/', 5: '/', 10: ' ', 11: '-', 12: ' ', 15: ':'}
+    for position, separator in separators.items():
+        if (chars[:, position] != ord(separator)).any():
+            return None
+
+    digit_positions = [0, 1, 3, 4, 6, 7, 8, 9, 13, 14, 16, 17]
+    digits = chars[:, digit_positions] - ord('0')
+    if ((digits < 0) | (digits > 9)).any():
+        return None
+
+    day = digits[:, 0] * 10 + digits[:, 1]
+    month = digits[:, 2] * 10 + digits[:, 3]
+    year = digits[:, 4] * 1000 + digits[:, 5] * 100 + digits[:, 6] * 10 + digits[:, 7]
+    hour = digits[:, 8] * 10 + digits[:, 9]
+    minute = digits[:, 10] * 10 + digits[:, 11]
+    if ((month < 1) | (month > 12) | (day < 1) | (hour > 23) | (minute > 59)).any():
+        return None
+
+    months = ((year - 1970) * 12 + month - 1).astype('datetime64[M]')
+    dates = months.astype('datetime64[D]') + (day - 1).astype('timedelta64[D]')
+    # Dias inválidos (ex.: 31/04) caem no mês seguinte
+    if (dates.astype('datetime64[M]') != months).any():
+        return None
+
+    return dates.astype('datetime64[m]') + (hour * 60 + minute).astype('timedelta64[m]')
+
+
+def parse_date_values(values):
+    """
+    Função que converte uma coluna de datas uma única vez
+    Em lotes grandes converte apenas os valores distintos (datas de sessão se repetem muito)
+    e depois espalha o resultado para todas as linhas
+    Valores já convertidos para datetime são apenas ajustados para minutos
+
+    Args:
+        values: Series ou array com textos no formato 'DD/MM/YYYY - HH:MM'
+
+    Returns:
+        Array datetime64[m] com as datas convertidas (NaT para valores nulos)
+    """
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype('datetime64[m]')
+
+    codes = None
+    if len(values) > 1000:
+        codes, values = pd.factorize(values)
+
+    parsed = parse_fixed_format_dates(values)
+    if parsed is None:
+        parsed = pd.to_datetime(values, format=DATE_FORMAT).to_numpy().astype('datetime64[m]')
+
+    if codes is None:
+        return parsed
+
+    dates = parsed[codes]
+    dates[codes < 0] = np.datetime64('NaT')
+
+    return dates
+
+
+def _apply_raw_dtypes(block):
+    """
+    Converte um bloco lido como texto para os tipos de RAW_DTYPES
+    As colunas category guardam os valores distintos na ordem em que aparecem (sem ordenar) e as datas
+    são convertidas uma única vez por valor distinto
+    """
+    for col, dtype in RAW_DTYPES.items():
+        if col not in block.columns:
+            continue
+        values = block[col].array
+        if isinstance(values, pd.Categorical):
+            if dtype == 'category':
+                continue
+            codes, uniques = values.codes, values.categories.to_numpy()
+        elif dtype == 'category' or dtype.startswith('datetime'):
+            codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+        else:
+            # Inteiros com nulos lidos como float (valores não inteiros geram erro)
+            if block[col].dtype != dtype:
+                block[col] = block[col].astype(dtype)
+            continue
+
+        if dtype == 'category':
+            # Os valores do factorize já são distintos: dispensa a verificação das categorias
+            block[col] = pd.Categorical.from_codes(codes, dtype=pd.CategoricalDtype(uniques), validate=False)
+        else:
+            parsed = parse_date_values(uniques)
+            dates = np.full(len(codes), np.datetime64('NaT'), dtype='datetime64[m]')
+            known = codes >= 0
+            dates[known] = parsed[codes[known]]
+            block[col] = dates.astype(dtype)
+
+    return block
+
+
+def _concat_blocks(blocks):
+    """
+    Junta os blocos carregados, com um único conjunto de categorias por coluna category
+    """
+    from pandas.api.types import union_categoricals
+
+    if len(blocks) == 1:
+        return blocks[0]
+
+    columns = {}
+    for col in blocks[0].columns:
+        if isinstance(blocks[0][col].dtype, pd.CategoricalDtype):
+            columns[col] = union_categoricals([block[col] for block in blocks])
+        else:
+            columns[col] = pd.concat([block[col] for block in blocks], ignore_index=True)
+
+    return pd.DataFrame(columns)
+
+
+def _read_csv_pyarrow(data_path):
+    """
+    Lê o arquivo inteiro com o leitor do pyarrow, com os textos já codificados como dicionário:
+    o to_pandas gera as colunas category direto dos códigos (sem factorize e sem ordenar as categorias)
+    Nomes e tipos seguem o leitor em C do pandas: coluna sem nome como 'Unnamed: <posição>'
+    e coluna sem nenhum valor como float64
+    """
+    import pyarrow as pa
+    from pyarrow import csv
+
+    column_types = {col: pa.from_numpy_dtype(np.dtype(dtype)) for col, dtype in CSV_DTYPES.items() if dtype is not object}
+    table = csv.read_csv(
+        data_path,
+        read_options=csv.ReadOptions(skip_rows=1),
+        parse_options=csv.ParseOptions(delimiter=';'),
+        convert_options=csv.ConvertOptions(
+            column_types=column_types, strings_can_be_null=True,
+            auto_dict_encode=True, auto_dict_max_cardinality=np.iinfo(np.int32).max
+        )
+    )
+    table = table.cast(pa.schema([
+        field.with_type(pa.float64()) if pa.types.is_null(field.type) else field for field in table.schema
+    ]))
+    data = table.to_pandas()
+    data.columns = [name or f'Unnamed: {position}' for position, name in enumerate(data.columns)]
+
+    return data
+
+
+def load_raw_sessions(data_path, chunksize=None, nrows=None):
+    """
+    Lê o arquivo de bilheteria com o esquema RAW_DTYPES (leitor único da exploração, do pré-processamento,
+    do retreino e das previsões): colunas de texto como category, datas já convertidas,
+    quantidade vendida como UInt16 e valores como float32
+    Ocupa uma fração da memória das colunas de texto (objetos Python) da leitura sem tipos
+
+    Args:
+        data_path: Caminho do dataset
+        chunksize: Se informado, retorna um iterador de blocos com essa quantidade de linhas
+            (as categorias de cada bloco são só as que aparecem nele)
+        nrows: Quantidade máxima de linhas lidas
+
+    Returns:
+        DataFrame com as sessões (ou iterador de DataFrames com chunksize)
+    """
+    options = {'sep': ';', 'skiprows': 1, 'dtype': CSV_DTYPES}
+    if chunksize:
+        return (_apply_raw_dtypes(block) for block in pd.read_csv(data_path, chunksize=chunksize, nrows=nrows, **options))
+    if nrows == 0:
+        return pd.read_csv(data_path, nrows=0, **options)
+    if CSV_ENGINE == 'pyarrow' and nrows is None:
+        # As datas são convertidas pelas categorias (uma vez por valor distinto)
+        return _apply_raw_dtypes(_read_csv_pyarrow(data_path))
+
+    blocks = [
+        _apply_raw_dtypes(block)
+        for block in pd.read_csv(data_path, chunksize=LOAD_BLOCK_ROWS, nrows=nrows, **options)
+    ]
+
+    return _concat_blocks(blocks)
+
+
+def brazilian_holidays(years):
+    """
+    Função que gera os feriados nacionais do Brasil para os anos informados
+    Inclui os feriados de data fixa e a Sexta-feira Santa (calculada a partir da Páscoa)
+
+    Args:
+        years: Lista com os anos
+
+    Returns:
+        DatetimeIndex com as datas dos feriados
+    """
+    fixed_holidays = ['01-01', '04-21', '05-01', '09-07', '10-12', '11-02', '11-15', '11-20', '12-25']
+    holidays = []
+    for year in years:
+        holidays.extend(f'{year}-{day}' for day in fixed_holidays)
+
+        # Cálculo da Páscoa (algoritmo de Meeus/Jones/Butcher)
+        a, b, c = year % 19, year // 100, year % 100
+        d, e = b // 4, b % 4
+        f = (b + 8) // 25
+        g = (b - f + 1) // 3
+        h = (19 * a + b - d - g + 15) % 30
+        i, k = c // 4, c % 4
+        l = (32 + 2 * e + 2 * i - h - k) % 7
+        m = (a + 11 * h + 22 * l) // 451
+        month = (h + l - 7 * m + 114) // 31
+        day = (h + l - 7 * m + 114) % 31 + 1
+        holidays.append(pd.Timestamp(year, month, day) - pd.Timedelta(days=2))
+
+    return pd.DatetimeIndex(pd.to_datetime(holidays))
+
+
+def temporal_feature_arrays(session_values, start_values, end_values, calendar_features=None):
+    """
+    Função que calcula as features temporais com NumPy a partir das colunas de data
+    Cada coluna é convertida uma única vez e todas as features saem da mesma conversão
+
+    Args:
+        session_values: Valores da coluna 'Data da Sessão'
+        start_values: Valores da coluna 'Período do Cartaz - Data Início'
+        end_values: Valores da coluna 'Período do Cartaz - Data Fim'
+        calendar_features: Lista opcional com features de calendário extras
+            ('Semana do Ano', 'Mês', 'Feriado')
+
+    Returns:
+        Dicionário com o array de cada feature temporal
+    """
+    calendar_features = calendar_features or []
+    unknown_features = set(calendar_features) - set(CALENDAR_FEATURES)
+    if unknown_features:
+        raise ValueError(f"Features de calendário desconhecidas: {sorted(unknown_features)}")
+
+    session_dates = parse_date_values(session_values)
+    session_days = session_dates.astype('datetime64[D]')
+    # As datas do cartaz consideram apenas o dia, sem o horário
+    start_days = parse_date_values(start_values).astype('datetime64[D]')
+    end_days = parse_date_values(end_values).astype('datetime64[D]')
+
+    minutes = session_dates.astype(np.int64)
+    days = session_days.astype(np.int64)
+    features = {
+        'Hora': (minutes % 1440 // 60).astype(np.int32),
+        # 01/01/1970 foi uma quinta-feira (0=Segunda, ..., 6=Domingo)
+        'Dia da Semana': ((days + 3) % 7).astype(np.int32),
+        'Dia do Mês': (session_days - session_dates.astype('datetime64[M]')).astype(np.int64).astype(np.int32) + 1,
+        'Dias em Cartaz': (end_days - start_days).astype(np.int64),
+    }
+
+    if 'Semana do Ano' in calendar_features:
+        # Semana calculada só nas datas válidas; as nulas ficam NaN no ajuste abaixo
+        valid = ~np.isnat(session_days)
+        weeks = np.zeros(len(session_days), dtype=np.int32)
+        weeks[valid] = pd.DatetimeIndex(session_days[valid]).isocalendar()['week'].to_numpy(dtype=np.int32)
+        features['Semana do Ano'] = weeks
+    if 'Mês' in calendar_features:
+        features['Mês'] = (session_dates.astype('datetime64[M]').astype(np.int64) % 12 + 1).astype(np.int32)
+    if 'Feriado' in calendar_features:
+        years = np.unique(session_dates[~np.isnat(session_dates)].astype('datetime64[Y]').astype(np.int64) + 1970)
+        holidays = brazilian_holidays(years).to_numpy().astype('datetime64[D]')
+        features['Feriado'] = np.isin(session_days, holidays).astype(np.int8)
+
+    # Datas nulas geram features nulas, como no pd.to_datetime
+    missing = np.isnat(session_dates)
+    if missing.any():
+        for name in features:
+            if name != 'Dias em Cartaz':
+                features[name] = np.where(missing, np.nan, features[name])
+    missing_period = np.isnat(start_days) | np.isnat(end_days)
+    if missing_period.any():
+        features['Dias em Cartaz'] = np.where(missing_period, np.nan, features['Dias em Cartaz'])
+
+    return features
+
+
+def extract_temporal_features(data, calendar_features=None):
+    """
+    Função que extrai todas as features temporais em uma única etapa
+    Converte cada coluna de data uma única vez e gera juntas a hora, o dia da semana,
+    o dia do mês e os dias em cartaz (substitui get_hour_of_session, extract_day_of_week,
+    extract_day_of_month e calculate_days_in_theaters no pré-processamento)
+    Mantém as colunas de data originais
+
+    Args:
+        data: DataFrame com as colunas 'Data da Sessão', 'Período do Cartaz - Data Início'
+            e 'Período do Cartaz - Data Fim'
+        calendar_features: Lista opcional com features de calendário extras
+            ('Semana do Ano', 'Mês', 'Feriado'), geradas a partir da mesma conversão
+
+    Returns:
+        DataFrame com as colunas 'Hora', 'Dia da Semana', 'Dia do Mês', 'Dias em Cartaz'
+        e as features de calendário pedidas
+    """
+    features = temporal_feature_arrays(
+        data['Data da Sessão'],
+        data['Período do Cartaz - Data Início'],
+        data['Período do Cartaz - Data Fim'],
+        calendar_features
+    )
+    for name, values in features.items():
+        data[name] = values
+
+    return data
+
+
+def one_hot_encoding(data, categorical_columns, numerical_columns, categories='auto'):
     """
     Função que aplica One-Hot Encoding nas colunas categóricas
     Gera os nomes das novas colunas e concatena com as colunas numéricas
@@ -124,11 +617,15 @@ def one_hot_encoding(data, categorical_columns, numerical_columns):
         data: DataFrame com as colunas categóricas
         colunas_categoricas: Lista com as colunas categóricas
         colunas_numericas: Lista com as colunas numéricas
+        categories: 'auto' para aprender as categorias dos dados ou lista com o
+            vocabulário fixo de cada coluna (usado no modo em blocos)
 
     Returns:
         DataFrame com as colunas categóricas codificadas
     """
-    encoder = OneHotEncoder(handle_unknown='ignore')
+    from sklearn.preprocessing import OneHotEncoder
+
+    encoder = OneHotEncoder(categories=categories, handle_unknown='ignore')
     encoded_array = encoder.fit_transform(data[categorical_columns])
     feature_names = encoder.get_feature_names_out(categorical_columns)
     data_encoded = pd.DataFrame(encoded_array.toarray(), columns=feature_names, index=data.index)
@@ -137,77 +634,909 @@ def one_hot_encoding(data, categorical_columns, numerical_columns):
     return data
 
 
-def preprocessing(data_path):
+def transform_sessions(data, categories='auto', drop_last_column=None, calendar_features=None, categorical_columns=None,
+                       schema=None, encoder=None, out_of_fold=False):
+    """
+    Função que aplica as transformações do pré-processamento em um DataFrame bruto
+    Usada tanto no processamento em memória quanto em cada bloco do modo em blocos
+
+    Args:
+        data: DataFrame lido do arquivo de bilheteria
+        categories: 'auto' ou lista com o vocabulário fixo de cada coluna categórica
+        drop_last_column: Se None, remove a última coluna quando ela estiver
+            completamente vazia no próprio DataFrame. Se True/False, usa a decisão
+            tomada para o arquivo inteiro
+        calendar_features: Lista opcional com features de calendário extras (ver CALENDAR_FEATURES)
+        categorical_columns: Colunas codificadas com One-Hot Encoding (padrão: CATEGORICAL_COLUMNS)
+        schema: FeatureSchema do pipeline ajustado, usado para renomear as colunas sem normalizá-las de novo
+        encoder: HighCardinalityEncoder ajustado; suas features entram depois das colunas numéricas
+        out_of_fold: Se True, a média do alvo do encoder é calculada fora da dobra de cada linha
+            (dataset de treino, linhas identificadas pela posição no arquivo)
+
+    Returns:
+        DataFrame processado
+    """
+    if 'Total de Vendas' in data.columns:
+        data = data.drop(columns=['Total de Vendas'])
+
+    if drop_last_column is None:
+        drop_last_column = data.iloc[:, -1].isnull().all()
+    if drop_last_column:
+        data = data.iloc[:, :-1]
+
+    data = data.fillna(FILL_VALUES)
+
+    data = data.dropna(subset=[TARGET_COLUMN])
+    # A quantidade vendida é lida como inteiro com nulos (UInt16); sem os nulos, o alvo do dataset processado é float
+    data = data.astype({TARGET_COLUMN: 'float64'})
+
+    data = extract_temporal_features(data, calendar_features)
+
+    # Colunas de alta cardinalidade com largura fixa (hashing e média do alvo)
+    encoded_columns = []
+    if encoder is not None:
+        encoded = encoder.transform(
+            {col: data[col].array for col in encoder.source_columns}, data.index if out_of_fold else None
+        )
+        data = data.assign(**encoded)
+        encoded_columns = encoder.source_columns
+
+    # As features temporais já foram extraídas, remove as colunas de data
+    data = data.drop(columns=DATE_COLUMNS)
+
+    # Separa as colunas categóricas das numéricas para aplicar One-Hot Encoding
+    colunas_categoricas = categorical_columns or CATEGORICAL_COLUMNS
+    colunas_numericas = [
+        col for col in data.columns
+        if col not in colunas_categoricas and col != EVENT_COLUMN and col not in encoded_columns
+    ]
+
+    data = one_hot_encoding(data, colunas_categoricas, colunas_numericas, categories)
+
+    # Normaliza nomes das colunas
+    data = normalize_column_names(data, schema)
+
+    return data
+
+
+def _as_categorical(values):
+    """
+    Valores de uma coluna como Categorical (colunas category já chegam assim de load_raw_sessions)
+    """
+    if isinstance(values, pd.Categorical):
+        return values
+
+    return pd.Categorical(np.asarray(values, dtype=object))
+
+
+class HighCardinalityEncoder:
+    """
+    Codificação de colunas categóricas de alta cardinalidade (ex.: 'Evento') com largura fixa
+    - Hashing: cada valor cai em um de n_buckets baldes (crc32 do texto), uma coluna 0/1 por balde
+    - Média do alvo: uma coluna com a média suavizada da quantidade vendida de cada valor
+    A quantidade de features não depende de quantos valores distintos existem e um valor novo
+    na previsão custa O(1) (um crc32 ou uma consulta ao dicionário; valores desconhecidos recebem a média geral)
+    No dataset de treino a média do alvo é calculada fora da dobra: a linha i usa apenas as linhas
+    das outras dobras (dobra = posição da linha no arquivo % n_folds), sem vazar o próprio alvo
+    """
+
+    def __init__(self, hashed_columns=None, n_buckets=HASH_BUCKETS, target_columns=None, n_folds=TARGET_FOLDS,
+                 smoothing=TARGET_SMOOTHING, prior=None, encodings=None):
+        self.hashed_columns = list(hashed_columns or [])
+        self.n_buckets = n_buckets
+        self.target_columns = list(target_columns or [])
+        self.n_folds = n_folds
+        self.smoothing = smoothing
+        self.prior = prior
+        self.encodings = encodings
+        self._fold_stats = None
+
+    @property
+    def source_columns(self):
+        return list(dict.fromkeys(self.target_columns + self.hashed_columns))
+
+    @property
+    def target_feature_columns(self):
+        return [f'{col} Média do Alvo' for col in self.target_columns]
+
+    @property
+    def hashed_feature_columns(self):
+        return [name for col in self.hashed_columns for name in self._hashed_names(col)]
+
+    def _hashed_names(self, col):
+        digits = len(str(self.n_buckets - 1))
+        return [f'{col} Hash {bucket:0{digits}d}' for bucket in range(self.n_buckets)]
+
+    @property
+    def feature_columns(self):
+        return self.target_feature_columns + self.hashed_feature_columns
+
+    def is_fitted(self):
+        return self.encodings is not None or not self.target_columns
+
+    def partial_fit(self, data, positions):
+        """
+        Acumula a soma e a contagem do alvo por valor e por dobra (np.bincount sobre os códigos)
+        Pode ser chamado bloco a bloco; finalize calcula as médias
+
+        Args:
+            data: DataFrame com as colunas de target_columns e o alvo (apenas linhas com alvo)
+            positions: Posição de cada linha no arquivo (define a dobra)
+        """
+        if self._fold_stats is None:
+            self._fold_stats = {'target': np.zeros((2, self.n_folds))}
+        folds = np.asarray(positions) % self.n_folds
+        target = data[TARGET_COLUMN].to_numpy(dtype=float)
+        self._fold_stats['target'] += [
+            np.bincount(folds, weights=target, minlength=self.n_folds), np.bincount(folds, minlength=self.n_folds)
+        ]
+
+        for col in self.target_columns:
+            values = _as_categorical(data[col].array)
+            known = values.codes >= 0
+            # Uma linha por valor: somas das dobras seguidas das contagens das dobras
+            keys = values.codes[known].astype(np.int64) * self.n_folds + folds[known]
+            size = len(values.categories) * self.n_folds
+            sums = np.bincount(keys, weights=target[known], minlength=size).reshape(-1, self.n_folds)
+            counts = np.bincount(keys, minlength=size).reshape(-1, self.n_folds)
+            present = counts.sum(axis=1) > 0
+            # Indexado pelos próprios valores, para somar blocos com categorias diferentes
+            stats = pd.DataFrame(
+                np.hstack([sums, counts])[present], index=values.categories.astype(str)[present]
+            )
+            previous = self._fold_stats.get(col)
+            self._fold_stats[col] = stats if previous is None else previous.add(stats, fill_value=0)
+
+        return self
+
+    def finalize(self):
+        """
+        Calcula a média geral e a média suavizada de cada valor com todas as linhas
+        """
+        target_sums, target_counts = self._fold_stats['target']
+        self.prior = float(target_sums.sum() / target_counts.sum())
+        self.encodings = {}
+        for col in self.target_columns:
+            stats = self._fold_stats[col].to_numpy()
+            sums, counts = stats[:, :self.n_folds].sum(axis=1), stats[:, self.n_folds:].sum(axis=1)
+            means = (sums + self.smoothing * self.prior) / (counts + self.smoothing)
+            self.encodings[col] = dict(zip(self._fold_stats[col].index, means.tolist()))
+
+        return self
+
+    def fit(self, data, positions):
+        self._fold_stats = None
+        if self.target_columns:
+            self.partial_fit(data, positions)
+            self.finalize()
+
+        return self
+
+    def transform(self, columns, positions=None):
+        """
+        Gera as features de cada coluna codificada
+
+        Args:
+            columns: Dicionário (ou DataFrame) com os valores de cada coluna (arrays, listas ou Categorical)
+            positions: Posição de cada linha no arquivo. Se informado, a média do alvo é calculada
+                fora da dobra (apenas linhas usadas no ajuste, no pré-processamento do dataset de treino)
+
+        Returns:
+            Dicionário com o array de cada feature, na ordem de feature_columns
+        """
+        features = {}
+        for col, name in zip(self.target_columns, self.target_feature_columns):
+            if positions is not None:
+                features[name] = self._out_of_fold(col, columns[col], positions)
+            else:
+                features[name] = self._lookup(columns[col], self.encodings[col], self.prior)
+
+        for col in self.hashed_columns:
+            buckets = self._buckets(columns[col])
+            for bucket, name in enumerate(self._hashed_names(col)):
+                features[name] = (buckets == bucket).astype(np.uint8)
+
+        return features
+
+    def _buckets(self, values):
+        """
+        Balde de cada valor (-1 para nulos); com Categorical, calcula o hash só dos valores distintos
+        """
+        def bucket(value):
+            if value is None or value != value:
+                return -1
+            return zlib.crc32(str(value).encode('utf-8')) % self.n_buckets
+
+        if not isinstance(values, pd.Categorical):
+            return np.array([bucket(value) for value in values], dtype=np.int64)
+
+        lookup = np.array([bucket(value) for value in values.categories] + [-1], dtype=np.int64)
+
+        return lookup[values.codes]
+
+    @staticmethod
+    def _lookup(values, table, default):
+        """
+        Média de cada valor: uma consulta ao dicionário por valor (por valor distinto com Categorical)
+        Valores desconhecidos e nulos recebem default
+        """
+        if not isinstance(values, pd.Categorical):
+            return np.array([table.get(str(value), default) for value in values], dtype=float)
+
+        lookup = np.array([table.get(value, default) for value in values.categories.astype(str)] + [default])
+
+        return lookup[values.codes]
+
+    def _out_of_fold(self, col, values, positions):
+        """
+        Média suavizada de cada linha sem as linhas da própria dobra
+        """
+        stats = self._fold_stats[col]
+        # Valores desconhecidos e nulos usam a última linha (zerada)
+        table = np.vstack([stats.to_numpy(), np.zeros((1, 2 * self.n_folds))])
+        sums, counts = table[:, :self.n_folds], table[:, self.n_folds:]
+
+        # Média geral fora de cada dobra (usada nos valores raros e desconhecidos)
+        fold_sums, fold_counts = self._fold_stats['target']
+        priors = (fold_sums.sum() - fold_sums) / np.maximum(fold_counts.sum() - fold_counts, 1)
+
+        values = _as_categorical(values)
+        value_rows = np.append(stats.index.get_indexer(values.categories.astype(str)), -1)[values.codes]
+        folds = np.asarray(positions) % self.n_folds
+        oof_sums = sums.sum(axis=1)[value_rows] - sums[value_rows, folds]
+        oof_counts = counts.sum(axis=1)[value_rows] - counts[value_rows, folds]
+
+        return (oof_sums + self.smoothing * priors[folds]) / (oof_counts + self.smoothing)
+
+    def to_dict(self):
+        return {
+            'hashed_columns': self.hashed_columns,
+            'n_buckets': self.n_buckets,
+            'target_columns': self.target_columns,
+            'n_folds': self.n_folds,
+            'smoothing': self.smoothing,
+            'prior': self.prior,
+            'encodings': self.encodings,
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        return cls(**state)
+
+
+class PreprocessingPipeline:
+    """
+    Pipeline de pré-processamento ajustado, usado para prever novas sessões sem refazer o processamento em lote
+    Guarda as features de calendário, a política de valores nulos, o vocabulário das colunas
+    categóricas, a codificação de alta cardinalidade (opcional) e os nomes normalizados das features,
+    na mesma ordem do dataset processado
+    """
+
+    def __init__(self, categories=None, numerical_columns=None, calendar_features=None, fill_values=None,
+                 categorical_columns=None, raw_columns=None, schema=None, encoder=None):
+        self.categorical_columns = list(categorical_columns or CATEGORICAL_COLUMNS)
+        self.categories = categories
+        self.numerical_columns = numerical_columns
+        self.calendar_features = list(calendar_features or [])
+        self.fill_values = dict(FILL_VALUES if fill_values is None else fill_values)
+        self.raw_columns = raw_columns
+        # Features do HighCardinalityEncoder entram no fim das colunas numéricas
+        self.encoder = encoder
+        self._category_positions = None
+        self._schema = schema
+
+    def fit(self, data, categories=None, drop_last_column=None):
+        """
+        Ajusta o pipeline em um DataFrame bruto
+
+        Args:
+            data: DataFrame lido do arquivo de bilheteria
+            categories: Vocabulário já conhecido de cada coluna categórica (ex.: modo em blocos).
+                Se None, é aprendido das linhas com quantidade vendida preenchida (assim como
+                as médias do alvo do encoder, que no modo em blocos são acumuladas bloco a bloco)
+            drop_last_column: Mesma regra de transform_sessions para a última coluna vazia
+
+        Returns:
+            O próprio pipeline ajustado
+        """
+        self.raw_columns = [str(col) for col in data.columns]
+        if 'Total de Vendas' in data.columns:
+            data = data.drop(columns=['Total de Vendas'])
+        if drop_last_column is None:
+            drop_last_column = data.iloc[:, -1].isnull().all()
+        if drop_last_column:
+            data = data.iloc[:, :-1]
+
+        labeled = data.dropna(subset=[TARGET_COLUMN])
+        encoded_columns = []
+        if self.encoder is not None:
+            if categories is None or not self.encoder.is_fitted():
+                self.encoder.fit(labeled, labeled.index)
+            encoded_columns = self.encoder.feature_columns
+        if categories is None:
+            categories = [sorted(labeled[col].unique()) for col in self.categorical_columns]
+
+        ignored_columns = self.categorical_columns + DATE_COLUMNS + [EVENT_COLUMN, TARGET_COLUMN]
+        if self.encoder is not None:
+            ignored_columns += self.encoder.source_columns
+        raw_numerical = [col for col in data.columns if col not in ignored_columns]
+
+        self.categories = [list(values) for values in categories]
+        self.numerical_columns = raw_numerical + TEMPORAL_FEATURES + self.calendar_features + encoded_columns
+        self._category_positions = None
+        self._schema = None
+
+        return self
+
+    @property
+    def schema(self):
+        """
+        FeatureSchema do pipeline, montado uma vez (ou carregado do JSON salvo)
+        """
+        if self._schema is None:
+            names = list(self.numerical_columns)
+            for col, values in zip(self.categorical_columns, self.categories):
+                names.extend(f'{col}_{value}' for value in values)
+            input_columns = self._input_columns()
+            self._schema = FeatureSchema.from_features(
+                input_columns, names, self.raw_columns,
+                optional_columns=[col for col in input_columns if col in self.fill_values],
+                numeric_columns=self._raw_numerical_columns()
+            )
+
+        return self._schema
+
+    @property
+    def feature_names(self):
+        """
+        Nomes normalizados das features, na ordem usada pelo modelo
+        """
+        return self.schema.feature_names
+
+    def storage_dtypes(self):
+        """
+        Tipos compactos de cada coluna do dataset processado no formato colunar:
+        uint8 para o One-Hot Encoding e os baldes do hashing e float32 para os valores e as features temporais
+        (que ficam nulas quando a data da sessão está vazia e por isso não cabem em um tipo inteiro)
+        """
+        hashed_columns = set(self.encoder.hashed_feature_columns) if self.encoder is not None else set()
+        feature_names = self.feature_names
+
+        dtypes = {name: 'uint8' for name in feature_names[len(self.numerical_columns):]}
+        for name, col in zip(feature_names, self.numerical_columns):
+            dtypes[name] = 'uint8' if col in hashed_columns else 'float32'
+        dtypes[normalize_column_name(TARGET_COLUMN)] = 'float32'
+
+        return dtypes
+
+    def transform(self, data, sparse=False, out_of_fold=False):
+        """
+        Transforma sessões brutas (no formato do bilheteria.csv) nas features do modelo
+        Não remove linhas e não precisa da coluna alvo
+
+        Para uma sessão ou lotes pequenos, evita criar DataFrames intermediários
+
+        Args:
+            data: DataFrame, dicionário (uma sessão) ou lista de dicionários
+            sparse: Se True, retorna uma matriz CSR, sem materializar as colunas do One-Hot Encoding
+            out_of_fold: Se True, a média do alvo do encoder é calculada fora da dobra de cada linha
+                (pelo índice do DataFrame). Usado apenas ao gerar o dataset de treino
+
+        Returns:
+            DataFrame (ou matriz CSR) com as features na ordem de feature_names
+        """
+        columns, index = self._raw_columns(data)
+
+        numerical = self._numerical_block(columns, index if out_of_fold else None)
+        codes = self._category_codes(columns)
+        n_rows = numerical.shape[0]
+        feature_names = self.feature_names
+
+        if sparse:
+            from scipy import sparse as sp
+
+            rows, cols = [], []
+            offset = numerical.shape[1]
+            for col_codes, values in zip(codes, self.categories):
+                known = np.flatnonzero(col_codes >= 0)
+                rows.append(known)
+                cols.append(offset + col_codes[known])
+                offset += len(values)
+            rows = np.concatenate(rows) if rows else np.array([], dtype=np.int64)
+            cols = np.concatenate(cols) if cols else np.array([], dtype=np.int64)
+            encoded = sp.csr_matrix(
+                (np.ones(len(rows)), (rows, cols - numerical.shape[1])),
+                shape=(n_rows, len(feature_names) - numerical.shape[1])
+            )
+            return sp.hstack([sp.csr_matrix(numerical), encoded], format='csr')
+
+        features = np.zeros((n_rows, len(feature_names)))
+        features[:, :numerical.shape[1]] = numerical
+
+        all_rows = np.arange(n_rows)
+        offset = numerical.shape[1]
+        for col_codes, values in zip(codes, self.categories):
+            known = col_codes >= 0
+            features[all_rows[known], offset + col_codes[known]] = 1
+            offset += len(values)
+
+        return pd.DataFrame(features, columns=feature_names, index=index)
+
+    @property
+    def ordinal_feature_names(self):
+        """
+        Nomes normalizados das features da codificação ordinal: colunas numéricas seguidas
+        de uma coluna por variável categórica
+        """
+        names = list(self.numerical_columns) + self.categorical_columns
+
+        return [normalize_column_name(name) for name in names]
+
+    def transform_ordinal(self, data):
+        """
+        Transforma sessões brutas nas features da codificação ordinal, sem One-Hot Encoding
+        Cada coluna categórica vira uma única coluna do tipo category com a posição do valor
+        no vocabulário (valores desconhecidos ficam nulos), lida nativamente pelo
+        HistGradientBoostingRegressor
+
+        Args:
+            data: DataFrame, dicionário (uma sessão) ou lista de dicionários
+
+        Returns:
+            DataFrame com as features na ordem de ordinal_feature_names
+        """
+        columns, index = self._raw_columns(data)
+
+        return self._ordinal_frame(self._numerical_block(columns), self._category_codes(columns), index)
+
+    def ordinal_from_one_hot(self, X):
+        """
+        Converte features já processadas (One-Hot Encoding, na ordem de feature_names) para a
+        codificação ordinal de transform_ordinal, sem reprocessar o dataset bruto
+
+        Args:
+            X: DataFrame, array ou matriz esparsa com as colunas de feature_names
+
+        Returns:
+            DataFrame com as features na ordem de ordinal_feature_names
+        """
+        index = X.index if hasattr(X, 'index') else None
+        if hasattr(X, 'iloc'):
+            X = X.to_numpy()
+
+        n_numerical = len(self.numerical_columns)
+        numerical = X[:, :n_numerical]
+        numerical = numerical.toarray() if hasattr(numerical, 'toarray') else np.asarray(numerical, dtype=float)
+
+        codes = []
+        offset = n_numerical
+        for values in self.categories:
+            block = X[:, offset:offset + len(values)]
+            col_codes = np.asarray(block.argmax(axis=1)).ravel()
+            # Linhas sem nenhuma coluna ativa (valor desconhecido) ficam nulas
+            col_codes[np.asarray(block.sum(axis=1)).ravel() == 0] = -1
+            codes.append(col_codes)
+            offset += len(values)
+
+        return self._ordinal_frame(numerical, codes, index)
+
+    def _ordinal_frame(self, numerical, codes, index):
+        frame = pd.DataFrame(numerical, columns=self.ordinal_feature_names[:numerical.shape[1]], index=index)
+        for name, col_codes, values in zip(self.ordinal_feature_names[numerical.shape[1]:], codes, self.categories):
+            frame[name] = pd.Categorical.from_codes(col_codes, categories=range(len(values)))
+
+        return frame
+
+    def _raw_columns(self, data):
+        """
+        Colunas brutas usadas pelo pipeline, como arrays ou listas, e o índice das linhas
+        """
+        if isinstance(data, dict):
+            data = [data]
+        # Colunas ausentes ou com tipo inválido são apontadas antes de qualquer transformação
+        self.schema.validate(data)
+        if isinstance(data, list):
+            return {col: [row.get(col) for row in data] for col in self._input_columns()}, None
+
+        # Colunas category ficam como Categorical: os códigos são traduzidos sem comparar os textos linha a linha
+        return {
+            col: data[col].array if isinstance(data[col].dtype, pd.CategoricalDtype) else data[col].to_numpy()
+            for col in self._input_columns()
+        }, data.index
+
+    def _numerical_block(self, columns, positions=None):
+        """
+        Monta as colunas numéricas (incluindo as features temporais e as do encoder) aplicando a política de nulos
+        """
+        temporal = temporal_feature_arrays(
+            columns['Data da Sessão'],
+            columns['Período do Cartaz - Data Início'],
+            columns['Período do Cartaz - Data Fim'],
+            self.calendar_features
+        )
+        if self.encoder is not None:
+            temporal.update(self.encoder.transform(columns, positions))
+        n_rows = len(columns['Data da Sessão'])
+        numerical = np.empty((n_rows, len(self.numerical_columns)))
+        for i, col in enumerate(self.numerical_columns):
+            values = temporal[col] if col in temporal else np.asarray(columns[col], dtype=float)
+            if col in self.fill_values:
+                values = np.where(np.isnan(values), self.fill_values[col], values)
+            numerical[:, i] = values
+
+        return numerical
+
+    def _category_codes(self, columns):
+        """
+        Posição de cada valor no vocabulário de cada coluna categórica (-1 para valores desconhecidos)
+        Em lotes grandes usa a busca vetorizada do pandas, em lotes pequenos um dicionário
+        """
+        if self._category_positions is None:
+            self._category_positions = [
+                {value: position for position, value in enumerate(values)} for values in self.categories
+            ]
+
+        codes = []
+        for col, positions, values in zip(self.categorical_columns, self._category_positions, self.categories):
+            if isinstance(columns[col], pd.Categorical):
+                # Posição de cada categoria no vocabulário, espalhada pelos códigos (o -1 final atende os nulos)
+                lookup = np.append(pd.Index(values).get_indexer(columns[col].categories), -1)
+                codes.append(lookup[columns[col].codes].astype(np.int64))
+            elif len(columns[col]) > 1000:
+                codes.append(pd.Index(values).get_indexer(columns[col]))
+            else:
+                codes.append(np.array([positions.get(value, -1) for value in columns[col]], dtype=np.int64))
+
+        return codes
+
+    def _raw_numerical_columns(self):
+        derived_columns = TEMPORAL_FEATURES + CALENDAR_FEATURES
+        if self.encoder is not None:
+            derived_columns = derived_columns + self.encoder.feature_columns
+
+        return [col for col in self.numerical_columns if col not in derived_columns]
+
+    def _input_columns(self):
+        encoded_columns = [] if self.encoder is None else [
+            col for col in self.encoder.source_columns if col not in self.categorical_columns
+        ]
+
+        return DATE_COLUMNS + self.categorical_columns + encoded_columns + self._raw_numerical_columns()
+
+    def to_dict(self):
+        state = {
+            'categorical_columns': self.categorical_columns,
+            'categories': self.categories,
+            'numerical_columns': self.numerical_columns,
+            'calendar_features': self.calendar_features,
+            'fill_values': self.fill_values,
+            'target': TARGET_COLUMN,
+            'feature_names': self.feature_names,
+            'schema': self.schema.to_dict(),
+        }
+        if self.encoder is not None:
+            state['encoder'] = self.encoder.to_dict()
+
+        return state
+
+    @classmethod
+    def from_dict(cls, state):
+        # Pipelines salvos antes do esquema não têm 'schema': ele é montado na primeira vez que for usado
+        schema = FeatureSchema.from_dict(state['schema']) if 'schema' in state else None
+        return cls(
+            categories=state['categories'],
+            numerical_columns=state['numerical_columns'],
+            calendar_features=state['calendar_features'],
+            fill_values=state['fill_values'],
+            categorical_columns=state['categorical_columns'],
+            raw_columns=schema.raw_columns if schema is not None else None,
+            schema=schema,
+            encoder=HighCardinalityEncoder.from_dict(state['encoder']) if 'encoder' in state else None,
+        )
+
+
+def pipeline_path_for(path):
+    """
+    Caminho do pipeline salvo junto de um dataset processado ou de um modelo
+    Ex.: data/bilheteria_processado.csv -> data/bilheteria_processado_pipeline.json
+         data/bilheteria_processado/ -> data/bilheteria_processado_pipeline.json
+         models/gradient_boosting_model.pkl -> models/gradient_boosting_pipeline.json
+    """
+    base = os.path.splitext(path.rstrip('/\\'))[0]
+    if base.endswith('_model'):
+        base = base[:-len('_model')]
+
+    return f'{base}_pipeline.json'
+
+
+def save_pipeline(pipeline, path):
+    """
+    Salva o pipeline ajustado em JSON
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(pipeline.to_dict(), file, ensure_ascii=False, indent=4)
+
+
+def load_pipeline(path):
+    """
+    Carrega um pipeline salvo com save_pipeline
+    """
+    with open(path, encoding='utf-8') as file:
+        return PreprocessingPipeline.from_dict(json.load(file))
+
+
+def fit_category_vocabulary(data_path, chunksize, categorical_columns=None, encoder=None):
+    """
+    Função que percorre o arquivo em blocos e monta o vocabulário das colunas categóricas
+    Considera apenas as linhas com 'Quantidade de ingressos vendidos' preenchida,
+    assim como o One-Hot Encoding do processamento em memória
+    Também verifica se a última coluna do arquivo está completamente vazia
+
+    Args:
+        data_path: Caminho do dataset
+        chunksize: Quantidade de linhas lidas por bloco
+        categorical_columns: Colunas categóricas (padrão: CATEGORICAL_COLUMNS)
+        encoder: HighCardinalityEncoder cujas médias do alvo são acumuladas na mesma leitura
+
+    Returns:
+        Tupla com a lista de categorias ordenadas de cada coluna e se a última coluna deve ser removida
+    """
+    categorical_columns = categorical_columns or CATEGORICAL_COLUMNS
+    vocabulary = {col: set() for col in categorical_columns}
+    last_column_empty = True
+
+    for chunk in load_raw_sessions(data_path, chunksize=chunksize):
+        if 'Total de Vendas' in chunk.columns:
+            chunk = chunk.drop(columns=['Total de Vendas'])
+        last_column_empty = last_column_empty and chunk.iloc[:, -1].isnull().all()
+
+        chunk = chunk.dropna(subset=[TARGET_COLUMN])
+        for col in categorical_columns:
+            vocabulary[col].update(chunk[col].unique())
+        if encoder is not None and encoder.target_columns:
+            encoder.partial_fit(chunk, chunk.index)
+
+    if encoder is not None and encoder.target_columns:
+        encoder.finalize()
+    categories = [sorted(vocabulary[col]) for col in categorical_columns]
+
+    return categories, last_column_empty
+
+
+def fit_pipeline_in_chunks(data_path, chunksize, calendar_features=None, categorical_columns=None, encoder=None):
+    """
+    Função que ajusta o PreprocessingPipeline lendo o arquivo em blocos
+
+    Returns:
+        Tupla com o pipeline ajustado e se a última coluna do arquivo deve ser removida
+    """
+    categories, drop_last_column = fit_category_vocabulary(data_path, chunksize, categorical_columns, encoder)
+
+    header_data = load_raw_sessions(data_path, nrows=0)
+    pipeline = PreprocessingPipeline(
+        calendar_features=calendar_features, categorical_columns=categorical_columns, encoder=encoder
+    )
+    pipeline.fit(header_data, categories, drop_last_column)
+
+    return pipeline, drop_last_column
+
+
+def preprocessing_sparse(data_path, output_path, chunksize=None, calendar_features=None, categorical_columns=None,
+                         encoder=None):
+    """
+    Função que processa o dataset mantendo o bloco categórico como matriz esparsa (CSR)
+    As colunas do One-Hot Encoding nunca são materializadas, então a memória cresce com a
+    quantidade de valores não nulos e não com linhas x categorias (útil ao incluir 'Evento')
+    Salva a matriz, o alvo e os nomes das features em um arquivo .npz
+
+    Args:
+        data_path: Caminho do dataset
+        output_path: Caminho do arquivo .npz
+        chunksize: Se informado, lê o dataset em blocos com essa quantidade de linhas
+        calendar_features: Lista opcional com features de calendário extras
+        categorical_columns: Colunas codificadas com One-Hot Encoding
+        encoder: HighCardinalityEncoder opcional (ver preprocessing)
+
+    Returns:
+        PreprocessingPipeline ajustado
+    """
+    with step('fit_pipeline'):
+        if chunksize:
+            pipeline, _ = fit_pipeline_in_chunks(data_path, chunksize, calendar_features, categorical_columns, encoder)
+            chunks = load_raw_sessions(data_path, chunksize=chunksize)
+        else:
+            data = load_raw_sessions(data_path)
+            pipeline = PreprocessingPipeline(
+                calendar_features=calendar_features, categorical_columns=categorical_columns, encoder=encoder
+            )
+            pipeline.fit(data)
+            chunks = [data]
+
+    blocks = []
+    targets = []
+    with step('transform_sparse', rows_in=0) as record:
+        for chunk in chunks:
+            record.rows_in += len(chunk)
+            chunk = chunk.dropna(subset=[TARGET_COLUMN])
+            if chunk.empty:
+                continue
+            blocks.append(pipeline.transform(chunk, sparse=True, out_of_fold=True))
+            targets.append(chunk[TARGET_COLUMN].to_numpy())
+
+        from scipy import sparse as sp
+
+        features = sp.vstack(blocks, format='csr')
+        record.rows_out = features.shape[0]
+
+    with step('save_sparse_dataset', rows_in=features.shape[0]):
+        save_sparse_dataset(output_path, features, np.concatenate(targets), pipeline.feature_names)
+
+    return pipeline
+
+
+def preprocessing_in_chunks(data_path, output_path, chunksize, calendar_features=None, categorical_columns=None,
+                            columnar_path=None, export_csv=True, encoder=None):
+    """
+    Função que processa o dataset em blocos, sem carregar o arquivo inteiro na memória
+    Primeiro, monta o vocabulário das colunas categóricas em uma leitura do arquivo
+    Depois aplica as mesmas transformações em cada bloco e acrescenta o resultado no arquivo de saída
+    O uso de memória fica limitado ao tamanho do bloco
+
+    Args:
+        data_path: Caminho do dataset
+        output_path: Caminho do dataset processado
+        chunksize: Quantidade de linhas lidas por bloco
+        calendar_features: Lista opcional com features de calendário extras
+        categorical_columns: Colunas codificadas com One-Hot Encoding
+        columnar_path: Se informado, também acrescenta cada bloco ao dataset binário colunar
+        export_csv: Se False, não gera o CSV
+        encoder: HighCardinalityEncoder opcional (ver preprocessing)
+
+    Returns:
+        PreprocessingPipeline ajustado
+    """
+    with step('fit_pipeline'):
+        pipeline, drop_last_column = fit_pipeline_in_chunks(
+            data_path, chunksize, calendar_features, categorical_columns, encoder
+        )
+
+    header = True
+    # Um único registro para todos os blocos, com o total de linhas lidas e gravadas
+    with step('transform_chunks', rows_in=0) as record:
+        record.rows_out = 0
+        for chunk in load_raw_sessions(data_path, chunksize=chunksize):
+            record.rows_in += len(chunk)
+            # Blocos sem nenhuma quantidade vendida não geram linhas no dataset processado
+            if chunk[TARGET_COLUMN].isnull().all():
+                continue
+
+            chunk = transform_sessions(
+                chunk, pipeline.categories, drop_last_column, calendar_features, pipeline.categorical_columns,
+                pipeline.schema, pipeline.encoder, out_of_fold=True
+            )
+            if export_csv:
+                chunk.to_csv(output_path, index=False, mode='w' if header else 'a', header=header)
+            if columnar_path:
+                save_columnar_dataset(columnar_path, chunk, pipeline.storage_dtypes(), append=not header)
+            record.rows_out += len(chunk)
+            header = False
+
+    return pipeline
+
+
+@instrumented('preprocessing')
+def preprocessing(data_path, output_path='data/bilheteria_processado.csv', chunksize=None, calendar_features=None,
+                  categorical_columns=None, sparse=False, export_csv=True, charts=True, preview=False, encoder=None):
     """
     Função que processa o dataset
     Primeiro, remove a coluna Total de Vendas para evitar overfitting
     Depois remove a última coluna se ela estiver completamente vazia
     Depois preenche o valor do ingresso vazio com 0 assumindo como gratuito
     Depois remove todas as linhas que contêm algum valor nulo na coluna 'Quantidade de ingressos vendidos'
-    Depois extrai a hora da sessão
-    Depois extrai o dia da semana
-    Depois extrai o dia do mês
-    Salva o dataset processado
+    Depois extrai as features temporais (hora, dia da semana, dia do mês e dias em cartaz)
+    Salva o dataset processado em formato binário colunar no diretório <output_path sem extensão>
+    (lido pelo modeling sem parse e com tipos compactos) e, opcionalmente, em CSV
+    Salva também o pipeline ajustado (vocabulário e layout das features)
+    em <output_path sem extensão>_pipeline.json, para prever novas sessões sem reprocessar o dataset
 
     Args:
         data_path: Caminho do dataset
+        output_path: Caminho do dataset processado
+        chunksize: Se informado, processa o dataset em blocos com essa quantidade de linhas
+            (para arquivos maiores que a memória). O heatmap de correlação não é gerado nesse modo
+        calendar_features: Lista opcional com features de calendário extras (ver CALENDAR_FEATURES)
+        categorical_columns: Colunas codificadas com One-Hot Encoding (padrão: CATEGORICAL_COLUMNS).
+            Ex.: CATEGORICAL_COLUMNS + [EVENT_COLUMN] para incluir a coluna 'Evento'
+        sparse: Se True, salva as features como matriz esparsa em <output_path sem extensão>.npz
+            (ver preprocessing_sparse). O heatmap de correlação não é gerado nesse modo
+        export_csv: Se False, não gera o CSV (apenas o dataset binário colunar)
+        charts: Se False, não gera o heatmap de correlação (pode ser gerado depois com render_charts)
+        preview: Se True, gera o heatmap em baixa resolução (prévia rápida)
+        encoder: HighCardinalityEncoder para colunas de alta cardinalidade com largura fixa.
+            Ex.: HighCardinalityEncoder(target_columns=[EVENT_COLUMN], hashed_columns=[EVENT_COLUMN])
 
     Returns:
-        None
+        PreprocessingPipeline ajustado. Erros são exibidos e propagados em todos os modos,
+        para que o pipeline não siga sem o dataset processado
     """
     # Configurar pandas para melhor visualização
     pd.set_option('display.max_columns', None)
     pd.set_option('display.width', None)
     pd.set_option('display.max_colwidth', 50)
 
-    try:
-        data = pd.read_csv(data_path, sep=';', skiprows=1)
-
-        if 'Total de Vendas' in data.columns:
-            data = data.drop(columns=['Total de Vendas'])
-
-        if data.iloc[:, -1].isnull().all():
-            data = data.iloc[:, :-1]
-
-        data['Valor do Ingresso'] = data['Valor do Ingresso'].fillna(0)
-
-        data = data.dropna(subset=['Quantidade de ingressos vendidos'])
-
-        data = get_hour_of_session(data)
+    if sparse:
+        try:
+            sparse_path = f'{os.path.splitext(output_path)[0]}.npz'
+            pipeline = preprocessing_sparse(
+                data_path, sparse_path, chunksize, calendar_features, categorical_columns, encoder
+            )
+            save_pipeline(pipeline, pipeline_path_for(sparse_path))
+            print("\nDataset processado com sucesso!")
+        except Exception as e:
+            print(f"Erro ao processar o dataset esparso: {e}")
+            raise
+        return pipeline
 
-        data = extract_day_of_week(data)
-        
-        data = extract_day_of_month(data)
-        
-        data = calculate_days_in_theaters(data)
+    if chunksize:
+        try:
+            pipeline = preprocessing_in_chunks(
+                data_path, output_path, chunksize, calendar_features, categorical_columns,
+                columnar_path=os.path.splitext(output_path)[0], export_csv=export_csv, encoder=encoder
+            )
+            save_pipeline(pipeline, pipeline_path_for(output_path))
+            print("\nDataset processado com sucesso!")
+        except Exception as e:
+            print(f"Erro ao processar o dataset em blocos: {e}")
+            raise
+        return pipeline
 
-        # Garante que função extract_day_of_week já foi aplicada e remove a coluna 'Data da Sessão'
-        if 'Dia da Semana' in data.columns:
-            data = data.drop(columns=['Data da Sessão'])
+    try:
+        with step('read_csv') as record:
+            data = load_raw_sessions(data_path)
+            record.rows_out = len(data)
 
-        # Separa as colunas categóricas das numéricas para aplicar One-Hot Encoding
-        colunas_categoricas = ['Espaço', 'Tipo de Evento', 'Classificação Etária', 'Tipo da Sessão']
-        colunas_numericas = [col for col in data.columns if col not in colunas_categoricas and col != 'Evento']
+        with step('fit_pipeline', rows_in=len(data)):
+            pipeline = PreprocessingPipeline(
+                calendar_features=calendar_features, categorical_columns=categorical_columns, encoder=encoder
+            )
+            pipeline.fit(data)
 
-        data = one_hot_encoding(data, colunas_categoricas, colunas_numericas)
+        with step('transform_sessions', rows_in=len(data)) as record:
+            data = transform_sessions(
+                data, pipeline.categories, calendar_features=calendar_features, categorical_columns=pipeline.categorical_columns,
+                schema=pipeline.schema, encoder=pipeline.encoder, out_of_fold=True
+            )
+            record.rows_out = len(data)
 
-        # Normaliza nomes das colunas
-        data = normalize_column_names(data)
+        # Garante que o pipeline gera exatamente as colunas do dataset processado
+        if pipeline.feature_names != [col for col in data.columns if col != normalize_column_name(TARGET_COLUMN)]:
+            raise ValueError("As features do pipeline não correspondem ao dataset processado")
 
         print("\nDataset processado com sucesso!")
 
-        correlation_heatmap(data, "preprocessing")
-        print("\nHeatmap de correlação gerado com sucesso!")
+        if charts:
+            try:
+                from .chart_rendering import PREPROCESSING_CHARTS, render_charts
+            except ImportError:
+                from chart_rendering import PREPROCESSING_CHARTS, render_charts
+            with step('charts', rows_in=len(data)):
+                render_charts([(PREPROCESSING_CHARTS, data, "preprocessing")], preview=preview)
+            print("\nHeatmap de correlação gerado com sucesso!")
     except Exception as e:
         print(f"Erro ao processar o dataset: {e}")
-        return None
+        raise
 
-    try:
-        data.to_csv('data/bilheteria_processado.csv', index=False)
-        print("\nDataset processado com sucesso!")
-    except Exception as e:
-        print(f"Erro ao salvar o dataset processado: {e}")
-        return None
+    # Erros ao salvar não são engolidos: sem o dataset colunar, as etapas seguintes não têm o que ler
+    with step('save_columnar_dataset', rows_in=len(data)):
+        save_columnar_dataset(os.path.splitext(output_path)[0], data, pipeline.storage_dtypes())
+    if export_csv:
+        with step('export_csv', rows_in=len(data)):
+            data.to_csv(output_path, index=False)
+    save_pipeline(pipeline, pipeline_path_for(output_path))
+    print("\nDataset processado com sucesso!")
+
+    return pipeline
 
 
 if __name__ == "__main__":
@@ -0,0 +1,205 @@
+import numpy as np
+import pandas as pd
+
+try:
+    from .batch_scoring import KEY_COLUMNS
+    from .inference import predict_sessions
+    from .preprocessing import normalize_column_name
+except ImportError:
+    from batch_scoring import KEY_COLUMNS
+    from inference import predict_sessions
+    from preprocessing import normalize_column_name
+
+# Simulação de preços: quantos ingressos cada sessão venderia (e com qual receita) em cada preço de uma grade
+# As sessões são transformadas pelo pipeline uma única vez; o preço só entra em uma coluna numérica, então
+# a grade (sessões x preços) é montada repetindo as linhas já transformadas e trocando apenas essa coluna
+# As previsões saem de poucas chamadas grandes ao predict do modelo, sem laço em Python por sessão ou preço
+
+PRICE_COLUMN = 'Valor do Ingresso'
+
+# Grade padrão de preços (mínimo, máximo e passo), cobrindo os valores do dataset
+PRICE_GRID = (5, 100, 5)
+
+# Linhas (sessão x preço) por chamada ao predict: limita a memória da grade, que não é montada inteira
+BATCH_ROWS = 262_144
+
+
+def price_grid(minimum=PRICE_GRID[0], maximum=PRICE_GRID[1], step=PRICE_GRID[2]):
+    """
+    Preços de minimum a maximum (inclusive), de step em step
+    """
+    return np.arange(minimum, maximum + step / 2, step, dtype=float)
+
+
+def _session_frame(sessions):
+    """
+    Sessões como DataFrame (aceita um dicionário ou uma lista de dicionários)
+    """
+    if isinstance(sessions, dict):
+        sessions = [sessions]
+    if isinstance(sessions, list):
+        sessions = pd.DataFrame(sessions)
+
+    return sessions
+
+
+def session_features(model, pipeline, sessions):
+    """
+    Features das sessões no formato esperado pelo modelo (mesma regra de predict_sessions):
+    codificação ordinal, matriz CSR ou array denso
+    A coluna do preço é trocada pelos preços da grade, então sessões sem o preço atual também são aceitas
+
+    Returns:
+        Tupla (features, coluna do preço)
+    """
+    sessions = _session_frame(sessions)
+    if PRICE_COLUMN not in sessions.columns:
+        sessions = sessions.assign(**{PRICE_COLUMN: np.nan})
+
+    if hasattr(model, 'is_categorical_'):
+        features = pipeline.transform_ordinal(sessions).reset_index(drop=True)
+        names = list(features.columns)
+    elif not hasattr(model, 'feature_names_in_'):
+        features = pipeline.transform(sessions, sparse=True)
+        names = pipeline.feature_names
+    else:
+        features = pipeline.transform(sessions).to_numpy()
+        names = pipeline.feature_names
+
+    price_name = normalize_column_name(PRICE_COLUMN)
+    if price_name not in names:
+        raise ValueError(f"O pipeline do modelo não usa a coluna {PRICE_COLUMN}")
+
+    return features, names.index(price_name)
+
+
+def _grid_batch(pipeline, features, price_position, rows, prices):
+    """
+    Linhas repetidas (uma por preço) com a coluna do preço trocada pelos preços da grade
+    """
+    if isinstance(features, pd.DataFrame):
+        batch = features.take(rows).reset_index(drop=True)
+        batch.iloc[:, price_position] = prices
+        return batch
+
+    if hasattr(features, 'tocsr'):
+        from scipy import sparse as sp
+
+        batch = features[rows]
+        return sp.hstack(
+            [batch[:, :price_position], sp.csr_matrix(prices.reshape(-1, 1)), batch[:, price_position + 1:]],
+            format='csr'
+        )
+
+    batch = features[rows]
+    batch[:, price_position] = prices
+
+    return pd.DataFrame(batch, columns=pipeline.feature_names, copy=False)
+
+
+def predict_price_grid(model, pipeline, sessions, prices, batch_rows=BATCH_ROWS):
+    """
+    Prevê a quantidade de ingressos vendidos de cada sessão em cada preço da grade
+
+    Args:
+        model: Modelo treinado (ou compilado)
+        pipeline: PreprocessingPipeline salvo junto do modelo
+        sessions: DataFrame, dicionário (uma sessão) ou lista de dicionários
+        prices: Preços simulados
+        batch_rows: Linhas (sessão x preço) por chamada ao predict
+
+    Returns:
+        Array (sessões x preços) com as previsões
+    """
+    prices = np.asarray(prices, dtype=float)
+    features, price_position = session_features(model, pipeline, sessions)
+    n_sessions, n_prices = features.shape[0], len(prices)
+    quantities = np.empty((n_sessions, n_prices))
+
+    # Sessões inteiras por lote: cada lote tem cerca de batch_rows linhas
+    sessions_per_batch = max(1, batch_rows // max(n_prices, 1))
+    for start in range(0, n_sessions, sessions_per_batch):
+        end = min(start + sessions_per_batch, n_sessions)
+        rows = np.repeat(np.arange(start, end), n_prices)
+        batch = _grid_batch(pipeline, features, price_position, rows, np.tile(prices, end - start))
+        quantities[start:end] = np.asarray(model.predict(batch), dtype=float).reshape(end - start, n_prices)
+
+    return quantities
+
+
+def simulate_prices(model, pipeline, sessions, prices=None, batch_rows=BATCH_ROWS):
+    """
+    Preço de maior receita prevista para cada sessão
+    A receita é preço x quantidade prevista (previsões negativas contam como zero ingressos); em caso
+    de empate vale o menor preço
+
+    Args:
+        model: Modelo treinado (ou compilado)
+        pipeline: PreprocessingPipeline salvo junto do modelo
+        sessions: DataFrame, dicionário (uma sessão) ou lista de dicionários
+        prices: Preços simulados (padrão: price_grid())
+        batch_rows: Linhas (sessão x preço) por chamada ao predict
+
+    Returns:
+        Tupla (DataFrame com uma linha por sessão, array sessões x preços com as quantidades previstas)
+    """
+    sessions = _session_frame(sessions)
+    prices = price_grid() if prices is None else np.asarray(prices, dtype=float)
+
+    quantities = predict_price_grid(model, pipeline, sessions, prices, batch_rows)
+    revenue = prices * np.maximum(quantities, 0)
+    best = revenue.argmax(axis=1)
+    rows = np.arange(len(best))
+
+    result = pd.DataFrame({col: sessions[col].to_numpy() for col in KEY_COLUMNS if col in sessions.columns})
+
+    # Receita prevista no preço atual de cada sessão, para comparar com o preço sugerido
+    # (NaN quando a grade de sessões não traz o preço atual ou a sessão não tem preço)
+    if PRICE_COLUMN in sessions.columns:
+        current_prices = sessions[PRICE_COLUMN].to_numpy(dtype=float)
+        current_quantities = np.maximum(predict_sessions(model, pipeline, sessions), 0)
+        current_revenue = current_prices * current_quantities
+    else:
+        current_prices = current_revenue = np.full(len(sessions), np.nan)
+    result[PRICE_COLUMN] = current_prices
+    result['Receita prevista no preço atual'] = current_revenue
+    result['Preço ótimo'] = prices[best]
+    result['Ingressos previstos no preço ótimo'] = quantities[rows, best]
+    result['Receita prevista no preço ótimo'] = revenue[rows, best]
+
+    return result, quantities
+
+
+def check_price_grid(model, pipeline, sessions, atol=1e-9):
+    """
+    Confere a grade com predict_sessions: no preço atual de cada sessão, a quantidade prevista na grade
+    tem que ser a prevista para a própria sessão. Vale para os três formatos da grade (ordinal, CSR e denso),
+    escolhidos pelo tipo do modelo como no predict_sessions
+
+    Args:
+        model: Modelo treinado (ou compilado)
+        pipeline: PreprocessingPipeline salvo junto do modelo
+        sessions: DataFrame, dicionário (uma sessão) ou lista de dicionários; sessões sem preço são ignoradas
+        atol: Maior diferença absoluta aceita
+
+    Returns:
+        Maior diferença absoluta entre a grade e predict_sessions
+
+    Raises:
+        ValueError: Se a diferença passar de atol ou se nenhuma sessão tiver o preço atual
+    """
+    sessions = _session_frame(sessions)
+    if PRICE_COLUMN in sessions.columns:
+        sessions = sessions[sessions[PRICE_COLUMN].notna()].reset_index(drop=True)
+    if PRICE_COLUMN not in sessions.columns or sessions.empty:
+        raise ValueError(f"Nenhuma sessão tem a coluna {PRICE_COLUMN} preenchida")
+
+    # Grade com os preços atuais distintos; position aponta a coluna do preço de cada sessão
+    prices, position = np.unique(sessions[PRICE_COLUMN].to_numpy(dtype=float), return_inverse=True)
+    quantities = predict_price_grid(model, pipeline, sessions, prices)
+    expected = np.asarray(predict_sessions(model, pipeline, sessions), dtype=float)
+    difference = float(np.abs(quantities[np.arange(len(sessions)), position] - expected).max())
+    if difference > atol:
+        raise ValueError(f"A grade de preços difere do predict_sessions em até {difference:.3g}")
+
+    return difference
@@ -0,0 +1,436 @@
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .inference import load_model, load_model_pipeline, predict_sessions
+    from .instrumentation import instrumented, step
+    from .preprocessing import load_pipeline, normalize_column_name, save_pipeline
+except ImportError:
+    from inference import load_model, load_model_pipeline, predict_sessions
+    from instrumentation import instrumented, step
+    from preprocessing import load_pipeline, normalize_column_name, save_pipeline
+
+# Modelos por espaço (ou por região): o dataset processado é dividido em partes (shards) e cada parte
+# tem o seu modelo, treinado em paralelo dentro de um único orçamento de CPU (ver cross_validation)
+# Cada parte tem uma impressão digital (hash das suas linhas, colunas e hiperparâmetros): só as partes
+# que mudaram são treinadas de novo, então o retreino cresce com os dados alterados e não com o total
+# Cada parte usa as colunas numéricas e apenas as colunas do One-Hot Encoding ativas nas suas linhas:
+# categorias novas em outro espaço não mudam as colunas (nem a impressão digital) das demais partes
+# ShardedModel envia cada sessão ao modelo do seu espaço; espaços sem modelo usam o modelo global
+# O scikit-learn só é importado no treino: prever com os modelos por espaço importa apenas o joblib
+
+VENUE_COLUMN = 'Espaço'
+
+# Estado de cada espaço da FUNARTE, usado na divisão por região
+VENUE_REGIONS = {
+    'Cacilda Becker': 'RJ',
+    'Glauce Rocha': 'RJ',
+    'Teatro Dulcina': 'RJ',
+    'Complexo Cultural Funarte SP': 'SP',
+    'Teatro de Arena Eugênio Kusnet': 'SP',
+    'Complexo Cultural MG': 'MG',
+}
+
+SHARD_KINDS = ['venue', 'region']
+
+# Partes com menos linhas rotuladas não ganham modelo próprio e usam o modelo global
+MIN_SHARD_ROWS = 30
+
+MANIFEST_FILE = 'shards.json'
+PIPELINE_FILE = 'pipeline.json'
+
+
+def shard_of(venues, by='venue'):
+    """
+    Parte de cada espaço: o próprio espaço ou a região (None para espaços sem região conhecida)
+    """
+    if by not in SHARD_KINDS:
+        raise ValueError(f"by deve ser um de {SHARD_KINDS}")
+    if by == 'venue':
+        return [None if pd.isna(venue) else str(venue) for venue in venues]
+
+    return [VENUE_REGIONS.get(venue) for venue in venues]
+
+
+def venue_codes(X, pipeline):
+    """
+    Posição do espaço de cada linha do dataset processado no vocabulário do pipeline,
+    lida das colunas do One-Hot Encoding (-1 para linhas sem espaço conhecido)
+    """
+    position = pipeline.categorical_columns.index(VENUE_COLUMN)
+    offset = len(pipeline.numerical_columns) + sum(len(values) for values in pipeline.categories[:position])
+    width = len(pipeline.categories[position])
+
+    block = X.iloc[:, offset:offset + width].to_numpy() if isinstance(X, pd.DataFrame) else X[:, offset:offset + width]
+    codes = np.asarray(block.argmax(axis=1)).ravel()
+    codes[np.asarray(block.sum(axis=1)).ravel() == 0] = -1
+
+    return codes
+
+
+def shard_rows(X, pipeline, by='venue'):
+    """
+    Linhas do dataset processado de cada parte
+
+    Returns:
+        Dicionário com o nome da parte e o array das posições das linhas
+    """
+    codes = venue_codes(X, pipeline)
+    venues = pipeline.categories[pipeline.categorical_columns.index(VENUE_COLUMN)]
+    names = shard_of(venues, by)
+
+    shards = {}
+    for code, name in enumerate(names):
+        if name is not None:
+            shards.setdefault(name, []).append(code)
+
+    return {name: np.flatnonzero(np.isin(codes, shard_codes)) for name, shard_codes in sorted(shards.items())}
+
+
+def shard_columns(X, rows, n_numerical):
+    """
+    Posições das colunas de uma parte: as numéricas e as do One-Hot Encoding com algum valor nas suas linhas
+    """
+    if isinstance(X, pd.DataFrame):
+        active = X.iloc[rows, n_numerical:].to_numpy().any(axis=0)
+    else:
+        active = np.asarray((X[rows][:, n_numerical:] != 0).sum(axis=0)).ravel() > 0
+
+    return np.concatenate([np.arange(n_numerical), n_numerical + np.flatnonzero(active)])
+
+
+def _subset(X, rows, columns):
+    if isinstance(X, pd.DataFrame):
+        return X.iloc[rows, columns]
+
+    return X[rows][:, columns]
+
+
+def shard_fingerprint(X, y, rows, columns, feature_names, model):
+    """
+    Impressão digital de uma parte: nomes das colunas, valores das linhas, alvo e hiperparâmetros do modelo
+    """
+    subset = _subset(X, rows, columns)
+    digest = hashlib.sha256()
+    digest.update(json.dumps([str(feature_names[col]) for col in columns], ensure_ascii=False).encode('utf-8'))
+    if isinstance(subset, pd.DataFrame):
+        digest.update(pd.util.hash_pandas_object(subset, index=False).to_numpy().tobytes())
+    else:
+        subset = subset.tocsr()
+        for values in (subset.data, subset.indices, subset.indptr):
+            digest.update(np.ascontiguousarray(values).tobytes())
+    digest.update(np.asarray(y, dtype=float)[rows].tobytes())
+    digest.update(json.dumps(model.get_params(), sort_keys=True, default=str).encode('utf-8'))
+
+    return digest.hexdigest()
+
+
+def _fit_shard(model, X, y, rows, columns, threads):
+    """
+    Ajusta um clone do modelo nas linhas e colunas de uma parte
+    X pode ser o diretório gravado com share_features (nos processos do pool)
+    """
+    from sklearn.base import clone
+    from threadpoolctl import threadpool_limits
+
+    try:
+        from .cross_validation import open_shared_features
+    except ImportError:
+        from cross_validation import open_shared_features
+
+    if isinstance(X, str):
+        X, y = open_shared_features(X)
+
+    start = time.perf_counter()
+    model = clone(model)
+    # Mesma regra de cross_validation._fit_split: n_jobs volta ao valor original depois do ajuste
+    original_n_jobs = model.get_params().get('n_jobs', None)
+    if 'n_jobs' in model.get_params():
+        model.set_params(n_jobs=threads)
+    with threadpool_limits(limits=threads):
+        model.fit(_subset(X, rows, columns), np.asarray(y)[rows])
+    if 'n_jobs' in model.get_params():
+        model.set_params(n_jobs=original_n_jobs)
+
+    return model, time.perf_counter() - start
+
+
+def fit_shards(model, X, y, tasks, n_jobs=-1):
+    """
+    Ajusta um modelo por parte em paralelo: o orçamento n_jobs é dividido entre processos (um por parte)
+    e threads de cada modelo. Só as linhas das partes a treinar são gravadas para os processos
+
+    Args:
+        model: Modelo base (não é alterado)
+        X: Features (DataFrame ou matriz CSR)
+        y: Alvo
+        tasks: Dicionário com o nome da parte e a tupla (linhas, colunas)
+        n_jobs: Orçamento de CPU (ver cross_validation.cpu_budget)
+
+    Returns:
+        Dicionário com o nome da parte e a tupla (modelo treinado, segundos do ajuste)
+    """
+    try:
+        from .cross_validation import SHARED_MEMORY_DIR, plan_workers, share_features
+    except ImportError:
+        from cross_validation import SHARED_MEMORY_DIR, plan_workers, share_features
+
+    workers, threads = plan_workers(len(tasks), n_jobs)
+    # As partes maiores começam primeiro, para as menores preencherem os processos no fim
+    names = sorted(tasks, key=lambda name: len(tasks[name][0]), reverse=True)
+
+    if workers == 1:
+        return {name: _fit_shard(model, X, y, *tasks[name], threads) for name in names}
+
+    # Linhas das partes alteradas, gravadas uma única vez e renumeradas para cada parte
+    selected = np.concatenate([tasks[name][0] for name in names])
+    offsets = np.cumsum([0] + [len(tasks[name][0]) for name in names])
+    directory = tempfile.mkdtemp(prefix='sharded_training_', dir=SHARED_MEMORY_DIR)
+    try:
+        X_selected = X.iloc[selected] if isinstance(X, pd.DataFrame) else X[selected]
+        share_features(X_selected, np.asarray(y)[selected], directory)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(
+                    _fit_shard, model, directory, None, np.arange(offsets[i], offsets[i + 1]), tasks[name][1], threads
+                ): name
+                for i, name in enumerate(names)
+            }
+            return {futures[future]: future.result() for future in as_completed(futures)}
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def shard_file(name):
+    return f'{normalize_column_name(name)}.pkl'
+
+
+def load_shard_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {'shards': {}}
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+@instrumented('sharded_training')
+def sharded_training(data_path, output_dir='models/shards', by='venue', model_name='Gradient Boosting', n_jobs=-1,
+                     min_rows=MIN_SHARD_ROWS, global_model='models/gradient_boosting_model.pkl', force=False):
+    """
+    Treina um modelo por espaço (ou região) no dataset processado, só para as partes que mudaram
+
+    Args:
+        data_path: Dataset processado (diretório binário colunar, .csv ou .npz)
+        output_dir: Diretório dos modelos das partes, do pipeline e do manifesto (shards.json)
+        by: 'venue' (um modelo por espaço) ou 'region' (RJ, SP e MG)
+        model_name: Modelo de build_models (com One-Hot Encoding)
+        n_jobs: Orçamento de CPU, dividido entre processos (partes) e threads
+        min_rows: Partes com menos linhas usam o modelo global
+        global_model: Modelo usado para os espaços sem modelo próprio (gravado no manifesto)
+        force: Se True, treina todas as partes
+
+    Returns:
+        Manifesto com a impressão digital, as linhas e as colunas de cada parte
+    """
+    import joblib
+
+    try:
+        from .modeling import build_models, load_processed_data, uses_native_categories
+    except ImportError:
+        from modeling import build_models, load_processed_data, uses_native_categories
+
+    model = build_models()[model_name]
+    if uses_native_categories(model):
+        raise ValueError(f"{model_name} usa a codificação ordinal; os modelos por espaço usam o One-Hot Encoding")
+
+    with step('load_processed_data') as record:
+        X, y, feature_names, pipeline = load_processed_data(data_path)
+        record.rows_out = len(y)
+    if pipeline is None:
+        raise ValueError(f"Pipeline de pré-processamento não encontrado para {data_path}")
+    feature_names = list(feature_names)
+
+    # Com outra divisão ou outro modelo nenhuma parte anterior é reaproveitada
+    manifest = load_shard_manifest(output_dir)
+    same_setup = manifest.get('by', by) == by and manifest.get('model_name', model_name) == model_name
+    previous = manifest['shards'] if same_setup else {}
+
+    with step('fingerprints', rows_in=len(y)):
+        shards = {}
+        tasks = {}
+        for name, rows in shard_rows(X, pipeline, by).items():
+            if len(rows) < min_rows:
+                print(f"{name}: {len(rows)} linhas, usa o modelo global")
+                continue
+            columns = shard_columns(X, rows, len(pipeline.numerical_columns))
+            fingerprint = shard_fingerprint(X, y, rows, columns, feature_names, model)
+            shards[name] = {
+                'fingerprint': fingerprint,
+                'rows': int(len(rows)),
+                'columns': [feature_names[col] for col in columns],
+                'file': shard_file(name),
+            }
+            if force or previous.get(name, {}).get('fingerprint') != fingerprint \
+                    or not os.path.exists(os.path.join(output_dir, shard_file(name))):
+                tasks[name] = (rows, columns)
+            else:
+                shards[name].update(trained_at=previous[name]['trained_at'], seconds=previous[name]['seconds'])
+
+    os.makedirs(output_dir, exist_ok=True)
+    with step('fit_shards', rows_in=int(sum(len(rows) for rows, _ in tasks.values()))):
+        fitted = fit_shards(model, X, y, tasks, n_jobs) if tasks else {}
+
+    trained_at = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds')
+    for name, (shard_model, seconds) in fitted.items():
+        joblib.dump(shard_model, os.path.join(output_dir, shards[name]['file']))
+        shards[name].update(trained_at=trained_at, seconds=round(seconds, 3))
+
+    # Partes que deixaram de existir (ou ficaram pequenas demais) perdem o modelo
+    for name, entry in manifest['shards'].items():
+        if entry['file'] not in {shard['file'] for shard in shards.values()} \
+                and os.path.exists(os.path.join(output_dir, entry['file'])):
+            os.remove(os.path.join(output_dir, entry['file']))
+
+    save_pipeline(pipeline, os.path.join(output_dir, PIPELINE_FILE))
+    manifest = {
+        'by': by,
+        'model_name': model_name,
+        'data_path': data_path,
+        'global_model': global_model if global_model and os.path.exists(global_model) else None,
+        'shards': shards,
+    }
+    temp_path = os.path.join(output_dir, f'{MANIFEST_FILE}.tmp')
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, ensure_ascii=False, indent=4)
+    os.replace(temp_path, os.path.join(output_dir, MANIFEST_FILE))
+
+    print(f"\nModelos por {'espaço' if by == 'venue' else 'região'} em {output_dir}")
+    for name, entry in shards.items():
+        status = f"treinado em {entry['seconds']:.2f} s" if name in fitted else 'sem mudança'
+        print(f"{name:<32} | {entry['rows']:>6} linhas | {len(entry['columns']):>3} colunas | {status}")
+
+    return manifest
+
+
+class ShardedModel:
+    """
+    Modelo de previsão que envia cada sessão ao modelo da sua parte (espaço ou região)
+    Sessões de espaços sem modelo próprio usam o modelo global, com o pipeline dele
+
+    Args:
+        by: 'venue' ou 'region'
+        models: Dicionário com o nome da parte e o modelo treinado
+        columns: Dicionário com o nome da parte e as features usadas pelo modelo
+        pipeline: PreprocessingPipeline do dataset usado no treino das partes
+        fallback_model: Modelo global (opcional)
+        fallback_pipeline: Pipeline do modelo global
+    """
+
+    def __init__(self, by, models, columns, pipeline, fallback_model=None, fallback_pipeline=None):
+        self.by = by
+        self.models = models
+        self.columns = columns
+        self.pipeline = pipeline
+        self.fallback_model = fallback_model
+        self.fallback_pipeline = fallback_pipeline
+        positions = {name: position for position, name in enumerate(pipeline.feature_names)}
+        # Colunas de cada parte no transform do pipeline (-1 para colunas que o pipeline não tem mais)
+        self._positions = {
+            name: np.array([positions.get(col, -1) for col in shard_columns], dtype=np.int64)
+            for name, shard_columns in columns.items()
+        }
+
+    def shards(self, sessions):
+        """
+        Parte de cada sessão (None para as que vão ao modelo global)
+        """
+        if isinstance(sessions, dict):
+            sessions = [sessions]
+        if isinstance(sessions, list):
+            venues = [row.get(VENUE_COLUMN) for row in sessions]
+        else:
+            venues = sessions[VENUE_COLUMN].tolist()
+
+        return [name if name in self.models else None for name in shard_of(venues, self.by)]
+
+    def predict(self, sessions):
+        """
+        Prevê sessões brutas (DataFrame, dicionário ou lista de dicionários): as features são geradas
+        uma única vez e cada parte é prevista em uma única chamada ao seu modelo
+        """
+        if isinstance(sessions, dict):
+            sessions = [sessions]
+        names = np.array(self.shards(sessions), dtype=object)
+        has_model = np.array([name is not None for name in names], dtype=bool)
+        predictions = np.empty(len(names))
+
+        routed = np.flatnonzero(has_model)
+        if len(routed):
+            sparse = any(not hasattr(model, 'feature_names_in_') for model in self.models.values())
+            features = self.pipeline.transform(_take(sessions, routed), sparse=sparse)
+            if not sparse:
+                features = features.to_numpy()
+            for name in np.unique(names[routed]):
+                local = np.flatnonzero(names[routed] == name)
+                predictions[routed[local]] = self._predict_shard(name, features[local])
+
+        fallback = np.flatnonzero(~has_model)
+        if len(fallback):
+            if self.fallback_model is None:
+                raise ValueError(f"Sessões de espaços sem modelo próprio e sem modelo global: {len(fallback)}")
+            predictions[fallback] = predict_sessions(self.fallback_model, self.fallback_pipeline, _take(sessions, fallback))
+
+        return predictions
+
+    def _predict_shard(self, name, features):
+        positions = self._positions[name]
+        if hasattr(features, 'tocsr'):
+            from scipy import sparse as sp
+
+            # Colunas que o pipeline não tem mais ficam zeradas (como uma categoria desconhecida)
+            subset = features[:, np.maximum(positions, 0)].tocsc()
+            subset = subset @ sp.diags((positions >= 0).astype(float))
+            return self.models[name].predict(subset.tocsr())
+
+        subset = np.where(positions >= 0, features[:, np.maximum(positions, 0)], 0)
+
+        return self.models[name].predict(pd.DataFrame(subset, columns=self.columns[name], copy=False))
+
+
+def _take(sessions, rows):
+    if isinstance(sessions, list):
+        return [sessions[row] for row in rows]
+
+    return sessions.iloc[rows]
+
+
+def load_sharded_model(output_dir):
+    """
+    Carrega os modelos das partes, o pipeline e o modelo global gravados por sharded_training
+    """
+    import joblib
+
+    manifest = load_shard_manifest(output_dir)
+    if not manifest['shards']:
+        raise ValueError(f"Nenhum modelo por espaço em {output_dir}")
+
+    models = {name: joblib.load(os.path.join(output_dir, entry['file'])) for name, entry in manifest['shards'].items()}
+    columns = {name: entry['columns'] for name, entry in manifest['shards'].items()}
+    pipeline = load_pipeline(os.path.join(output_dir, PIPELINE_FILE))
+
+    fallback_model = fallback_pipeline = None
+    if manifest.get('global_model'):
+        fallback_model = load_model(manifest['global_model'])
+        fallback_pipeline = load_model_pipeline(manifest['global_model'])
+    print(f"Modelos por espaço carregados de: {output_dir} ({len(models)} partes)")
+
+    return ShardedModel(manifest['by'], models, columns, pipeline, fallback_model, fallback_pipeline)
@@ -0,0 +1,164 @@
+import pandas as pd
+import numpy as np
+import json
+import os
+
+
+def save_sparse_dataset(path, features, target, feature_names):
+    """
+    Salva um dataset esparso em um único arquivo .npz
+    Guarda os arrays da matriz CSR, o alvo e os nomes das features (sem pickle)
+
+    Args:
+        path: Caminho do arquivo .npz
+        features: Matriz esparsa com as features
+        target: Array com a variável alvo
+        feature_names: Lista com os nomes das features
+
+    Returns:
+        None
+    """
+    # O scipy só é necessário nos datasets esparsos
+    from scipy import sparse as sp
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    features = sp.csr_matrix(features)
+    np.savez(
+        path,
+        data=features.data,
+        indices=features.indices,
+        indptr=features.indptr,
+        shape=np.array(features.shape),
+        target=np.asarray(target),
+        feature_names=np.array(feature_names, dtype=str)
+    )
+
+
+def load_sparse_dataset(path):
+    """
+    Carrega um dataset salvo com save_sparse_dataset
+
+    Args:
+        path: Caminho do arquivo .npz
+
+    Returns:
+        Tupla com a matriz CSR de features, o array alvo e a lista com os nomes das features
+    """
+    from scipy import sparse as sp
+
+    with np.load(path, allow_pickle=False) as stored:
+        features = sp.csr_matrix(
+            (stored['data'], stored['indices'], stored['indptr']),
+            shape=tuple(stored['shape'])
+        )
+        target = stored['target']
+        feature_names = stored['feature_names'].tolist()
+
+    return features, target, feature_names
+
+
+SCHEMA_FILE = 'schema.json'
+
+
+def _column_file(position):
+    return f'{position:05d}.bin'
+
+
+def _read_schema(path):
+    with open(os.path.join(path, SCHEMA_FILE), encoding='utf-8') as file:
+        return json.load(file)
+
+
+def _write_schema(path, schema):
+    # Escreve em arquivo temporário e troca, para nunca deixar um schema pela metade
+    temp_path = os.path.join(path, f'{SCHEMA_FILE}.tmp')
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        json.dump(schema, file, ensure_ascii=False, indent=4)
+    os.replace(temp_path, os.path.join(path, SCHEMA_FILE))
+
+
+def _to_storage_dtype(values, dtype, name):
+    """
+    Converte uma coluna para o tipo de armazenamento, sem perder informação
+    """
+    values = np.asarray(values)
+    dtype = np.dtype(dtype)
+    if dtype.kind in 'iu':
+        if np.isnan(values.astype(float)).any():
+            raise ValueError(f"A coluna '{name}' tem valores nulos e não pode ser salva como {dtype}")
+        info = np.iinfo(dtype)
+        if len(values) and (values.min() < info.min or values.max() > info.max):
+            raise ValueError(f"A coluna '{name}' tem valores fora do intervalo de {dtype}")
+
+    return values.astype(dtype)
+
+
+def save_columnar_dataset(path, data, dtypes, append=False):
+    """
+    Salva um DataFrame em formato binário colunar: um arquivo por coluna + schema.json
+    Cada coluna é gravada no tipo compacto informado (ex.: uint8 para One-Hot, float32 para os valores)
+    e pode ser lida sem parse e mapeada em memória com load_columnar_dataset
+
+    Args:
+        path: Diretório do dataset
+        data: DataFrame com as colunas a salvar
+        dtypes: Dicionário com o tipo de armazenamento de cada coluna
+        append: Se True, acrescenta as linhas ao dataset existente (as colunas devem ser as mesmas)
+
+    Returns:
+        None
+    """
+    columns = list(data.columns)
+
+    if append and os.path.exists(os.path.join(path, SCHEMA_FILE)):
+        schema = _read_schema(path)
+        if [col['name'] for col in schema['columns']] != columns:
+            raise ValueError("As colunas não correspondem ao dataset colunar existente")
+        mode = 'ab'
+    else:
+        os.makedirs(path, exist_ok=True)
+        schema = {
+            'rows': 0,
+            'columns': [
+                {'name': col, 'dtype': np.dtype(dtypes[col]).str, 'file': _column_file(position)}
+                for position, col in enumerate(columns)
+            ],
+        }
+        mode = 'wb'
+
+    for column in schema['columns']:
+        values = _to_storage_dtype(data[column['name']].to_numpy(), column['dtype'], column['name'])
+        with open(os.path.join(path, column['file']), mode) as file:
+            file.write(values.tobytes())
+
+    schema['rows'] += len(data)
+    _write_schema(path, schema)
+
+
+def load_columnar_dataset(path, columns=None, mmap=True):
+    """
+    Carrega um dataset salvo com save_columnar_dataset
+    Os arquivos são mapeados em memória (np.memmap), sem parse de texto, e mantêm os tipos compactos
+
+    Args:
+        path: Diretório do dataset
+        columns: Lista opcional com as colunas a carregar
+        mmap: Se False, lê as colunas para a memória em vez de mapear os arquivos
+
+    Returns:
+        DataFrame com as colunas do dataset
+    """
+    schema = _read_schema(path)
+    selected = [col for col in schema['columns'] if columns is None or col['name'] in columns]
+
+    arrays = {}
+    for column in selected:
+        file_path = os.path.join(path, column['file'])
+        if schema['rows'] == 0:
+            arrays[column['name']] = np.empty(0, dtype=column['dtype'])
+        elif mmap:
+            arrays[column['name']] = np.memmap(file_path, dtype=column['dtype'], mode='r', shape=(schema['rows'],))
+        else:
+            arrays[column['name']] = np.fromfile(file_path, dtype=column['dtype'], count=schema['rows'])
+
+    return pd.DataFrame(arrays, copy=False)
@@ -0,0 +1,276 @@
+import json
+import os
+
+import numpy as np
+
+# Este módulo usa apenas NumPy: o modelo compilado é carregado e usado sem importar o scikit-learn
+
+ARRAY_NAMES = ['feature', 'threshold', 'children', 'value', 'roots']
+# Direção dos valores nulos em cada nó (só Random Forest, que aceita NaN como o scikit-learn)
+MISSING_ARRAY = 'missing_left'
+METADATA_FILE = 'ensemble.json'
+
+# A travessia é feita em blocos de árvores x linhas: os nós de um bloco de árvores (até NODE_BLOCK nós)
+# ficam no cache enquanto todas as linhas passam por elas, e cada passo vetorizado percorre cerca de
+# STEP_ELEMENTS pares (linha, árvore). Em poucas linhas todas as árvores entram em um único bloco
+NODE_BLOCK = 2 ** 15
+STEP_ELEMENTS = 2 ** 14
+
+# Linhas por lote do predict: limita a memória da matriz de folhas (linhas x árvores)
+BATCH_ROWS = 4_096
+
+# Índices de nós e de features em int32: metade da memória percorrida a cada passo da travessia
+INDEX_DTYPE = np.int32
+
+
+class CompiledEnsemble:
+    """
+    Ensemble de árvores (Random Forest ou Gradient Boosting) em arrays NumPy contíguos
+    Todas as árvores ficam em um único conjunto de arrays: feature e threshold de cada nó,
+    filhos (esquerdo, direito) e valor das folhas. As folhas apontam para si mesmas, então
+    a travessia é feita para todas as linhas e árvores ao mesmo tempo, nível a nível
+
+    As folhas escolhidas são as mesmas do scikit-learn: X é convertido para float32 como nas
+    árvores do scikit-learn e os thresholds são arredondados para baixo em float32 (para x float32,
+    x <= t equivale a x <= maior float32 <= t). No Gradient Boosting as folhas são somadas na mesma
+    ordem e as previsões são idênticas. No Random Forest o scikit-learn soma as árvores em paralelo,
+    em ordem variável, então as previsões são iguais a menos do arredondamento (diferenças ~1e-14)
+    """
+
+    def __init__(self, feature, threshold, children, value, roots, max_depth, kind,
+                 init_value=0.0, learning_rate=1.0, feature_names=None, missing_left=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.kind = kind
+        self.init_value = init_value
+        self.learning_rate = learning_rate
+        self.missing_left = missing_left
+        self.n_features_in_ = None
+        if feature_names is not None:
+            self.feature_names_in_ = np.asarray(feature_names, dtype=object)
+            self.n_features_in_ = len(feature_names)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def apply(self, X):
+        """
+        Retorna o índice da folha de cada linha em cada árvore (linhas x árvores)
+        Valores nulos seguem a direção de cada nó guardada pelo scikit-learn (missing_go_to_left);
+        o Gradient Boosting não aceita nulos, assim como no scikit-learn
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows, n_features = X.shape
+        has_missing = bool(np.isnan(X).any())
+        if has_missing and self.kind == 'boosting':
+            raise ValueError("X tem valores nulos (NaN), que o Gradient Boosting não aceita")
+        if has_missing and self.missing_left is None:
+            raise ValueError("X tem valores nulos (NaN) e o modelo compilado não tem a direção dos nulos: compile de novo")
+
+        # Os deslocamentos das linhas cabem em int32 em qualquer lote do predict (BATCH_ROWS)
+        offset_dtype = INDEX_DTYPE if X.size < np.iinfo(INDEX_DTYPE).max else np.int64
+        leaves = np.empty((n_rows, self.n_trees), dtype=self.children.dtype)
+        X_flat = X.ravel()
+        for first_tree, last_tree in self._tree_blocks(n_rows):
+            roots = self.roots[first_tree:last_tree]
+            step_rows = max(1, STEP_ELEMENTS // len(roots))
+            for start in range(0, n_rows, step_rows):
+                end = min(start + step_rows, n_rows)
+                node = np.tile(roots, end - start)
+                row_offset = np.repeat(np.arange(start, end, dtype=offset_dtype) * n_features, len(roots))
+
+                for _ in range(self.max_depth):
+                    x = X_flat.take(row_offset + self.feature.take(node))
+                    # children guarda (esquerdo, direito) lado a lado: 2 * nó + 1 é o filho direito
+                    go_right = x > self.threshold.take(node)
+                    if has_missing:
+                        missing = np.isnan(x)
+                        go_right[missing] = ~self.missing_left.take(node[missing])
+                    node = self.children.take(2 * node + go_right)
+
+                leaves[start:end, first_tree:last_tree] = node.reshape(end - start, len(roots))
+
+        return leaves
+
+    def _tree_blocks(self, n_rows):
+        """
+        Faixas (primeira, última + 1) de árvores percorridas juntas: até NODE_BLOCK nós por faixa,
+        mas com árvores suficientes para que um passo tenha STEP_ELEMENTS pares mesmo com poucas linhas
+        """
+        min_trees = -(-STEP_ELEMENTS // max(n_rows, 1))
+        if min_trees >= self.n_trees:
+            return [(0, self.n_trees)]
+
+        tree_ends = np.append(self.roots[1:], len(self.feature))
+        blocks = []
+        first_tree = 0
+        while first_tree < self.n_trees:
+            fitting = int(np.searchsorted(tree_ends, self.roots[first_tree] + NODE_BLOCK, side='right'))
+            last_tree = min(max(fitting, first_tree + min_trees), self.n_trees)
+            blocks.append((first_tree, last_tree))
+            first_tree = last_tree
+
+        return blocks
+
+    def predict(self, X, batch_size=BATCH_ROWS):
+        """
+        Prevê em lotes, com travessia vetorizada de todas as árvores
+
+        Args:
+            X: DataFrame, array ou matriz esparsa com as features na ordem do treino
+            batch_size: Quantidade de linhas por lote (limita a memória da matriz de folhas)
+
+        Returns:
+            Array com as previsões
+        """
+        if hasattr(X, 'toarray'):
+            X = X.toarray()
+        elif hasattr(X, 'to_numpy'):
+            X = X.to_numpy()
+        X = np.asarray(X)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+
+        predictions = np.empty(X.shape[0])
+        for start in range(0, X.shape[0], batch_size):
+            end = start + batch_size
+            predictions[start:end] = self._predict_batch(X[start:end])
+
+        return predictions
+
+    def _predict_batch(self, X):
+        leaf_values = self.value.take(self.apply(X))
+
+        if self.kind == 'boosting':
+            # Mesma ordem do scikit-learn: init, depois soma learning_rate * folha árvore a árvore
+            terms = np.empty((leaf_values.shape[0], leaf_values.shape[1] + 1))
+            terms[:, 0] = self.init_value
+            terms[:, 1:] = self.learning_rate * leaf_values
+            return np.cumsum(terms, axis=1)[:, -1]
+
+        # Random Forest: soma árvore a árvore e divide pela quantidade de árvores
+        return np.cumsum(leaf_values, axis=1)[:, -1] / self.n_trees
+
+    def save(self, path):
+        """
+        Salva os arrays em arquivos .npy (podem ser mapeados em memória) e os metadados em JSON
+        """
+        os.makedirs(path, exist_ok=True)
+        for name in ARRAY_NAMES:
+            np.save(os.path.join(path, f'{name}.npy'), getattr(self, name))
+        if self.missing_left is not None:
+            np.save(os.path.join(path, f'{MISSING_ARRAY}.npy'), self.missing_left)
+
+        metadata = {
+            'kind': self.kind,
+            'max_depth': self.max_depth,
+            'init_value': self.init_value,
+            'learning_rate': self.learning_rate,
+            'feature_names': None if not hasattr(self, 'feature_names_in_') else list(self.feature_names_in_),
+        }
+        with open(os.path.join(path, METADATA_FILE), 'w', encoding='utf-8') as file:
+            json.dump(metadata, file, ensure_ascii=False, indent=4)
+
+
+def float32_thresholds(thresholds):
+    """
+    Converte thresholds float64 para o maior float32 menor ou igual a cada um
+    Como X é float32, a comparação x <= threshold continua exata e usa metade da memória
+    """
+    converted = thresholds.astype(np.float32)
+    rounded_up = converted.astype(np.float64) > thresholds
+    converted[rounded_up] = np.nextafter(converted[rounded_up], np.float32(-np.inf))
+
+    return converted
+
+
+def compile_ensemble(model):
+    """
+    Converte um RandomForestRegressor ou GradientBoostingRegressor treinado em um CompiledEnsemble
+    Lê apenas os atributos do modelo (estimators_ e tree_), sem importar o scikit-learn
+
+    Args:
+        model: Modelo treinado
+
+    Returns:
+        CompiledEnsemble
+    """
+    estimators = np.asarray(model.estimators_, dtype=object).ravel()
+    is_boosting = hasattr(model, 'learning_rate')
+
+    features, thresholds, children, values, roots, missing_left = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for estimator in estimators:
+        tree = estimator.tree_
+        n_nodes = tree.node_count
+        nodes = np.arange(n_nodes)
+        is_leaf = tree.children_left == -1
+
+        left = np.where(is_leaf, nodes, tree.children_left) + offset
+        right = np.where(is_leaf, nodes, tree.children_right) + offset
+
+        features.append(np.where(is_leaf, 0, tree.feature))
+        thresholds.append(float32_thresholds(np.where(is_leaf, np.inf, tree.threshold)))
+        children.append(np.column_stack([left, right]).ravel())
+        values.append(tree.value[:, 0, 0])
+        missing_left.append(np.asarray(tree.missing_go_to_left, dtype=bool))
+        roots.append(offset)
+
+        offset += n_nodes
+        max_depth = max(max_depth, tree.max_depth)
+    if offset > np.iinfo(INDEX_DTYPE).max:
+        raise ValueError(f"O modelo tem {offset} nós, mais do que os índices {INDEX_DTYPE.__name__} comportam")
+
+    init_value = 0.0
+    if is_boosting and model.init_ != 'zero':
+        init_value = float(np.ravel(model.init_.predict(np.zeros((1, model.n_features_in_))))[0])
+
+    return CompiledEnsemble(
+        feature=np.concatenate(features).astype(INDEX_DTYPE),
+        threshold=np.concatenate(thresholds),
+        children=np.concatenate(children).astype(INDEX_DTYPE),
+        value=np.concatenate(values).astype(np.float64),
+        roots=np.array(roots, dtype=INDEX_DTYPE),
+        max_depth=int(max_depth),
+        kind='boosting' if is_boosting else 'forest',
+        init_value=init_value,
+        learning_rate=float(model.learning_rate) if is_boosting else 1.0,
+        feature_names=getattr(model, 'feature_names_in_', None),
+        missing_left=None if is_boosting else np.concatenate(missing_left),
+    )
+
+
+def load_compiled_ensemble(path, mmap_mode=None):
+    """
+    Carrega um CompiledEnsemble salvo com CompiledEnsemble.save
+
+    Args:
+        path: Diretório do modelo compilado
+        mmap_mode: Use 'r' para mapear os arrays em memória em vez de lê-los
+
+    Returns:
+        CompiledEnsemble
+    """
+    with open(os.path.join(path, METADATA_FILE), encoding='utf-8') as file:
+        metadata = json.load(file)
+
+    arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode) for name in ARRAY_NAMES}
+    # Modelos compilados antes da direção dos nulos continuam carregando, mas recusam X com NaN
+    missing_path = os.path.join(path, f'{MISSING_ARRAY}.npy')
+    if os.path.exists(missing_path):
+        arrays[MISSING_ARRAY] = np.load(missing_path, mmap_mode=mmap_mode)
+
+    return CompiledEnsemble(
+        **arrays,
+        max_depth=metadata['max_depth'],
+        kind=metadata['kind'],
+        init_value=metadata['init_value'],
+        learning_rate=metadata['learning_rate'],
+        feature_names=metadata['feature_names'],
+    )
@@ -1,14 +1,75 @@
+import numpy as np
 import pandas as pd
+import matplotlib
+# Backend sem interface gráfica: os gráficos só são salvos em arquivo (também em servidores e processos filhos)
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import seaborn as sns
+import math
 import os
 
+try:
+    from .correlation import RankedColumns, heatmap_columns, spearman_matrix
+    from .data_profile import as_profile
+    from .preprocessing import TARGET_COLUMN, normalize_column_name
+except ImportError:
+    from correlation import RankedColumns, heatmap_columns, spearman_matrix
+    from data_profile import as_profile
+    from preprocessing import TARGET_COLUMN, normalize_column_name
+
+# Máximo de colunas do heatmap de correlação: acima disso, entram o alvo, as colunas mais
+# correlacionadas com ele e as dos pares mais correlacionados (ver correlation.heatmap_columns)
+HEATMAP_MAX_COLUMNS = 40
+
+# Opções de saída de todos os gráficos (ver set_output_options)
+OUTPUT_OPTIONS = {'dpi': None, 'format': 'png'}
+
+
+def set_output_options(dpi=None, file_format='png'):
+    """
+    Define a resolução e o formato dos gráficos salvos
+    Ex.: set_output_options(dpi=72) para uma prévia rápida, set_output_options(file_format='svg')
+
+    Args:
+        dpi: Resolução usada no lugar da resolução de cada gráfico (None mantém a original)
+        file_format: 'png' ou 'svg'
+    """
+    OUTPUT_OPTIONS['dpi'] = dpi
+    OUTPUT_OPTIONS['format'] = file_format
+
+
+def output_file_name(file_name):
+    """
+    Nome do arquivo do gráfico com a extensão do formato configurado
+    """
+    return f"{os.path.splitext(file_name)[0]}.{OUTPUT_OPTIONS['format']}"
+
+
+def save_figure(folder_name, file_name, dpi=None, **kwargs):
+    """
+    Salva a figura atual em outputs/<folder_name>, aplicando as opções de saída
+    """
+    dpi = OUTPUT_OPTIONS['dpi'] or dpi
+    if dpi is not None:
+        kwargs['dpi'] = dpi
+    plt.savefig(f'outputs/{folder_name}/{output_file_name(file_name)}', format=OUTPUT_OPTIONS['format'], **kwargs)
+
+
+def category_counts(data, column):
+    """
+    Frequências de uma coluna categórica (em ordem decrescente), lidas do perfil do dataset
+    """
+    top = as_profile(data)['categorical'][column]['top']
+
+    return pd.Series([count for _, count in top], index=[value for value, _ in top], dtype='int64')
+
+
 def histogram(data, folder_name):
     """
     Função que gera histogramas das variáveis numéricas
     
     Args:
-        data: DataFrame com as variáveis numéricas
+        data: Perfil do dataset (data_profile.py) ou DataFrame
         folder_name: Nome da pasta para salvar os gráficos
 
     Returns:
@@ -19,10 +80,23 @@ def histogram(data, folder_name):
     os.makedirs(f'outputs/{folder_name}', exist_ok=True)
 
     try:
-        data.hist(bins=50, figsize=(15, 8))
+        # Histogramas já contados no perfil, na mesma grade do DataFrame.hist
+        profile = as_profile(data)
+        columns = list(profile['numeric'])
+        n_cols = math.ceil(math.sqrt(len(columns)))
+        n_rows = math.ceil(len(columns) / n_cols)
+        _, axes = plt.subplots(n_rows, n_cols, figsize=(15, 8), squeeze=False)
+        for ax, col in zip(axes.flat, columns):
+            histogram_counts = profile['numeric'][col]['histogram']
+            if histogram_counts is not None:
+                edges = histogram_counts['edges']
+                ax.hist(edges[:-1], bins=edges, weights=histogram_counts['counts'])
+            ax.set_title(col)
+        for ax in axes.flat[len(columns):]:
+            ax.set_visible(False)
         plt.suptitle('Histogramas das Variáveis Numéricas', fontsize=16, y=1.00)
         plt.tight_layout()
-        plt.savefig(f'outputs/{folder_name}/01_histogramas.png')
+        save_figure(folder_name, '01_histogramas.png')
         plt.close()
     except Exception as e:
         print(f"Erro ao gerar histogramas: {e}")
@@ -33,7 +107,7 @@ def distribution_by_type_of_event(data, folder_name):
     Função que gera distribuição por tipo de evento
     
     Args:
-        data: DataFrame com as variáveis numéricas
+        data: Perfil do dataset (data_profile.py) ou DataFrame
         folder_name: Nome da pasta para salvar os gráficos
 
     Returns:
@@ -45,13 +119,13 @@ def distribution_by_type_of_event(data, folder_name):
 
     try:
         plt.figure(figsize=(10, 6))
-        tipo_evento_counts = data['Tipo de Evento'].value_counts()
+        tipo_evento_counts = category_counts(data, 'Tipo de Evento')
         plt.bar(range(len(tipo_evento_counts)), tipo_evento_counts.values, color='steelblue')
         plt.xticks(range(len(tipo_evento_counts)), tipo_evento_counts.index)
         plt.ylabel('Quantidade')
         plt.title('Distribuição por Tipo de Evento')
         plt.tight_layout()
-        plt.savefig(f'outputs/{folder_name}/02_tipo_evento.png')
+        save_figure(folder_name, '02_tipo_evento.png')
         plt.close()
     except Exception as e:
         print(f"Erro ao gerar distribuição por tipo de evento: {e}")
@@ -62,7 +136,7 @@ def distribution_by_type_of_age_rating(data, folder_name):
     Função que gera distribuição por classificação etária
     
     Args:
-        data: DataFrame com as variáveis numéricas
+        data: Perfil do dataset (data_profile.py) ou DataFrame
         folder_name: Nome da pasta para salvar os gráficos
 
     Returns:
@@ -74,13 +148,13 @@ def distribution_by_type_of_age_rating(data, folder_name):
 
     try:
         plt.figure(figsize=(10, 6))
-        classificacao_counts = data['Classificação Etária'].value_counts()
+        classificacao_counts = category_counts(data, 'Classificação Etária')
         plt.bar(range(len(classificacao_counts)), classificacao_counts.values, color='coral')
         plt.xticks(range(len(classificacao_counts)), classificacao_counts.index)
         plt.ylabel('Quantidade')
         plt.title('Distribuição por Classificação Etária')
         plt.tight_layout()
-        plt.savefig(f'outputs/{folder_name}/03_classificacao_etaria.png')
+        save_figure(folder_name, '03_classificacao_etaria.png')
         plt.close()
     except Exception as e:
         print(f"Erro ao gerar distribuição por classificação etária: {e}")
@@ -91,7 +165,7 @@ def distribution_by_type_of_session(data, folder_name):
     Função que gera distribuição por tipo de sessão
     
     Args:
-        data: DataFrame com as variáveis numéricas
+        data: Perfil do dataset (data_profile.py) ou DataFrame
         folder_name: Nome da pasta para salvar os gráficos
 
     Returns:
@@ -103,13 +177,13 @@ def distribution_by_type_of_session(data, folder_name):
 
     try:
         plt.figure(figsize=(10, 6))
-        sessao_counts = data['Tipo da Sessão'].value_counts()
+        sessao_counts = category_counts(data, 'Tipo da Sessão')
         plt.bar(range(len(sessao_counts)), sessao_counts.values, color='mediumseagreen')
         plt.xticks(range(len(sessao_counts)), sessao_counts.index)
         plt.ylabel('Quantidade')
         plt.title('Distribuição por Tipo de Sessão')
         plt.tight_layout()
-        plt.savefig(f'outputs/{folder_name}/04_tipo_sessao.png')
+        save_figure(folder_name, '04_tipo_sessao.png')
         plt.close()
     except Exception as e:
         print(f"Erro ao gerar distribuição por tipo de sessão: {e}")
@@ -119,7 +193,7 @@ def distribution_by_null_values(data, folder_name):
     """
     Função que gera distribuição por valores nulos
     Args:
-        data: DataFrame com as variáveis numéricas
+        data: Perfil do dataset (data_profile.py) ou DataFrame
         folder_name: Nome da pasta para salvar os gráficos
 
     Returns:
@@ -131,13 +205,13 @@ def distribution_by_null_values(data, folder_name):
 
     try:
         plt.figure(figsize=(10, 6))
-        null_counts = data.isnull().sum()
+        null_counts = pd.Series(as_profile(data)['nulls'])
         plt.bar(range(len(null_counts)), null_counts.values, color='red')   
         plt.xticks(range(len(null_counts)), null_counts.index, rotation=45, ha='right')
         plt.ylabel('Quantidade')
         plt.title('Distribuição por Valores Nulos')
         plt.tight_layout()
-        plt.savefig(f'outputs/{folder_name}/05_valores_nulos.png')
+        save_figure(folder_name, '05_valores_nulos.png')
         plt.close()
     except Exception as e:
         print(f"Erro ao gerar distribuição por valores nulos: {e}")
@@ -147,7 +221,7 @@ def relationship_between_ticket_price_and_quantity_sold(data, folder_name):
     """
     Função que gera relação entre valor do ingresso e quantidade vendida
     Args:
-        data: DataFrame com as variáveis numéricas
+        data: Perfil do dataset (data_profile.py) ou DataFrame
         folder_name: Nome da pasta para salvar os gráficos
 
     Returns:
@@ -159,12 +233,17 @@ def relationship_between_ticket_price_and_quantity_sold(data, folder_name):
 
     try:
         plt.figure(figsize=(10, 6))
-        plt.scatter(data['Valor do Ingresso'], data['Quantidade de ingressos vendidos'], alpha=0.5)
+        sample = as_profile(data)['sample']['columns']
+        plt.scatter(
+            np.array(sample['Valor do Ingresso'], dtype=float),
+            np.array(sample['Quantidade de ingressos vendidos'], dtype=float),
+            alpha=0.5
+        )
         plt.title("Relação entre Valor do Ingresso e Quantidade Vendida")
         plt.xlabel("Valor do Ingresso (R$)")
         plt.ylabel("Quantidade de Ingressos Vendidos")
         plt.grid(True, alpha=0.3)
-        plt.savefig(f'outputs/{folder_name}/06_valor_vs_quantidade.png')
+        save_figure(folder_name, '06_valor_vs_quantidade.png')
         plt.close()
     except Exception as e:
         print(f"Erro ao gerar relação entre valor do ingresso e quantidade vendida: {e}")
@@ -173,6 +252,8 @@ def relationship_between_ticket_price_and_quantity_sold(data, folder_name):
 def correlation_heatmap(data, folder_name):
     """
     Função que gera heatmap de correlação
+    Cada coluna é ranqueada uma única vez (correlation.py) e, com muitas colunas, o heatmap mostra
+    apenas as HEATMAP_MAX_COLUMNS mais relevantes, sem calcular a matriz completa
     Args:
         data: DataFrame com as variáveis numéricas
         folder_name: Nome da pasta para salvar os gráficos
@@ -185,7 +266,9 @@ def correlation_heatmap(data, folder_name):
     os.makedirs(f'outputs/{folder_name}', exist_ok=True)
 
     try:
-        corr_matrix = data.corr(method='spearman', numeric_only=True)
+        ranked = RankedColumns(data)
+        columns = heatmap_columns(ranked, HEATMAP_MAX_COLUMNS, target=normalize_column_name(TARGET_COLUMN))
+        corr_matrix = spearman_matrix(ranked, columns)
         fig, ax = plt.subplots(figsize=(24, 20))
         sns.heatmap(
             corr_matrix, 
@@ -227,8 +310,9 @@ def correlation_heatmap(data, folder_name):
         plt.tight_layout()
         
         # Salvar com alta resolução
-        plt.savefig(
-            f'outputs/{folder_name}/07_heatmap_correlacao.png',
+        save_figure(
+            folder_name,
+            '07_heatmap_correlacao.png',
             dpi=300,
             bbox_inches='tight'
         )